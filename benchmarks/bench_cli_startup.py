@@ -0,0 +1,75 @@
+"""
+Measures the cold-start latency of the headless CLI and checks that it never
+imports the GUI stack. Fails (exit code 1) when the median exceeds the budget.
+
+Usage:
+    python benchmarks/bench_cli_startup.py [--runs 20] [--budget-ms 100] [--command status]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI = os.path.join(ROOT, "src", "cli.py")
+GUI_MODULES = ("tkinter", "customtkinter", "PIL", "pystray", "requests")
+
+# Runs the CLI in-process, then reports any GUI module that got imported
+IMPORT_CHECK = f"""
+import os, runpy, sys
+sys.argv = [{CLI!r}] + sys.argv[1:]
+sys.path.insert(0, os.path.dirname({CLI!r}))
+try:
+    runpy.run_path({CLI!r}, run_name="__main__")
+except SystemExit:
+    pass
+leaked = [m for m in {GUI_MODULES!r} if m in sys.modules]
+print("LEAKED:" + ",".join(leaked), file=sys.stderr)
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    parser.add_argument("--command", nargs="+", default=["status"])
+    args = parser.parse_args()
+
+    check = subprocess.run([sys.executable, "-c", IMPORT_CHECK, *args.command],
+                           capture_output=True, text=True, cwd=ROOT)
+    report = [line for line in check.stderr.splitlines() if line.startswith("LEAKED:")]
+    if not report:
+        print(f"FAIL: CLI did not run:\n{check.stderr}")
+        return 1
+    leaked = report[-1][len("LEAKED:"):]
+    if leaked:
+        print(f"FAIL: GUI modules imported by the CLI: {leaked}")
+        return 1
+
+    timings = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, CLI, *args.command], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=ROOT)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    # Interpreter startup alone, for reference
+    baseline = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], cwd=ROOT)
+        baseline.append((time.perf_counter() - start) * 1000)
+
+    median = statistics.median(timings)
+    print(f"cli {' '.join(args.command)}: median {median:.1f} ms, min {min(timings):.1f} ms, max {max(timings):.1f} ms")
+    print(f"python -c pass:  median {statistics.median(baseline):.1f} ms")
+    if median > args.budget_ms:
+        print(f"FAIL: median exceeds the {args.budget_ms:.0f} ms budget")
+        return 1
+    print(f"OK: within the {args.budget_ms:.0f} ms budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
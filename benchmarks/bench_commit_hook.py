@@ -0,0 +1,99 @@
+"""
+Measures the per-commit overhead of the identity hook.
+
+Builds a throwaway data directory with --bindings synthetic bindings, binds a
+temporary repository to one of them, and times `git commit --allow-empty`
+with and without the hook installed. The global git config is isolated in
+the temp directory. Fails (exit code 1) when the median overhead exceeds
+the budget.
+
+Usage:
+    python benchmarks/bench_commit_hook.py [--runs 20] [--bindings 10000] [--budget-ms 50]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from commit_hook import install_repo_hooks, open_index, lookup  # noqa: E402
+
+
+def make_store(data_dir: str, repo: str, count: int):
+    accounts = [{"id": str(i), "alias": f"acc{i}", "username": f"user{i}", "email": f"user{i}@example.com",
+                 "ssh_key_path": ""} for i in range(max(1, count // 10))]
+    repos = [{"path": os.path.join(data_dir, "repos", f"r{i}"), "alias": f"r{i}",
+              "account_id": str(i % len(accounts)), "binding": "repo"} for i in range(count - 1)]
+    repos.append({"path": repo, "alias": "bench", "account_id": "0", "binding": "repo"})
+    with open(os.path.join(data_dir, "accounts.json"), 'w') as f:
+        json.dump(accounts, f)
+    with open(os.path.join(data_dir, "repositories.json"), 'w') as f:
+        json.dump(repos, f)
+
+
+def time_commits(repo: str, env: dict, runs: int):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(["git", "commit", "-q", "--allow-empty", "-m", "bench"], cwd=repo, env=env, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--bindings", type=int, default=10000)
+    parser.add_argument("--budget-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = os.path.join(tmp, "data")
+        repo = os.path.join(tmp, "repo")
+        os.makedirs(data_dir)
+        env = dict(os.environ, HOME=tmp, XDG_CONFIG_HOME=os.path.join(tmp, ".config"),
+                   GIT_CONFIG_NOSYSTEM="1", GIT_AUTHOR_NAME="user0", GIT_AUTHOR_EMAIL="user0@example.com",
+                   GIT_COMMITTER_NAME="user0", GIT_COMMITTER_EMAIL="user0@example.com")
+        env.pop("GHM_SKIP_IDENTITY_CHECK", None)
+        subprocess.run(["git", "init", "-q", repo], env=env, check=True)
+        make_store(data_dir, repo, args.bindings)
+
+        baseline = time_commits(repo, env, args.runs)
+        install_repo_hooks(repo, data_dir)
+
+        start = time.perf_counter()
+        entry = lookup(open_index(data_dir), repo)
+        index_ms = (time.perf_counter() - start) * 1000
+        assert entry and entry[2] == "user0@example.com", entry
+
+        hooked = time_commits(repo, env, args.runs)
+
+        # Interpreter startup alone (the floor for any Python hook), for reference
+        interpreter = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-S", "-c", "pass"], check=True)
+            interpreter.append((time.perf_counter() - start) * 1000)
+
+    overhead = statistics.median(hooked) - statistics.median(baseline)
+    print(f"bindings:         {args.bindings}")
+    print(f"index load+match: {index_ms:.2f} ms (in-process)")
+    print(f"git commit:       median {statistics.median(baseline):.1f} ms without hook, "
+          f"{statistics.median(hooked):.1f} ms with pre-commit hook")
+    print(f"overhead:         {overhead:.1f} ms per commit "
+          f"(python -S -c pass: {statistics.median(interpreter):.1f} ms)")
+    if overhead > args.budget_ms:
+        print(f"FAIL: overhead exceeds the {args.budget_ms:.0f} ms budget")
+        return 1
+    print(f"OK: within the {args.budget_ms:.0f} ms budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""
+Compares GPG key generation latency across the algorithms offered in the
+Add Account dialog. Every run uses a fresh temporary GNUPGHOME so the user's
+keyring is never touched.
+
+Usage:
+    python benchmarks/bench_gpg_keygen.py [--runs 3] [--algorithms ed25519 rsa3072]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from gpg_manager import GPGManager, GPG_ALGORITHMS
+
+
+def run_once(algorithm: str) -> float:
+    home = tempfile.mkdtemp(prefix="ghm-gpg-bench-")
+    try:
+        os.chmod(home, 0o700)
+        manager = GPGManager(gnupg_home=home)
+        start = time.perf_counter()
+        success, msg, _, _ = manager.generate_gpg_key("Bench User", "bench@example.com", "bench-passphrase", algorithm)
+        elapsed = time.perf_counter() - start
+        if not success:
+            raise RuntimeError(f"{algorithm}: {msg}")
+        return elapsed
+    finally:
+        # Stop the gpg-agent spawned for the temporary home before removing it
+        subprocess.run(["gpgconf", "--homedir", home, "--kill", "all"], capture_output=True)
+        shutil.rmtree(home, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--algorithms", nargs="+", default=list(GPG_ALGORITHMS), choices=list(GPG_ALGORITHMS))
+    args = parser.parse_args()
+
+    if not GPGManager().is_gpg_installed():
+        print("gpg not found in PATH, skipping.")
+        return 1
+
+    print(f"{'algorithm':<10} {'min':>9} {'median':>9} {'max':>9}")
+    for algorithm in args.algorithms:
+        timings = [run_once(algorithm) for _ in range(args.runs)]
+        print(f"{algorithm:<10} {min(timings):>8.3f}s {statistics.median(timings):>8.3f}s {max(timings):>8.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
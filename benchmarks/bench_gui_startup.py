@@ -0,0 +1,65 @@
+"""
+Measures the GUI's time-to-first-paint: from spawning `python src/main.py`
+until the main window has drawn its first frame (the app prints a marker
+when GHM_STARTUP_PROBE is set, then exits). Also reports whether modules
+that should load lazily (pystray, requests, gpg_manager) were imported
+before that point. Needs a display (use xvfb-run on a headless Linux box).
+Fails (exit code 1) when the median exceeds the budget.
+
+Usage:
+    python benchmarks/bench_gui_startup.py [--runs 10] [--budget-ms 1500]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+MAIN = os.path.join(SRC, "main.py")
+
+
+def first_paint():
+    """Returns (milliseconds until the first frame, modules loaded by then)."""
+    env = dict(os.environ, GHM_STARTUP_PROBE="1")
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, MAIN], cwd=SRC, env=env, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, text=True)
+    for line in proc.stdout:
+        if line.startswith("FIRST_PAINT"):
+            elapsed = (time.perf_counter() - start) * 1000
+            proc.wait(timeout=30)
+            return elapsed, [m for m in line[len("FIRST_PAINT"):].strip().split(",") if m]
+    proc.wait(timeout=30)
+    raise RuntimeError(f"GUI exited without painting:\n{proc.stderr.read()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    args = parser.parse_args()
+
+    try:
+        first_paint()  # warm the OS file cache
+        results = [first_paint() for _ in range(args.runs)]
+    except RuntimeError as e:
+        print(f"FAIL: {e}")
+        return 1
+
+    timings = [ms for ms, _ in results]
+    eager = sorted({m for _, loaded in results for m in loaded})
+    median = statistics.median(timings)
+    print(f"time to first paint: median {median:.0f} ms, min {min(timings):.0f} ms, max {max(timings):.0f} ms")
+    print(f"lazy modules loaded before first paint: {', '.join(eager) or 'none'}")
+    if median > args.budget_ms:
+        print(f"FAIL: median exceeds the {args.budget_ms:.0f} ms budget")
+        return 1
+    print(f"OK: within the {args.budget_ms:.0f} ms budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,480 @@
+"""
+Hermetic throughput benchmarks for the core managers, compared against a
+stored baseline.
+
+Everything runs inside a temporary HOME: synthetic account/repository stores
+(10 up to 100k entries), stub git/ssh/ssh-keygen/gpg executables (so the
+numbers measure this app, not the tools or the network) and a local HTTP
+server standing in for github.com avatars. Cases:
+
+    accounts.load / accounts.save    AccountManager over N accounts
+    repos.load / repos.save          RepositoryManager over N bindings
+    repos.resolve                    path -> binding lookups against N bindings
+    accounts.import / repos.import   batch_io import of an N-record JSONL file into an empty store
+    config.parse                     a global gitconfig with N includeIf entries
+    bind                             GitSwitcher.bind_repositories over N repositories
+    activate                         GitSwitcher.activate_account (stub git)
+    gpg.keygen                       GPGManager.generate_gpg_key (stub gpg)
+    avatar.pipeline                  AvatarManager download + decode of N avatars
+
+Each case reports the best and median of --runs repetitions (garbage
+collection paused). The best run is compared with benchmarks/baseline.json,
+and the run fails (exit code 1) when a case is
+slower than its baseline by more than --tolerance. Baselines are machine
+specific: refresh them with --update-baseline on the reference machine.
+POSIX only (the stub tools are shell scripts).
+
+Usage:
+    python benchmarks/bench_suite.py [--sizes 10 1000 100000] [--runs 5] [--cases bind activate]
+                                     [--tolerance 0.5] [--update-baseline]
+"""
+import argparse
+import gc
+import http.server
+import json
+import os
+import platform
+import shutil
+import statistics
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from typing import Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+BASELINE_FILE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+DEFAULT_SIZES = [10, 1000, 100000]
+# Cases that touch the filesystem per item are capped so a run stays short
+MAX_BIND_REPOS = 2000
+MAX_AVATARS = 200
+# Regressions smaller than this are noise, whatever the ratio
+NOISE_FLOOR_S = 0.002
+# Fast cases are repeated until they have run this long (at most MAX_RUNS times)
+MIN_CASE_TIME_S = 0.3
+MAX_RUNS = 200
+
+STUBS = {
+    "git": """#!/bin/sh
+case "$*" in
+  "config --global user.name") echo "Bench User" ;;
+  "config --global user.email") echo "bench@example.com" ;;
+  "config --global credential.helper") exit 1 ;;
+esac
+exit 0
+""",
+    "ssh": """#!/bin/sh
+echo "Hi bench! You've successfully authenticated, but GitHub does not provide shell access." >&2
+exit 1
+""",
+    "ssh-keygen": """#!/bin/sh
+while [ $# -gt 0 ]; do
+  [ "$1" = "-f" ] && out="$2"
+  shift
+done
+echo "stub private key" > "$out"
+echo "ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAIstub bench@example.com" > "$out.pub"
+""",
+    "gpg": """#!/bin/sh
+for a in "$@"; do
+  case "$a" in
+    --quick-gen-key|--gen-key)
+      cat > /dev/null
+      echo "[GNUPG:] PROGRESS primegen X 1 100"
+      echo "[GNUPG:] KEY_CREATED B 0123456789ABCDEF0123456789ABCDEF01234567"
+      exit 0 ;;
+    --export)
+      printf -- "-----BEGIN PGP PUBLIC KEY BLOCK-----\\nstub\\n-----END PGP PUBLIC KEY BLOCK-----\\n"
+      exit 0 ;;
+  esac
+done
+exit 0
+""",
+}
+
+
+def tiny_png(size: int = 64) -> bytes:
+    """A valid grey RGB PNG, built without PIL."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+    raw = b"".join(b"\x00" + b"\x80" * (size * 3) for _ in range(size))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+
+class AvatarServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _AvatarHandler(http.server.BaseHTTPRequestHandler):
+    body = tiny_png()
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Environment:
+    """Temporary HOME with stub tools on the shared command runner."""
+    def __init__(self, tmp: str):
+        self.tmp = tmp
+        self.home = os.path.join(tmp, "home")
+        os.makedirs(os.path.join(self.home, ".ssh"))
+        os.environ["HOME"] = self.home
+        os.environ["XDG_CONFIG_HOME"] = os.path.join(self.home, ".config")
+        os.environ["GIT_CONFIG_NOSYSTEM"] = "1"
+
+        from command_runner import get_runner
+        bin_dir = os.path.join(tmp, "bin")
+        os.makedirs(bin_dir)
+        for tool, script in STUBS.items():
+            path = os.path.join(bin_dir, tool)
+            with open(path, 'w') as f:
+                f.write(script)
+            os.chmod(path, 0o755)
+            get_runner().set_executable(tool, path)
+
+        self.key_path = os.path.join(self.home, ".ssh", "id_bench")
+        with open(self.key_path, 'w') as f:
+            f.write("stub")
+        self._server = None
+
+    def avatar_url(self) -> str:
+        if self._server is None:
+            self._server = AvatarServer(("127.0.0.1", 0), _AvatarHandler)
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}/{{username}}.png"
+
+    def close(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def path(self, *parts) -> str:
+        return os.path.join(self.tmp, *parts)
+
+
+def synthetic_accounts(count: int):
+    return [{"id": f"acc-{i}", "alias": f"Account {i}", "username": f"user{i}", "email": f"user{i}@example.com",
+             "ssh_key_path": f"/keys/id_{i}", "gpg_key_id": None} for i in range(count)]
+
+
+def synthetic_repos(count: int, accounts: int):
+    return [{"path": f"/work/team{i % 97}/project{i}", "alias": f"project{i}",
+             "account_id": f"acc-{i % max(1, accounts)}", "binding": "repo"} for i in range(count)]
+
+
+def write_json(path: str, data):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=4)
+
+
+# --- Cases: each returns (items, fn) where fn() is the timed work ---
+
+def case_accounts_load(env, size):
+    from account_manager import AccountManager
+    path = env.path(f"accounts_{size}.json")
+    write_json(path, synthetic_accounts(size))
+    return size, lambda: AccountManager(storage_file=path)
+
+
+def case_accounts_save(env, size):
+    from account_manager import AccountManager
+    path = env.path(f"accounts_{size}.json")
+    write_json(path, synthetic_accounts(size))
+    manager = AccountManager(storage_file=path)
+    return size, manager._save_accounts
+
+
+def case_repos_load(env, size):
+    from repository_manager import RepositoryManager
+    path = env.path(f"repos_{size}.json")
+    write_json(path, synthetic_repos(size, size // 10))
+    return size, lambda: RepositoryManager(storage_file=path)
+
+
+def case_repos_save(env, size):
+    from repository_manager import RepositoryManager
+    path = env.path(f"repos_{size}.json")
+    write_json(path, synthetic_repos(size, size // 10))
+    manager = RepositoryManager(storage_file=path)
+    return size, manager._save_repos
+
+
+def case_repos_resolve(env, size):
+    from repository_manager import RepositoryManager
+    path = env.path(f"repos_{size}.json")
+    write_json(path, synthetic_repos(size, size // 10))
+    manager = RepositoryManager(storage_file=path)
+    lookups = [f"/work/team{i % 97}/project{i}/src/module" for i in range(0, size, max(1, size // 1000))]
+
+    def run():
+        for p in lookups:
+            manager.find_binding(p)
+    return len(lookups), run
+
+
+def write_jsonl(path: str, records):
+    with open(path, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def case_accounts_import(env, size):
+    import batch_io
+    from account_manager import AccountManager
+    source, store = env.path(f"import_accounts_{size}.jsonl"), env.path(f"imported_accounts_{size}.json")
+    write_jsonl(source, synthetic_accounts(size))
+
+    def run():
+        if os.path.exists(store):
+            os.remove(store)
+        with open(source, 'r', encoding='utf-8') as f:
+            report = batch_io.import_accounts(AccountManager(storage_file=store), f, "jsonl")
+        assert len(report.added) == size and not report.errors, report.summary()
+    return size, run
+
+
+def case_repos_import(env, size):
+    import batch_io
+    from account_manager import AccountManager
+    from repository_manager import RepositoryManager
+    accounts_path = env.path(f"import_repo_accounts_{size}.json")
+    write_json(accounts_path, synthetic_accounts(max(1, size // 10)))
+    accounts = AccountManager(storage_file=accounts_path)
+    source, store = env.path(f"import_repos_{size}.jsonl"), env.path(f"imported_repos_{size}.json")
+    write_jsonl(source, synthetic_repos(size, max(1, size // 10)))
+
+    def run():
+        if os.path.exists(store):
+            os.remove(store)
+        with open(source, 'r', encoding='utf-8') as f:
+            report = batch_io.import_repos(RepositoryManager(storage_file=store), accounts, f, "jsonl")
+        assert len(report.added) == size and not report.errors, report.summary()
+    return size, run
+
+
+def _search_managers(env, size):
+    from account_manager import AccountManager
+    from repository_manager import RepositoryManager
+    accounts_path, repos_path = env.path(f"search_accounts_{size}.json"), env.path(f"search_repos_{size}.json")
+    write_json(accounts_path, synthetic_accounts(max(1, size // 100)))
+    write_json(repos_path, synthetic_repos(size, max(1, size // 100)))
+    return AccountManager(storage_file=accounts_path), RepositoryManager(storage_file=repos_path)
+
+
+def case_search_build(env, size):
+    from search_index import AccountRepoIndex
+    accounts, repos = _search_managers(env, size)
+    return size, lambda: AccountRepoIndex(accounts, repos)
+
+
+def case_search_query(env, size):
+    from search_index import AccountRepoIndex
+    index = AccountRepoIndex(*_search_managers(env, size))
+    # Prefix, substring, multi-term, punctuated and misspelled queries
+    queries = ["proj", "ject12", "team4 project9", "team7/project", "projcet", "account 3", "zzz"]
+
+    def run():
+        for query in queries:
+            index.search_repos(query)
+            index.search_accounts(query)
+    return len(queries) * 2, run
+
+
+def case_config_parse(env, size):
+    from git_config import parse_git_config
+    lines = ["[user]\n\tname = Bench User\n\temail = bench@example.com\n[core]\n\teditor = vim\n"]
+    for i in range(size):
+        lines.append(f'[includeIf "gitdir:/work/team{i % 97}/project{i}/"]\n\tpath = /data/git_includes/acc-{i % 50}.gitconfig\n')
+    text = "".join(lines)
+    return size, lambda: parse_git_config(text)
+
+
+def case_bind(env, size):
+    from ssh_manager import GitSwitcher
+    count = size
+    paths = []
+    for i in range(count):
+        git_dir = env.path(f"bind_{count}", f"repo{i}", ".git")
+        if not os.path.isdir(git_dir):
+            os.makedirs(git_dir)
+            with open(os.path.join(git_dir, "config"), 'w') as f:
+                f.write("[core]\n\trepositoryformatversion = 0\n\tbare = false\n")
+        paths.append(os.path.dirname(git_dir))
+    switcher = GitSwitcher()
+    return count, lambda: switcher.bind_repositories(paths, "Bench User", "bench@example.com", env.key_path)
+
+
+def case_activate(env, size):
+    from ssh_manager import GitSwitcher
+    switcher = GitSwitcher()
+    rounds = 10
+
+    def run():
+        for _ in range(rounds):
+            ok, msg = switcher.activate_account("Bench User", "bench@example.com", env.key_path, "0123456789ABCDEF")
+            assert ok, msg
+    return rounds, run
+
+
+def case_gpg_keygen(env, size):
+    from gpg_manager import GPGManager
+    manager = GPGManager()
+    rounds = 10
+
+    def run():
+        for _ in range(rounds):
+            ok, msg, _, _ = manager.generate_gpg_key("Bench User", "bench@example.com", "secret")
+            assert ok, msg
+    return rounds, run
+
+
+def case_avatar_pipeline(env, size):
+    from avatar_manager import AvatarManager  # needs PIL, customtkinter and requests
+    import requests  # noqa: F401
+    count = size
+    url = env.avatar_url()
+    counter = [0]
+
+    def run():
+        cache_dir = tempfile.mkdtemp(dir=env.tmp)
+        manager = AvatarManager(cache_dir, avatar_url=url)
+        done = threading.Event()
+        lock = threading.Lock()
+        counter[0] = 0
+
+        def fetched(username, path):
+            manager.load_avatar_pil(username)
+            with lock:
+                counter[0] += 1
+                if counter[0] == count:
+                    done.set()
+        for i in range(count):
+            manager.fetch_avatar(f"user{i}", fetched)
+        if not done.wait(60):
+            raise RuntimeError(f"only {counter[0]}/{count} avatars arrived")
+        shutil.rmtree(cache_dir)
+    return count, run
+
+
+# name -> (builder, scales with --sizes, largest size it runs at)
+CASES = {
+    "accounts.load": (case_accounts_load, True, None),
+    "accounts.save": (case_accounts_save, True, None),
+    "repos.load": (case_repos_load, True, None),
+    "repos.save": (case_repos_save, True, None),
+    "repos.resolve": (case_repos_resolve, True, None),
+    "accounts.import": (case_accounts_import, True, None),
+    "repos.import": (case_repos_import, True, None),
+    "config.parse": (case_config_parse, True, None),
+    "search.build": (case_search_build, True, None),
+    "search.query": (case_search_query, True, None),
+    "bind": (case_bind, True, MAX_BIND_REPOS),
+    "activate": (case_activate, False, None),
+    "gpg.keygen": (case_gpg_keygen, False, None),
+    "avatar.pipeline": (case_avatar_pipeline, True, MAX_AVATARS),
+}
+
+
+def measure(fn, runs: int) -> Tuple[float, float]:
+    """
+    (best, median) seconds. The best run is compared with the baseline: it is
+    the least noisy. Fast cases get extra runs, up to MIN_CASE_TIME_S in total.
+    """
+    start = time.perf_counter()
+    fn()  # warm caches
+    first = time.perf_counter() - start
+    runs = max(runs, min(MAX_RUNS, int(MIN_CASE_TIME_S / max(first, 1e-6))))
+    timings = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(runs):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return min(timings), statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed slowdown vs baseline (0.5 = 50%%)")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f).get("results", {})
+    except (OSError, ValueError):
+        baseline = {}
+
+    results, regressions = {}, []
+    print(f"{'case':<28}{'best':>12}{'median':>12}{'items/s':>14}{'baseline':>12}{'change':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        env = Environment(tmp)
+        try:
+            for name in args.cases:
+                builder, scales, cap = CASES[name]
+                sizes = sorted({min(size, cap or size) for size in args.sizes}) if scales else [0]
+                for size in sizes:
+                    label = f"{name}[{size}]" if scales else name
+                    try:
+                        items, fn = builder(env, size)
+                    except ImportError as e:
+                        print(f"{label:<28}  skipped ({e.name or e} not installed)")
+                        break
+                    best, median = measure(fn, args.runs)
+                    base = baseline.get(label)
+                    if base and best / base - 1 > args.tolerance and not args.update_baseline:
+                        # Confirm before reporting: one slow pass is usually the machine, not the code
+                        best = min(best, measure(fn, args.runs)[0])
+                    results[label] = best
+                    change = ""
+                    if base:
+                        ratio = best / base - 1
+                        change = f"{ratio:+.0%}"
+                        if ratio > args.tolerance and best - base > NOISE_FLOOR_S:
+                            regressions.append((label, base, best))
+                            change += " !"
+                    base_text = f"{base * 1000:.2f} ms" if base else "-"
+                    print(f"{label:<28}{best * 1000:>9.2f} ms{median * 1000:>9.2f} ms{items / best:>14,.0f}"
+                          f"{base_text:>12}{change:>9}")
+        finally:
+            env.close()
+
+    if args.update_baseline:
+        merged = dict(baseline, **results)
+        with open(args.baseline, 'w') as f:
+            json.dump({"machine": f"{platform.system()} {platform.machine()}, Python {platform.python_version()}",
+                       "updated": time.strftime("%Y-%m-%d"), "results": dict(sorted(merged.items()))}, f, indent=2)
+            f.write("\n")
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    if regressions:
+        for label, base, best in regressions:
+            print(f"FAIL: {label} took {best * 1000:.2f} ms (baseline {base * 1000:.2f} ms)")
+        return 1
+    print(f"OK: no case slower than its baseline by more than {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+Measures what tray mode saves: starts `python src/main.py` with
+GHM_TRAY_PROBE set, which builds every tab, records the resident set size,
+minimizes to the tray (releasing the widget tree and decoded avatars) and
+records it again. Needs a display (use xvfb-run on a headless Linux box).
+Fails (exit code 1) when hiding the window does not lower the footprint.
+
+Usage:
+    python benchmarks/bench_tray_memory.py [--runs 3]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+MAIN = os.path.join(SRC, "main.py")
+
+
+def footprint():
+    """Returns (RSS bytes with the window shown, RSS bytes in tray mode)."""
+    env = dict(os.environ, GHM_TRAY_PROBE="1")
+    proc = subprocess.Popen([sys.executable, MAIN], cwd=SRC, env=env, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, text=True)
+    for line in proc.stdout:
+        if line.startswith("TRAY_FOOTPRINT"):
+            proc.wait(timeout=30)
+            shown, hidden = line.split()[1:3]
+            if shown == "None" or hidden == "None":
+                raise RuntimeError("resident memory cannot be read on this platform")
+            return int(shown), int(hidden)
+    proc.wait(timeout=30)
+    raise RuntimeError(f"GUI exited without reporting:\n{proc.stderr.read()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    try:
+        results = [footprint() for _ in range(args.runs)]
+    except RuntimeError as e:
+        print(f"FAIL: {e}")
+        return 1
+
+    shown = statistics.median(s for s, _ in results) / 2**20
+    hidden = statistics.median(h for _, h in results) / 2**20
+    print(f"window shown: {shown:.1f} MiB, tray mode: {hidden:.1f} MiB "
+          f"(-{shown - hidden:.1f} MiB, -{(shown - hidden) / shown:.0%})")
+    if hidden >= shown:
+        print("FAIL: tray mode does not release memory")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,40 @@
 import json
+import logging
 import os
 import uuid
-from typing import List, Dict, Optional
+from typing import Callable, Iterable, List, Dict, Optional, Tuple
+
+from atomic_file import write_json
+from metrics import timed
 
 ACCOUNTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'accounts.json')
 
+# Fields an account record sets (besides its id)
+EDITABLE_FIELDS = ("alias", "username", "email", "ssh_key_path", "gpg_key_id")
+
+
+def _login_key(acc: Dict) -> Tuple[str, str]:
+    return (acc.get("username") or "").casefold(), (acc.get("email") or "").casefold()
+
+
 class AccountManager:
     def __init__(self, storage_file: str = ACCOUNTS_FILE):
         self.storage_file = storage_file
         self.accounts: List[Dict] = self._load_accounts()
+        # listener(event, account) after every change: "add", "update", "remove" or "reload" (account None)
+        self._listeners: List[Callable] = []
+
+    def add_listener(self, listener: Callable):
+        self._listeners.append(listener)
 
+    def _notify(self, event: str, account: Optional[Dict]):
+        for listener in list(self._listeners):
+            try:
+                listener(event, account)
+            except Exception:
+                logging.exception(f"Account listener failed on {event}")
+
+    @timed("store.load")
     def _load_accounts(self) -> List[Dict]:
         if not os.path.exists(self.storage_file):
             return []
@@ -19,9 +44,9 @@ class AccountManager:
         except json.JSONDecodeError:
             return []
 
-    def _save_accounts(self):
-        with open(self.storage_file, 'w') as f:
-            json.dump(self.accounts, f, indent=4)
+    @timed("store.save")
+    def _save_accounts(self, accounts: Optional[List[Dict]] = None):
+        write_json(self.storage_file, self.accounts if accounts is None else accounts)
 
     def add_account(self, alias: str, username: str, email: str, ssh_key_path: str, gpg_key_id: str = None) -> Dict:
         """Adds a new account and saves it."""
@@ -35,8 +60,68 @@ class AccountManager:
         }
         self.accounts.append(new_account)
         self._save_accounts()
+        self._notify("add", new_account)
         return new_account
 
+    @timed("store.import")
+    def import_accounts(self, records: Iterable[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Adds or updates many accounts with one atomic save (nothing changes if
+        it fails). A record updates the account with the same id, else the one
+        with the same username and email (case-insensitive); later records win,
+        and fields a record leaves empty keep their current value. Records are
+        dicts with the add_account fields and an optional id.
+        Returns (added, updated); accounts a record did not change are in neither.
+        """
+        accounts = list(self.accounts)
+        by_id = {acc["id"]: i for i, acc in enumerate(accounts)}
+        by_login = {_login_key(acc): i for i, acc in enumerate(accounts)}
+        added_ids, updated_ids = set(), set()
+        for record in records:
+            i = by_id.get(record.get("id"))
+            if i is None:
+                i = by_login.get(_login_key(record))
+            if i is None:
+                entry = {"id": record.get("id") or str(uuid.uuid4())}
+                entry.update((field, record.get(field)) for field in EDITABLE_FIELDS)
+                entry["alias"] = entry["alias"] or entry["username"]
+                i = len(accounts)
+                accounts.append(entry)
+                added_ids.add(entry["id"])
+            else:
+                changes = {field: record[field] for field in EDITABLE_FIELDS
+                           if record.get(field) is not None and record[field] != accounts[i].get(field)}
+                if not changes:
+                    continue
+                by_login.pop(_login_key(accounts[i]), None)
+                # A copy: the stored account only changes once the save succeeded
+                entry = accounts[i] = dict(accounts[i], **changes)
+                if entry["id"] not in added_ids:
+                    updated_ids.add(entry["id"])
+            by_id[entry["id"]] = i
+            by_login[_login_key(entry)] = i
+        originals = {acc["id"]: acc for acc in self.accounts if acc["id"] in updated_ids}
+        # Changed and changed back within the batch: not an update
+        updated_ids = {acc_id for acc_id in updated_ids if accounts[by_id[acc_id]] != originals[acc_id]}
+        if not added_ids and not updated_ids:
+            return [], []
+
+        self._save_accounts(accounts)
+        # Updates go into the existing dicts, which the UI may still hold
+        for i, acc in enumerate(accounts):
+            original = originals.get(acc["id"])
+            if original is not None:
+                original.update(acc)
+                accounts[i] = original
+        self.accounts = accounts
+        added = [acc for acc in accounts if acc["id"] in added_ids]
+        updated = [acc for acc in accounts if acc["id"] in updated_ids]
+        for acc in added:
+            self._notify("add", acc)
+        for acc in updated:
+            self._notify("update", acc)
+        return added, updated
+
     def update_account(self, account_id: str, alias: str, username: str, email: str, ssh_key_path: str, gpg_key_id: str = None) -> Optional[Dict]:
         """Updates an existing account."""
         for acc in self.accounts:
@@ -47,22 +132,29 @@ class AccountManager:
                 acc["ssh_key_path"] = ssh_key_path
                 acc["gpg_key_id"] = gpg_key_id
                 self._save_accounts()
+                self._notify("update", acc)
                 return acc
         return None
 
     def delete_account(self, account_id: str) -> bool:
         """Deletes an account by ID."""
-        initial_count = len(self.accounts)
+        removed = self.get_account_by_id(account_id)
+        if removed is None:
+            return False
         self.accounts = [acc for acc in self.accounts if acc["id"] != account_id]
-        if len(self.accounts) < initial_count:
-            self._save_accounts()
-            return True
-        return False
+        self._save_accounts()
+        self._notify("remove", removed)
+        return True
 
     def get_accounts(self) -> List[Dict]:
         """Returns list of all accounts."""
         return self.accounts
 
+    def reload(self):
+        """Re-reads the storage file (e.g. after the CLI changed it)."""
+        self.accounts = self._load_accounts()
+        self._notify("reload", None)
+
     def get_account_by_id(self, account_id: str) -> Optional[Dict]:
         for acc in self.accounts:
             if acc["id"] == account_id:
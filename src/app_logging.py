@@ -0,0 +1,137 @@
+"""
+Application log: non-blocking, structured and rotated.
+
+Any thread logs through the standard `logging` calls. The root logger only
+puts records on an in-memory queue; one background thread formats them as
+JSON lines and writes logs/app.log:
+
+    {"ts": "2026-10-18T09:30:12.345+02:00", "level": "INFO", "logger": "root",
+     "thread": "task_0", "msg": "...", "exc": "Traceback ..."}
+
+The file is rotated when it passes MAX_BYTES or gets older than MAX_AGE
+(app.log.1 is the newest backup). At most BACKUP_COUNT backups are kept and
+none older than RETENTION_DAYS; the same limit removes daily
+app_YYYYMMDD.log files left by older versions.
+
+GHM_LOG_LEVEL (e.g. DEBUG) changes the level; DEBUG also records the stderr
+of failed git/ssh/gpg commands.
+"""
+import atexit
+import glob
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from datetime import datetime
+from typing import Optional
+
+LOG_NAME = "app.log"
+MAX_BYTES = 5 * 1024 * 1024
+MAX_AGE = 24 * 3600
+BACKUP_COUNT = 10
+RETENTION_DAYS = 14
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).astimezone().isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Resolves the message and traceback on the calling thread, but leaves the layout to the writer."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class RotatingJsonFileHandler(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler that also rolls over by age and prunes old backups."""
+
+    def __init__(self, filename: str, max_bytes: int = MAX_BYTES, max_age: float = MAX_AGE,
+                 backup_count: int = BACKUP_COUNT, retention_days: float = RETENTION_DAYS):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.max_age = max_age
+        self.retention = retention_days * 86400
+        try:
+            # A file last written more than max_age ago is rolled over before the first record
+            self._started = min(time.time(), os.stat(filename).st_mtime)
+        except OSError:
+            self._started = time.time()
+        self.setFormatter(JsonFormatter())
+        self.prune()
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.max_age and time.time() - self._started >= self.max_age and os.path.exists(self.baseFilename):
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        super().doRollover()
+        self._started = time.time()
+        self.prune()
+
+    def prune(self):
+        """Deletes backups (and legacy daily logs) older than the retention period."""
+        cutoff = time.time() - self.retention
+        log_dir = os.path.dirname(self.baseFilename)
+        old = glob.glob(self.baseFilename + ".*") + glob.glob(os.path.join(log_dir, "app_*.log"))
+        for path in old:
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+def setup_logging(log_dir: str, level: Optional[str] = None) -> logging.handlers.QueueListener:
+    """Routes the root logger through the queue to logs/app.log. Call once at startup."""
+    global _listener
+    if _listener is not None:
+        return _listener
+    os.makedirs(log_dir, exist_ok=True)
+    level = (level or os.environ.get("GHM_LOG_LEVEL") or "INFO").upper()
+
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_QueueHandler(records))
+    root.setLevel(getattr(logging, level, logging.INFO))
+
+    _listener = logging.handlers.QueueListener(records, RotatingJsonFileHandler(os.path.join(log_dir, LOG_NAME)))
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Writes out whatever is still queued. Call before os._exit(), which skips atexit handlers."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
@@ -0,0 +1,28 @@
+import os
+import sys
+
+# Shared by the GUI (main.py) and the headless CLI (cli.py).
+# Must stay free of GUI imports and must not create anything on import.
+
+# Determine Base Path (Frozen vs Source)
+if getattr(sys, 'frozen', False):
+    # Running as compiled exe
+    # Mutable data (logs, config) goes relative to the EXE
+    BASE_DIR = os.path.dirname(sys.executable)
+    # Assets (images) go in the temp folder provided by PyInstaller
+    ASSETS_DIR = sys._MEIPASS
+else:
+    # Running from source
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ASSETS_DIR = BASE_DIR
+
+DATA_DIR = os.path.join(BASE_DIR, "data")
+LOG_DIR = os.path.join(BASE_DIR, "logs")
+ACCOUNTS_FILE = os.path.join(DATA_DIR, "accounts.json")
+REPOS_FILE = os.path.join(DATA_DIR, "repositories.json")
+GIT_INCLUDES_DIR = os.path.join(DATA_DIR, "git_includes")
+SNAPSHOTS_DIR = os.path.join(DATA_DIR, "snapshots")
+
+
+def data_file(name: str) -> str:
+    return os.path.join(DATA_DIR, name)
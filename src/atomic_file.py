@@ -0,0 +1,24 @@
+import json
+import os
+import threading
+
+
+def write_json(path: str, data, indent: int = 4):
+    """
+    Writes `data` as JSON to a temporary file next to `path`, then renames it
+    over `path`. Readers (and a crash mid-write) see the old file or the new
+    one, never a truncated mix.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        # One write of the whole text: json.dump issues a write per token
+        text = json.dumps(data, indent=indent)
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -1,55 +1,112 @@
+import logging
 import os
-import requests
 import threading
-from PIL import Image, ImageTk
+from PIL import Image
 import customtkinter as ctk
-from io import BytesIO
+
+from metrics import span
+
+AVATAR_URL = "https://github.com/{username}.png?size=200"
 
 class AvatarManager:
-    def __init__(self, cache_dir: str):
+    def __init__(self, cache_dir: str, scheduler=None, avatar_url: str = AVATAR_URL):
         self.cache_dir = cache_dir
+        # URL template ({username}); the benchmark points it at a local server
+        self.avatar_url = avatar_url
+        # Optional TaskScheduler: downloads run on its pool and callbacks on the Tk thread
+        self.scheduler = scheduler
         if not os.path.exists(self.cache_dir):
             os.makedirs(self.cache_dir)
-        
+
         # Default avatar placeholder (a simple colored circle or similar could be generated, but for now we'll handle None)
-        self.default_avatar = None 
+        self.default_avatar = None
+
+        # Decoded images, keyed by (username, size) and validated by file mtime.
+        # PIL images may be decoded on any thread; CTkImages are only built on the Tk thread.
+        self._lock = threading.Lock()
+        self._pil_cache = {}
+        self._ctk_cache = {}
+
+    def clear_cache(self):
+        """Drops every decoded image (tray mode); they are decoded again on next use."""
+        with self._lock:
+            self._pil_cache.clear()
+        self._ctk_cache.clear()
 
     def get_avatar_path(self, username: str) -> str:
         return os.path.join(self.cache_dir, f"{username}.png")
 
     def fetch_avatar(self, username: str, callback=None):
         """
-        Fetches avatar in a background thread.
-        callback(username, image_path) is called when done.
+        Fetches avatar in the background.
+        callback(username, image_path) is called when done; with a scheduler
+        it runs on the Tk thread, otherwise on the download thread.
         """
         def _fetch():
             target_path = self.get_avatar_path(username)
             if os.path.exists(target_path):
                 # Already cached
-                if callback: callback(username, target_path)
-                return
+                return target_path
 
             try:
-                url = f"https://github.com/{username}.png?size=200"
-                response = requests.get(url, timeout=10)
+                import requests  # loaded on first download, not at startup
+                url = self.avatar_url.format(username=username)
+                with span("avatar.fetch"):
+                    response = requests.get(url, timeout=10)
                 if response.status_code == 200:
                     with open(target_path, 'wb') as f:
                         f.write(response.content)
-                    if callback: callback(username, target_path)
+                    return target_path
             except Exception as e:
-                print(f"Failed to fetch avatar for {username}: {e}")
+                logging.warning(f"Failed to fetch avatar for {username}: {e}")
+            return None
 
-        threading.Thread(target=_fetch, daemon=True).start()
+        def _done(path):
+            if path and callback:
+                callback(username, path)
 
-    def load_avatar_image(self, username: str, size: tuple = (40, 40)):
+        if self.scheduler is not None:
+            self.scheduler.submit(_fetch, on_done=_done, name=f"avatar:{username}")
+        else:
+            threading.Thread(target=lambda: _done(_fetch()), daemon=True).start()
+
+    def load_avatar_pil(self, username: str, size: tuple = (40, 40)):
         """
-        Returns a CTkImage if cached, else None.
+        Returns the decoded PIL image if cached on disk, else None.
+        Safe to call from worker threads, so decoding stays off the Tk thread.
         """
         path = self.get_avatar_path(username)
-        if os.path.exists(path):
-            try:
-                pil_img = Image.open(path)
-                return ctk.CTkImage(light_image=pil_img, dark_image=pil_img, size=size)
-            except:
-                return None
-        return None
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        key = (username, size)
+        with self._lock:
+            cached = self._pil_cache.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            pil_img = Image.open(path)
+            pil_img.load()
+            # Keep 2x the display size for HiDPI scaling, drop the rest
+            pil_img.thumbnail((size[0] * 2, size[1] * 2))
+        except OSError:
+            return None
+        with self._lock:
+            self._pil_cache[key] = (mtime, pil_img)
+        return pil_img
+
+    def load_avatar_image(self, username: str, size: tuple = (40, 40)):
+        """
+        Returns a CTkImage if cached, else None. Tk thread only.
+        """
+        pil_img = self.load_avatar_pil(username, size)
+        if pil_img is None:
+            return None
+        key = (username, size)
+        cached = self._ctk_cache.get(key)
+        if cached and cached[0] is pil_img:
+            return cached[1]
+        image = ctk.CTkImage(light_image=pil_img, dark_image=pil_img, size=size)
+        self._ctk_cache[key] = (pil_img, image)
+        return image
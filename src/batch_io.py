@@ -0,0 +1,265 @@
+"""
+Bulk import / export of accounts and repository bindings.
+
+Two formats, picked from the file extension unless given:
+
+    .jsonl  one JSON object per line
+    .csv    a header row with the field names, then one record per row
+
+    accounts:      id, alias, username, email, ssh_key_path, gpg_key_id
+    repositories:  path, alias, account_id, account, binding, include_path
+
+Import streams the file: each record is validated as it is read, and
+invalid ones are reported by line number and skipped instead of failing the
+whole file. Valid records go to AccountManager.import_accounts /
+RepositoryManager.import_repos, which de-duplicate through their id, login
+and path indexes and commit the whole batch with a single atomic write.
+A repository record names its account by account_id, or by alias or
+username in `account`. Imported bindings are applied through GitSwitcher
+first (local git config, or the includeIf of a directory tree); those that
+fail are reported like invalid records and not saved. Export writes the
+same formats one record at a time.
+"""
+import csv
+import json
+import os
+from typing import Dict, IO, Iterable, Iterator, List, Optional, Tuple
+
+from account_manager import AccountManager, EDITABLE_FIELDS
+from path_trie import path_components
+from repository_manager import RepositoryManager, BINDING_REPO, BINDING_DIRECTORY
+
+FORMATS = ("jsonl", "csv")
+ACCOUNT_FIELDS = ["id", *EDITABLE_FIELDS]
+REPO_FIELDS = ["path", "alias", "account_id", "account", "binding", "include_path"]
+
+
+class ImportReport:
+    """Outcome of one import: entries added / updated and (line, reason) of skipped records."""
+
+    def __init__(self):
+        self.added: List[Dict] = []
+        self.updated: List[Dict] = []
+        self.errors: List[Tuple[int, str]] = []
+
+    def summary(self) -> str:
+        text = f"{len(self.added)} added, {len(self.updated)} updated"
+        if self.errors:
+            text += f", {len(self.errors)} skipped"
+        return text
+
+
+def detect_format(path: str, fmt: Optional[str] = None) -> str:
+    if fmt:
+        return fmt
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    if ext in ("jsonl", "ndjson", "json"):
+        return "jsonl"
+    if ext == "csv":
+        return "csv"
+    raise ValueError(f"Cannot tell the format of {path!r}: use a .jsonl or .csv file, or pass the format.")
+
+
+# --- Reading ----------------------------------------------------------------
+
+def iter_records(f: IO[str], fmt: str) -> Iterator[Tuple[int, object]]:
+    """Yields (line number, record) one at a time; a line that is not a record yields a ValueError."""
+    if fmt == "csv":
+        reader = csv.DictReader(f)
+        for row in reader:
+            # Empty cells mean "not set"
+            yield reader.line_num, {k: (v or None) for k, v in row.items() if k}
+        return
+    for line_no, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, ValueError(f"invalid JSON ({e})")
+            continue
+        yield line_no, record if isinstance(record, dict) else ValueError("not a JSON object")
+
+
+def _text(record: Dict, field: str, required: bool = False) -> Optional[str]:
+    value = record.get(field)
+    if value is None or value == "":
+        if required:
+            raise ValueError(f"missing {field}")
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"{field} must be text")
+    value = value.strip()
+    if "\n" in value or "\r" in value:
+        raise ValueError(f"{field} must be a single line")
+    if required and not value:
+        raise ValueError(f"missing {field}")
+    return value or None
+
+
+def validate_account(record: Dict) -> Dict:
+    """Normalized account record, or ValueError."""
+    username = _text(record, "username", required=True)
+    email = _text(record, "email", required=True)
+    if "@" not in email or " " in email:
+        raise ValueError(f"invalid email {email!r}")
+    # Required, as in the Add Account dialog: activation needs a key
+    ssh_key_path = _text(record, "ssh_key_path", required=True)
+    return {
+        "id": _text(record, "id"),
+        "alias": _text(record, "alias"),  # new accounts default to the username
+        "username": username,
+        "email": email,
+        "ssh_key_path": os.path.expanduser(ssh_key_path),
+        "gpg_key_id": _text(record, "gpg_key_id"),
+    }
+
+
+class _AccountLookup:
+    """account_id / alias / username -> id, built once per import."""
+
+    def __init__(self, accounts: AccountManager):
+        self.ids = {acc["id"] for acc in accounts.get_accounts()}
+        self.names: Dict[str, str] = {}
+        # Aliases take precedence over usernames, as in the CLI's find_account
+        for field in ("username", "alias"):
+            for acc in accounts.get_accounts():
+                if acc.get(field):
+                    self.names[acc[field].casefold()] = acc["id"]
+
+    def resolve(self, record: Dict) -> str:
+        account_id = _text(record, "account_id")
+        if account_id in self.ids:
+            return account_id
+        # Ids differ between machines: an export also carries the account's alias
+        name = _text(record, "account")
+        if name:
+            if name in self.ids:
+                return name
+            if name.casefold() in self.names:
+                return self.names[name.casefold()]
+        if not account_id and not name:
+            raise ValueError("missing account_id or account")
+        raise ValueError(f"unknown account {name or account_id!r}")
+
+
+def validate_repo(record: Dict, lookup: _AccountLookup) -> Dict:
+    """Normalized binding record, or ValueError."""
+    path = os.path.abspath(os.path.expanduser(_text(record, "path", required=True)))
+    binding = _text(record, "binding") or BINDING_REPO
+    if binding not in (BINDING_REPO, BINDING_DIRECTORY):
+        raise ValueError(f"binding must be {BINDING_REPO!r} or {BINDING_DIRECTORY!r}")
+    # include_path is not read: it names a file on the exporting machine, and
+    # directory bindings are applied with this install's include file
+    return {
+        "path": path,
+        "alias": _text(record, "alias") or os.path.basename(os.path.normpath(path)),
+        "account_id": lookup.resolve(record),
+        "binding": binding,
+    }
+
+
+def _valid(rows: Iterable[Tuple[int, object]], validate, report: ImportReport) -> Iterator[Tuple[int, Dict]]:
+    for line_no, record in rows:
+        try:
+            if isinstance(record, ValueError):
+                raise record
+            yield line_no, validate(record)
+        except ValueError as e:
+            report.errors.append((line_no, str(e)))
+
+
+def import_accounts(accounts: AccountManager, f: IO[str], fmt: str) -> ImportReport:
+    report = ImportReport()
+    report.added, report.updated = accounts.import_accounts(
+        record for _, record in _valid(iter_records(f, fmt), validate_account, report))
+    return report
+
+
+def import_repos(repos: RepositoryManager, accounts: AccountManager, f: IO[str], fmt: str,
+                 switcher=None) -> ImportReport:
+    """
+    Imports bindings and applies them through `switcher` (a GitSwitcher);
+    only those applied are saved. Without a switcher they are only recorded.
+    """
+    report = ImportReport()
+    lookup = _AccountLookup(accounts)
+
+    def validate(record: Dict) -> Dict:
+        repo = validate_repo(record, lookup)
+        # A path already bound as the other kind is skipped, not overwritten
+        conflict = repos.binding_conflict(repo["path"], repo["binding"])
+        if conflict:
+            raise ValueError(conflict)
+        return repo
+
+    # Normalized path -> (line number, record); later records for a path win
+    staged: Dict[Tuple[str, ...], Tuple[int, Dict]] = {}
+    for line_no, repo in _valid(iter_records(f, fmt), validate, report):
+        staged[tuple(path_components(repo["path"]))] = (line_no, repo)
+
+    records = list(staged.values())
+    if switcher is not None:
+        records = _apply_bindings(switcher, accounts, records, report)
+    report.added, report.updated = repos.import_repos(repo for _, repo in records)
+    return report
+
+
+def _apply_bindings(switcher, accounts: AccountManager, records: List[Tuple[int, Dict]],
+                    report: ImportReport) -> List[Tuple[int, Dict]]:
+    """Writes the bindings' git config. Returns the records applied; failures go to report.errors."""
+    applied = []
+    by_account: Dict[str, List[Tuple[int, Dict]]] = {}
+    for line_no, repo in records:
+        if repo["binding"] == BINDING_REPO:
+            by_account.setdefault(repo["account_id"], []).append((line_no, repo))
+            continue
+        acc = accounts.get_account_by_id(repo["account_id"])
+        repo["include_path"] = os.path.join(switcher.includes_dir, f"{acc['id']}.gitconfig")
+        ok, msg = switcher.bind_directory(repo["path"], repo["include_path"], acc['username'], acc['email'],
+                                          acc['ssh_key_path'], acc.get('gpg_key_id'))
+        if ok:
+            applied.append((line_no, repo))
+        else:
+            report.errors.append((line_no, msg))
+    # One parallel batch per account
+    for account_id, entries in by_account.items():
+        acc = accounts.get_account_by_id(account_id)
+        results = switcher.bind_repositories([repo["path"] for _, repo in entries],
+                                             acc['username'], acc['email'], acc['ssh_key_path'])
+        for (line_no, repo), (path, ok, msg) in zip(entries, results):
+            if ok:
+                applied.append((line_no, repo))
+            else:
+                report.errors.append((line_no, f"{path}: {msg}"))
+    report.errors.sort()
+    # Saved in file order
+    return sorted(applied, key=lambda entry: entry[0])
+
+
+# --- Writing ----------------------------------------------------------------
+
+def write_records(f: IO[str], records: Iterable[Dict], fields: List[str], fmt: str) -> int:
+    """Writes records one at a time (only `fields`, in that order). Returns how many."""
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        for record in records:
+            writer.writerow({k: "" if v is None else v for k, v in record.items()})
+            count += 1
+        return count
+    for record in records:
+        f.write(json.dumps({k: record.get(k) for k in fields}, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def export_accounts(accounts: AccountManager, f: IO[str], fmt: str) -> int:
+    return write_records(f, accounts.get_accounts(), ACCOUNT_FIELDS, fmt)
+
+
+def export_repos(repos: RepositoryManager, accounts: AccountManager, f: IO[str], fmt: str) -> int:
+    aliases = {acc["id"]: acc.get("alias") for acc in accounts.get_accounts()}
+    records = ({**repo, "account": aliases.get(repo.get("account_id"))} for repo in repos.get_all_bindings())
+    return write_records(f, records, REPO_FIELDS, fmt)
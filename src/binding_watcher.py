@@ -0,0 +1,332 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from git_config import read_git_config, repo_config_path
+from identity_audit import AUDIT_DRIFT
+
+# inotify event bits (linux/inotify.h)
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# git and most editors replace files via rename, so the parent directory is
+# watched and events are filtered by file name.
+_WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_inotify():
+    """Returns libc with inotify symbols, or None when unavailable (non-Linux)."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class FileWatcher:
+    """
+    Watches a set of files and calls on_change(paths) with the files that
+    changed once a burst of events has been quiet for `debounce` seconds.
+
+    Uses inotify on Linux (one watch per parent directory, nothing happens
+    while files are idle). Elsewhere, or for directories inotify refuses
+    (watch limit reached), it falls back to stat polling every
+    `poll_interval` seconds, comparing (mtime, size, inode).
+    Callbacks run on the watcher thread.
+    """
+    def __init__(self, on_change: Callable[[List[str]], None], debounce: float = 0.5,
+                 poll_interval: float = 2.0, use_inotify: bool = True):
+        self.on_change = on_change
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._libc = _load_inotify() if use_inotify else None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._paths: Set[str] = set()
+        self._inotify_fd = -1
+        self._wd_to_dir: Dict[int, str] = {}
+        self._dir_to_wd: Dict[str, int] = {}
+        self._dir_names: Dict[str, Set[str]] = {}   # watched dir -> watched file names
+        self._polled: Dict[str, Optional[Tuple]] = {}  # path -> last stat signature
+        self._pending: Set[str] = set()
+        self._last_event = 0.0
+
+    @property
+    def backend(self) -> str:
+        return "inotify" if self._inotify_fd >= 0 else "polling"
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    @property
+    def paths(self) -> Set[str]:
+        with self._lock:
+            return set(self._paths)
+
+    @staticmethod
+    def _signature(path: str) -> Optional[Tuple]:
+        try:
+            st = os.stat(path)
+            return (st.st_mtime_ns, st.st_size, st.st_ino)
+        except OSError:
+            return None
+
+    def set_paths(self, paths: Iterable[str]):
+        """Replaces the watched file set. Safe to call while running."""
+        new_paths = {os.path.abspath(p) for p in paths}
+        with self._lock:
+            self._paths = new_paths
+            dir_names: Dict[str, Set[str]] = {}
+            for path in new_paths:
+                dir_names.setdefault(os.path.dirname(path), set()).add(os.path.basename(path))
+            self._dir_names = dir_names
+
+            if self._inotify_fd >= 0:
+                for directory in list(self._dir_to_wd):
+                    if directory not in dir_names:
+                        self._libc.inotify_rm_watch(self._inotify_fd, self._dir_to_wd.pop(directory))
+                for directory in dir_names:
+                    if directory not in self._dir_to_wd:
+                        wd = self._libc.inotify_add_watch(self._inotify_fd, os.fsencode(directory), _WATCH_MASK)
+                        if wd >= 0:
+                            self._dir_to_wd[directory] = wd
+                self._wd_to_dir = {wd: d for d, wd in self._dir_to_wd.items()}
+
+            # Anything inotify does not cover (or everything, without inotify) is polled
+            polled = {}
+            for path in new_paths:
+                if os.path.dirname(path) not in self._dir_to_wd:
+                    polled[path] = self._polled[path] if path in self._polled else self._signature(path)
+            self._polled = polled
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        if self._libc is not None and self._inotify_fd < 0:
+            fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0:
+                self._inotify_fd = fd
+        self.set_paths(self._paths)
+        self._thread = threading.Thread(target=self._run, name="FileWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        with self._lock:
+            if self._inotify_fd >= 0:
+                os.close(self._inotify_fd)
+                self._inotify_fd = -1
+            self._dir_to_wd.clear()
+            self._wd_to_dir.clear()
+
+    def _mark(self, path: str):
+        self._pending.add(path)
+        self._last_event = time.monotonic()
+
+    def _read_inotify(self, timeout: float):
+        try:
+            ready, _, _ = select.select([self._inotify_fd], [], [], timeout)
+        except (OSError, ValueError):
+            return
+        if not ready:
+            return
+        try:
+            data = os.read(self._inotify_fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        with self._lock:
+            while offset + _EVENT_HEADER.size <= len(data):
+                wd, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + name_len].rstrip(b"\0").decode(errors="replace")
+                offset += name_len
+                if mask & IN_Q_OVERFLOW:
+                    # Events were dropped: treat every watched file as changed
+                    for path in self._paths:
+                        self._mark(path)
+                    continue
+                if mask & IN_IGNORED:
+                    # Directory vanished; poll its files until it comes back
+                    directory = self._wd_to_dir.pop(wd, None)
+                    if directory:
+                        self._dir_to_wd.pop(directory, None)
+                        for file_name in self._dir_names.get(directory, ()):
+                            path = os.path.join(directory, file_name)
+                            self._polled[path] = None
+                            self._mark(path)
+                    continue
+                directory = self._wd_to_dir.get(wd)
+                if directory and name in self._dir_names.get(directory, ()):
+                    self._mark(os.path.join(directory, name))
+
+    def _poll(self):
+        with self._lock:
+            for path, previous in list(self._polled.items()):
+                current = self._signature(path)
+                if current != previous:
+                    self._polled[path] = current
+                    self._mark(path)
+
+    def _run(self):
+        next_poll = time.monotonic()
+        while not self._stop.is_set():
+            wait = min(self.poll_interval, self.debounce)
+            if self._inotify_fd >= 0:
+                self._read_inotify(wait)
+            else:
+                self._stop.wait(wait)
+
+            now = time.monotonic()
+            if self._polled and now >= next_poll:
+                self._poll()
+                next_poll = now + self.poll_interval
+
+            if self._pending and now - self._last_event >= self.debounce:
+                with self._lock:
+                    changed = sorted(self._pending)
+                    self._pending.clear()
+                try:
+                    self.on_change(changed)
+                except Exception as e:
+                    logging.error(f"File watcher callback failed: {e}")
+
+
+class BindingEnforcer:
+    """
+    Keeps repository bindings in force while the app runs.
+    Watches every bound repo's config, the directory-binding include files,
+    the global git configs (~/.gitconfig and the XDG one) and ~/.ssh/config. When one changes, only the affected
+    bindings are re-checked and re-applied.
+    on_identity_change() is called (from the watcher thread) when the
+    global identity files change, so the UI can refresh.
+    """
+    def __init__(self, account_manager, repo_manager, git_switcher, identity_auditor,
+                 on_identity_change: Callable = None, **watcher_options):
+        self.account_manager = account_manager
+        self.repo_manager = repo_manager
+        self.git_switcher = git_switcher
+        self.identity_auditor = identity_auditor
+        self.on_identity_change = on_identity_change
+        self.watcher = FileWatcher(self._on_files_changed, **watcher_options)
+        self._config_to_repos: Dict[str, List[Dict]] = {}
+        self._include_to_binding: Dict[str, Dict] = {}
+
+    @property
+    def running(self) -> bool:
+        return self.watcher.running
+
+    def start(self):
+        self.refresh()
+        self.watcher.start()
+        logging.info(f"Binding watch mode started ({self.watcher.backend}, {len(self.watcher.paths)} files)")
+
+    def stop(self):
+        self.watcher.stop()
+        logging.info("Binding watch mode stopped")
+
+    def refresh(self):
+        """Rebuilds the watch set from the current bindings."""
+        config_to_repos: Dict[str, List[Dict]] = {}
+        for repo in self.repo_manager.get_repos():
+            config_path = repo_config_path(repo["path"])
+            if config_path:
+                config_to_repos.setdefault(os.path.abspath(config_path), []).append(repo)
+        include_to_binding = {
+            os.path.abspath(b["include_path"]): b
+            for b in self.repo_manager.get_directory_bindings() if b.get("include_path")
+        }
+        self._config_to_repos = config_to_repos
+        self._include_to_binding = include_to_binding
+
+        self.watcher.set_paths(set(config_to_repos) | set(include_to_binding) | set(self._global_paths()))
+
+    def _global_paths(self) -> List[str]:
+        # Activation writes both global git configs, so drift in either is re-enforced
+
+        return [os.path.abspath(p) for p in self.git_switcher.global_config_paths() + [self.git_switcher.ssh_config_path]]
+
+    def _on_files_changed(self, paths: List[str]):
+        repos = []
+        directory_bindings = []
+        global_changed = False
+        for path in paths:
+            if path in self._config_to_repos:
+                repos.extend(self._config_to_repos[path])
+            elif path in self._include_to_binding:
+                directory_bindings.append(self._include_to_binding[path])
+            elif path in self._global_paths():
+                global_changed = True
+
+        if repos:
+            results = self.identity_auditor.audit(repos, force=True)
+            drifted = [r for r in results if r["status"] == AUDIT_DRIFT]
+            if drifted:
+                for path, ok, msg in self.identity_auditor.repair(drifted):
+                    logging.info(f"Watch mode re-applied binding to {path}: {msg}" if ok else f"Watch mode failed to repair {path}: {msg}")
+
+        # Include files edited behind our back are rewritten in place
+        for binding in {id(b): b for b in directory_bindings}.values():
+            account = self.account_manager.get_account_by_id(binding["account_id"])
+            if account and self.git_switcher.write_account_include(
+                    binding["include_path"], account["username"], account["email"],
+                    account["ssh_key_path"], account.get("gpg_key_id")):
+                logging.info(f"Watch mode restored include file for {binding['path']}")
+
+        # includeIf entries removed from the global config are added back
+        if global_changed:
+            for binding in self._missing_include_entries():
+                self._reapply_directory_binding(binding)
+
+        if global_changed and self.on_identity_change:
+            self.on_identity_change()
+
+    def _missing_include_entries(self) -> List[Dict]:
+        """Directory bindings whose includeIf entry was removed from the global config."""
+        # git reads both files, so an entry counts wherever it is
+        config = {}
+        for path in self.git_switcher.global_config_paths():
+            config.update(read_git_config(path))
+        missing = []
+        for binding in self.repo_manager.get_directory_bindings():
+            # read_git_config lower-cases the section name only
+            key = f"includeif.{self.git_switcher.gitdir_condition(binding['path'])}.path"
+            if config.get(key) != binding.get("include_path", "").replace("\\", "/"):
+                missing.append(binding)
+        return missing
+
+    def _reapply_directory_binding(self, binding: Dict):
+        account = self.account_manager.get_account_by_id(binding["account_id"])
+        if account is None or not binding.get("include_path"):
+            return
+        ok, msg = self.git_switcher.bind_directory(
+            binding["path"], binding["include_path"], account["username"], account["email"],
+            account["ssh_key_path"], account.get("gpg_key_id"))
+        logging.info(f"Watch mode re-applied directory binding {binding['path']}: {msg}")
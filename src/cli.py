@@ -0,0 +1,446 @@
+"""
+Headless command line interface for GitHub Account Manager Pro.
+
+Shares the data directory with the GUI but never imports the GUI stack,
+so it is cheap enough for shell hooks, prompts and CI:
+
+    python src/cli.py list
+    python src/cli.py switch Work                     (handled by the GUI if it is running)
+    python src/cli.py show                            (restore the running GUI's window)
+    python src/cli.py bind ~/work/project Work        (or --tree ~/work)
+    python src/cli.py status [path] [--json]
+    python src/cli.py audit [--repair] [--force]
+    python src/cli.py daemon [--socket PATH]          (identity daemon for prompts)
+    python src/cli.py prompt [path]
+    python src/cli.py hook install [path] | --global  (block wrong-identity commits)
+    python src/cli.py history [--path FILE]           (config snapshots taken before each change)
+    python src/cli.py history diff ID [AGAINST]
+    python src/cli.py history rollback ID [FILE ...]
+    python src/cli.py import accounts|repos FILE      (.jsonl or .csv, one atomic write)
+    python src/cli.py export accounts|repos [FILE]    (stdout by default)
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+from typing import Dict, List, Optional
+
+from app_paths import DATA_DIR
+from account_manager import AccountManager
+from repository_manager import RepositoryManager, BINDING_DIRECTORY, BINDING_REPO
+from ssh_manager import GitSwitcher
+
+# Exit codes
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_PROBLEMS = 2  # audit found drift / stale bindings, import skipped records
+
+
+class Context:
+    """Creates managers on first use so each command only loads what it needs."""
+    def __init__(self, data_dir: str):
+        self.data_dir = os.path.abspath(data_dir)
+        self._accounts = None
+        self._repos = None
+        self._switcher = None
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.data_dir, name)
+
+    @property
+    def accounts(self) -> AccountManager:
+        if self._accounts is None:
+            self._accounts = AccountManager(storage_file=self.path("accounts.json"))
+        return self._accounts
+
+    @property
+    def repos(self) -> RepositoryManager:
+        if self._repos is None:
+            self._repos = RepositoryManager(storage_file=self.path("repositories.json"))
+        return self._repos
+
+    @property
+    def switcher(self) -> GitSwitcher:
+        if self._switcher is None:
+            from snapshot_store import SnapshotStore
+            self._switcher = GitSwitcher(snapshots=SnapshotStore(self.path("snapshots")),
+                                         includes_dir=self.path("git_includes"))
+        return self._switcher
+
+
+def find_account(accounts: AccountManager, query: str) -> Optional[Dict]:
+    """Matches an account by id, alias or username (case-insensitive)."""
+    wanted = query.casefold()
+    for acc in accounts.get_accounts():
+        if acc["id"] == query:
+            return acc
+    for field in ("alias", "username"):
+        for acc in accounts.get_accounts():
+            if (acc.get(field) or "").casefold() == wanted:
+                return acc
+    return None
+
+
+def _active_account(ctx: Context) -> Optional[Dict]:
+    _, email = ctx.switcher.read_global_user()
+    if not email:
+        return None
+    for acc in ctx.accounts.get_accounts():
+        if acc["email"] == email:
+            return acc
+    return None
+
+
+def _print(data, as_json: bool, lines: List[str]):
+    if as_json:
+        print(json.dumps(data, indent=2))
+    else:
+        print("\n".join(lines))
+
+
+def cmd_list(args, ctx: Context) -> int:
+    active = _active_account(ctx)
+    accounts = ctx.accounts.get_accounts()
+    lines = []
+    for acc in accounts:
+        marker = "*" if active and acc["id"] == active["id"] else " "
+        lines.append(f"{marker} {acc['alias']:<20} {acc['username']:<20} {acc['email']}")
+    if not lines:
+        lines.append("No accounts configured.")
+    _print([dict(acc, active=bool(active and acc["id"] == active["id"])) for acc in accounts], args.json, lines)
+    return EXIT_OK
+
+
+def cmd_switch(args, ctx: Context) -> int:
+    acc = find_account(ctx.accounts, args.account)
+    if acc is None:
+        print(f"Unknown account: {args.account}", file=sys.stderr)
+        return EXIT_ERROR
+    # A running GUI performs the switch itself, so its view stays current
+    from single_instance import send_request
+    # Long enough for the app to finish a switch already in progress (it gives up after 20 s)
+    reply = send_request(ctx.data_dir, {"command": "switch", "account_id": acc["id"]}, timeout=30.0)
+    if reply is not None:
+        success, msg = reply.get("ok", False), reply.get("message", "")
+    else:
+        success, msg = ctx.switcher.activate_account(acc['alias'], acc['email'], acc['ssh_key_path'], acc.get('gpg_key_id'))
+    print(msg, file=sys.stdout if success else sys.stderr)
+    return EXIT_OK if success else EXIT_ERROR
+
+
+def cmd_show(args, ctx: Context) -> int:
+    from single_instance import send_request
+    reply = send_request(ctx.data_dir, {"command": "show"})
+    if reply is None:
+        print("GitHub Account Manager Pro is not running.", file=sys.stderr)
+        return EXIT_ERROR
+    return EXIT_OK
+
+
+def cmd_metrics(args, ctx: Context) -> int:
+    # Latency histograms live in the GUI process; ask it for them
+    from single_instance import send_request
+    reply = send_request(ctx.data_dir, {"command": "metrics", "format": args.format})
+    if reply is None:
+        print("GitHub Account Manager Pro is not running.", file=sys.stderr)
+        return EXIT_ERROR
+    if not reply.get("ok"):
+        print(reply.get("message", ""), file=sys.stderr)
+        return EXIT_ERROR
+    sys.stdout.write(reply["message"])
+    return EXIT_OK
+
+
+def cmd_bind(args, ctx: Context) -> int:
+    acc = find_account(ctx.accounts, args.account)
+    if acc is None:
+        print(f"Unknown account: {args.account}", file=sys.stderr)
+        return EXIT_ERROR
+    path = os.path.abspath(os.path.expanduser(args.path))
+    alias = args.alias or os.path.basename(os.path.normpath(path))
+    conflict = ctx.repos.binding_conflict(path, BINDING_DIRECTORY if args.tree else BINDING_REPO)
+    if conflict:
+        print(conflict, file=sys.stderr)
+        return EXIT_ERROR
+
+    if args.tree:
+        include_path = os.path.join(ctx.path("git_includes"), f"{acc['id']}.gitconfig")
+        success, msg = ctx.switcher.bind_directory(path, include_path, acc['username'], acc['email'],
+                                                   acc['ssh_key_path'], acc.get('gpg_key_id'))
+        if success:
+            ctx.repos.add_directory_binding(path, alias, acc['id'], include_path)
+    else:
+        success, msg = ctx.switcher.set_local_git_user(path, acc['username'], acc['email'], acc['ssh_key_path'])
+        if success:
+            ctx.repos.add_repo(path, alias, acc['id'])
+
+    if success:
+        print(f"{path} is now bound to {acc['alias']}.")
+        return EXIT_OK
+    print(msg, file=sys.stderr)
+    return EXIT_ERROR
+
+
+def cmd_status(args, ctx: Context) -> int:
+    name, email = ctx.switcher.read_global_user()
+    active = _active_account(ctx)
+    path = os.path.abspath(os.path.expanduser(args.path or os.getcwd()))
+    binding = ctx.repos.resolve(path)
+    bound = ctx.accounts.get_account_by_id(binding["account_id"]) if binding else None
+
+    data = {
+        "global": {"name": name, "email": email, "account": active["alias"] if active else None},
+        "ssh_identity": ctx.switcher.get_current_ssh_identity(),
+        "path": path,
+        "binding": None,
+    }
+    lines = [
+        f"Global:   {name} <{email}>" + (f"  [{active['alias']}]" if active else "") if email else "Global:   not configured",
+        f"SSH key:  {data['ssh_identity'] or '-'}",
+    ]
+    if binding:
+        kind = "tree" if binding.get("binding") == BINDING_DIRECTORY else "repo"
+        data["binding"] = {"path": binding["path"], "type": kind, "account": bound["alias"] if bound else None,
+                           "email": bound["email"] if bound else None}
+        lines.append(f"Bound:    {bound['alias'] if bound else 'Unknown account'} ({kind}: {binding['path']})")
+    else:
+        lines.append(f"Bound:    - ({path} is not managed)")
+    _print(data, args.json, lines)
+    return EXIT_OK
+
+
+def cmd_audit(args, ctx: Context) -> int:
+    from identity_audit import IdentityAuditor, AUDIT_OK, AUDIT_UNCHANGED, AUDIT_DRIFT
+
+    auditor = IdentityAuditor(ctx.accounts, ctx.repos, ctx.switcher, state_file=ctx.path("audit_state.json"))
+    results = auditor.audit(force=args.force)
+    if args.repair and any(r["status"] == AUDIT_DRIFT for r in results):
+        repaired = {path for path, ok, _ in auditor.repair(results) if ok}
+        rechecked = {r["path"]: r for r in auditor.audit([r for r in ctx.repos.get_repos() if r["path"] in repaired])}
+        results = [rechecked.get(r["path"], r) for r in results]
+
+    problems = [r for r in results if r["status"] not in (AUDIT_OK, AUDIT_UNCHANGED)]
+    lines = [f"[{r['status']}] {r['path']}: {r['message']}" for r in problems]
+    lines.append(f"{len(results)} repositories audited, {len(problems)} need attention.")
+    _print(results, args.json, lines)
+    return EXIT_PROBLEMS if problems else EXIT_OK
+
+
+def cmd_daemon(args, ctx: Context) -> int:
+    from identity_cache import IdentityCache
+    from identity_daemon import IdentityDaemon
+
+    daemon = IdentityDaemon(IdentityCache(ctx.path("accounts.json"), ctx.path("repositories.json"), ctx.switcher),
+                            socket_path=args.socket)
+    try:
+        daemon.start()
+    except OSError as e:
+        print(str(e), file=sys.stderr)
+        return EXIT_ERROR
+    print(f"Listening on {daemon.socket_path}", flush=True)
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        while not stop.wait(1.0):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.stop()
+    return EXIT_OK
+
+
+def cmd_prompt(args, ctx: Context) -> int:
+    from identity_daemon import query, prompt_text
+
+    path = os.path.abspath(os.path.expanduser(args.path or os.getcwd()))
+    reply = query(f"PROMPT {path}", args.socket)
+    if reply is None or reply.startswith("ERR"):
+        # No daemon running: resolve once in-process
+        from identity_cache import IdentityCache
+        cache = IdentityCache(ctx.path("accounts.json"), ctx.path("repositories.json"), ctx.switcher)
+        reply = prompt_text(cache.identity_for(path))
+    if reply:
+        print(reply)
+    return EXIT_OK
+
+
+def cmd_hook(args, ctx: Context) -> int:
+    from commit_hook import install_repo_hooks, install_global_hooks
+
+    uninstall = args.action == "uninstall"
+    try:
+        if args.is_global:
+            install_global_hooks(ctx.data_dir, uninstall=uninstall)
+            target = "all repositories (core.hooksPath)"
+        else:
+            target = os.path.abspath(os.path.expanduser(args.path or os.getcwd()))
+            install_repo_hooks(target, ctx.data_dir, uninstall=uninstall)
+    except (OSError, ValueError, subprocess.CalledProcessError) as e:
+        print(str(e), file=sys.stderr)
+        return EXIT_ERROR
+    print(f"Identity hooks {'removed from' if uninstall else 'installed for'} {target}.")
+    return EXIT_OK
+
+
+def cmd_history(args, ctx: Context) -> int:
+    from snapshot_store import SnapshotStore, SnapshotError
+    from datetime import datetime
+
+    store = SnapshotStore(ctx.path("snapshots"))
+    if args.action != "list" and not args.id:
+        print(f"history {args.action} needs a snapshot id (see: history list).", file=sys.stderr)
+        return EXIT_ERROR
+    try:
+        if args.action == "diff":
+            sys.stdout.write(store.diff(args.id, args.against) or "No differences.\n")
+        elif args.action == "rollback":
+            # Positionals after the id are all file names here
+            files = [args.against] + args.files if args.against else None
+            changed = store.restore(args.id, files)
+            print(f"Restored {', '.join(changed)}." if changed else "Files already match the snapshot.")
+        else:
+            entries = store.list(args.limit, args.path)
+            lines = [f"{e['id']}  {datetime.fromtimestamp(e['time']):%Y-%m-%d %H:%M:%S}  {e['reason']}" for e in entries]
+            _print(entries, args.json, lines or ["No snapshots yet."])
+    except (SnapshotError, OSError) as e:
+        print(str(e), file=sys.stderr)
+        return EXIT_ERROR
+    return EXIT_OK
+
+
+def cmd_import(args, ctx: Context) -> int:
+    import batch_io
+
+    try:
+        fmt = batch_io.detect_format(args.file, args.format)
+        with open(args.file, 'r', encoding='utf-8', newline='') as f:
+            if args.kind == "accounts":
+                report = batch_io.import_accounts(ctx.accounts, f, fmt)
+            else:
+                report = batch_io.import_repos(ctx.repos, ctx.accounts, f, fmt, switcher=ctx.switcher)
+    except (OSError, ValueError, UnicodeDecodeError) as e:
+        print(str(e), file=sys.stderr)
+        return EXIT_ERROR
+    for line_no, reason in report.errors:
+        print(f"{args.file}:{line_no}: {reason}", file=sys.stderr)
+    print(f"{args.kind.capitalize()}: {report.summary()}.")
+    return EXIT_PROBLEMS if report.errors else EXIT_OK
+
+
+def cmd_export(args, ctx: Context) -> int:
+    import batch_io
+
+    def export(f, fmt):
+        if args.kind == "accounts":
+            return batch_io.export_accounts(ctx.accounts, f, fmt)
+        return batch_io.export_repos(ctx.repos, ctx.accounts, f, fmt)
+
+    if not args.file or args.file == "-":
+        export(sys.stdout, args.format or "jsonl")
+        return EXIT_OK
+    tmp_path = f"{args.file}.{os.getpid()}.tmp"
+    try:
+        fmt = batch_io.detect_format(args.file, args.format)
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            count = export(f, fmt)
+        os.replace(tmp_path, args.file)
+    except (OSError, ValueError) as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        print(str(e), file=sys.stderr)
+        return EXIT_ERROR
+    print(f"Exported {count} {args.kind} to {args.file}.")
+    return EXIT_OK
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="GitHub Account Manager Pro (headless)")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Data directory (default: shared with the GUI)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("list", help="List accounts (* marks the active one)")
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(func=cmd_list)
+
+    p = sub.add_parser("switch", help="Activate an account globally")
+    p.add_argument("account", help="Account alias, username or id")
+    p.set_defaults(func=cmd_switch)
+
+    p = sub.add_parser("show", help="Bring the running GUI to the front")
+    p.set_defaults(func=cmd_show)
+
+    p = sub.add_parser("metrics", help="Print the running GUI's operation latency histograms")
+    p.add_argument("--format", choices=["json", "prometheus"], default="prometheus")
+    p.set_defaults(func=cmd_metrics)
+
+    p = sub.add_parser("bind", help="Bind a repository (or a directory tree with --tree) to an account")
+    p.add_argument("path")
+    p.add_argument("account", help="Account alias, username or id")
+    p.add_argument("--tree", action="store_true", help="Bind every repository under path via includeIf")
+    p.add_argument("--alias", help="Display name (default: folder name)")
+    p.set_defaults(func=cmd_bind)
+
+    p = sub.add_parser("status", help="Show the global identity and who owns a path")
+    p.add_argument("path", nargs="?", help="Directory to resolve (default: current directory)")
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(func=cmd_status)
+
+    p = sub.add_parser("audit", help="Check bound repositories for identity drift")
+    p.add_argument("--repair", action="store_true", help="Re-apply the bound identity where it drifted")
+    p.add_argument("--force", action="store_true", help="Re-check repositories unchanged since the last audit")
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(func=cmd_audit)
+
+    p = sub.add_parser("daemon", help="Serve identity lookups on a Unix socket (foreground)")
+    p.add_argument("--socket", help="Socket path (default: $GHM_IDENTITY_SOCK or $XDG_RUNTIME_DIR)")
+    p.set_defaults(func=cmd_daemon)
+
+    p = sub.add_parser("prompt", help="Print the account in effect for a path (for shell prompts)")
+    p.add_argument("path", nargs="?", help="Directory to resolve (default: current directory)")
+    p.add_argument("--socket", help="Daemon socket path")
+    p.set_defaults(func=cmd_prompt)
+
+    p = sub.add_parser("hook", help="Install pre-commit/pre-push hooks that block wrong-identity commits")
+    p.add_argument("action", choices=["install", "uninstall"])
+    p.add_argument("path", nargs="?", help="Repository (default: current directory)")
+    p.add_argument("--global", dest="is_global", action="store_true",
+                   help="Install for every repository through core.hooksPath")
+    p.set_defaults(func=cmd_hook)
+
+    p = sub.add_parser("history", help="List, diff or roll back snapshots of the config files the app changed")
+    p.add_argument("action", nargs="?", choices=["list", "diff", "rollback"], default="list")
+    p.add_argument("id", nargs="?", help="Snapshot id (or a unique prefix)")
+    p.add_argument("against", nargs="?", help="diff: second snapshot (default: the files as they are now); "
+                                              "rollback: only this file")
+    p.add_argument("files", nargs="*", help="rollback: more files (default: all in the snapshot)")
+    p.add_argument("--path", help="list: only snapshots that include this file")
+    p.add_argument("--limit", type=int, default=20)
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(func=cmd_history)
+
+    p = sub.add_parser("import", help="Add or update accounts / repository bindings from a JSONL or CSV file")
+    p.add_argument("kind", choices=["accounts", "repos"])
+    p.add_argument("file")
+    p.add_argument("--format", choices=["jsonl", "csv"], help="Default: from the file extension")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("export", help="Write accounts / repository bindings as JSONL or CSV")
+    p.add_argument("kind", choices=["accounts", "repos"])
+    p.add_argument("file", nargs="?", help="Output file (default: stdout)")
+    p.add_argument("--format", choices=["jsonl", "csv"], help="Default: from the file extension (jsonl on stdout)")
+    p.set_defaults(func=cmd_export)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args, Context(args.data_dir))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+Single execution layer for the external tools the app drives
+(git, ssh, ssh-keygen, gpg).
+
+Every call goes through one CommandRunner, which
+  * resolves each tool once (overridable per tool, e.g. with a stub script),
+  * applies a per-tool default timeout,
+  * bounds how many tool processes run at the same time, and
+  * caches read-only queries for a short time; any other command run
+    through the same tool drops that tool's cached answers.
+
+Executables can be swapped with set_executable() or, for child processes
+and benchmarks, through GHM_GIT / GHM_SSH / GHM_SSH_KEYGEN / GHM_GPG.
+"""
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+from metrics import span
+
+TOOLS = ("git", "ssh", "ssh-keygen", "gpg")
+# Seconds; None means no limit (callers may still pass their own)
+DEFAULT_TIMEOUTS: Dict[str, Optional[float]] = {
+    "git": 30,
+    "ssh": 20,
+    "ssh-keygen": 30,
+    "gpg": 60,
+}
+MAX_CONCURRENT_COMMANDS = 8
+QUERY_CACHE_TTL = 2.0
+
+
+def _env_name(tool: str) -> str:
+    return "GHM_" + tool.upper().replace("-", "_")
+
+
+class CommandRunner:
+    def __init__(self, executables: Optional[Dict[str, str]] = None,
+                 timeouts: Optional[Dict[str, Optional[float]]] = None,
+                 max_concurrent: int = MAX_CONCURRENT_COMMANDS,
+                 cache_ttl: float = QUERY_CACHE_TTL):
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self.cache_ttl = cache_ttl
+        self._executables = dict(executables or {})
+        self._resolved: Dict[str, Optional[str]] = {}
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrent))
+        self._cache: Dict[tuple, tuple] = {}
+        # Bumped on every write so a query that raced one is not cached
+        self._generation: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def set_executable(self, tool: str, path: Optional[str]):
+        """Replaces (or, with None, restores) the executable used for a tool."""
+        with self._lock:
+            if path is None:
+                self._executables.pop(tool, None)
+            else:
+                self._executables[tool] = path
+            self._resolved.pop(tool, None)
+            self._drop_cached(tool)
+
+    def resolve(self, tool: str) -> Optional[str]:
+        """Full path of the executable for a tool, or None when it is not installed."""
+        with self._lock:
+            if tool in self._resolved:
+                return self._resolved[tool]
+            name = self._executables.get(tool) or os.environ.get(_env_name(tool)) or tool
+            path = shutil.which(name)
+            self._resolved[tool] = path
+            return path
+
+    def is_available(self, tool: str) -> bool:
+        return self.resolve(tool) is not None
+
+    def _command(self, tool: str, args: Sequence[str]) -> List[str]:
+        executable = self.resolve(tool)
+        if executable is None:
+            raise FileNotFoundError(f"{tool} is not installed or not found in PATH.")
+        return [executable, *args]
+
+    def run(self, tool: str, args: Sequence[str], input: Optional[str] = None, check: bool = False,
+            timeout: Optional[float] = ..., cwd: Optional[str] = None,
+            env: Optional[Dict[str, str]] = None, read_only: bool = False) -> subprocess.CompletedProcess:
+        """
+        Runs a tool to completion with captured text output.
+        Treated as a write (the tool's cached query results are dropped)
+        unless read_only=True, for reads that must not be cached.
+        Raises FileNotFoundError when the tool is missing, subprocess.TimeoutExpired
+        on timeout and, with check=True, subprocess.CalledProcessError.
+        """
+        try:
+            return self._run(tool, args, input, check, timeout, cwd, env)
+        finally:
+            if not read_only:
+                self.invalidate(tool)
+
+    def query(self, tool: str, args: Sequence[str], cwd: Optional[str] = None) -> subprocess.CompletedProcess:
+        """
+        Runs a read-only command. The result is reused for cache_ttl seconds,
+        or until a run() through the same tool.
+        """
+        key = (tool, tuple(args), cwd)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(key)
+            generation = self._generation.get(tool, 0)
+        if cached and now - cached[0] < self.cache_ttl:
+            return cached[1]
+        result = self._run(tool, args, None, False, ..., cwd, None)
+        with self._lock:
+            if self._generation.get(tool, 0) == generation:
+                self._cache[key] = (now, result)
+        return result
+
+    def invalidate(self, tool: Optional[str] = None):
+        """Drops cached query results for one tool, or all of them."""
+        with self._lock:
+            self._drop_cached(tool)
+
+    def _drop_cached(self, tool: Optional[str]):
+        for name in (TOOLS if tool is None else (tool,)):
+            self._generation[name] = self._generation.get(name, 0) + 1
+        if tool is None:
+            self._cache.clear()
+        else:
+            for key in [k for k in self._cache if k[0] == tool]:
+                del self._cache[key]
+
+    def _run(self, tool, args, input, check, timeout, cwd, env) -> subprocess.CompletedProcess:
+        cmd = self._command(tool, args)
+        if timeout is ...:
+            timeout = self.timeouts.get(tool)
+        with self._slots, span(f"subprocess.{tool}"):
+            try:
+                result = subprocess.run(cmd, input=input, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                        text=True, encoding='utf-8', errors='replace',
+                                        timeout=timeout, cwd=cwd, env=env, check=check)
+            except subprocess.CalledProcessError as e:
+                self._log_failure(tool, args, e.returncode, e.stderr)
+                raise
+        if result.returncode != 0:
+            self._log_failure(tool, args, result.returncode, result.stderr)
+        return result
+
+    @staticmethod
+    def _log_failure(tool, args, returncode, stderr):
+        # Many queries exit non-zero on purpose (e.g. an unset config key), so only at DEBUG
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(f"{tool} {' '.join(args)} exited with {returncode}: {(stderr or '').strip()[:2000]}")
+
+    @contextmanager
+    def process(self, tool: str, args: Sequence[str], **popen_kwargs):
+        """
+        Starts a long-running tool (e.g. streaming gpg output). The process
+        holds a concurrency slot until the block exits, and is killed if it
+        is still running then.
+        """
+        cmd = self._command(tool, args)
+        with self._slots, span(f"subprocess.{tool}"):
+            process = subprocess.Popen(cmd, **popen_kwargs)
+            try:
+                yield process
+            finally:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+                self.invalidate(tool)
+
+
+_default_runner: Optional[CommandRunner] = None
+_default_lock = threading.Lock()
+
+
+def get_runner() -> CommandRunner:
+    """The process-wide runner, so the concurrency limit covers every caller."""
+    global _default_runner
+    with _default_lock:
+        if _default_runner is None:
+            _default_runner = CommandRunner()
+        return _default_runner
@@ -0,0 +1,335 @@
+"""
+Git hooks that refuse commits made under the wrong identity.
+
+Installed hooks call this file directly:
+
+    python commit_hook.py pre-commit <data_dir>
+    python commit_hook.py pre-push <data_dir> <remote> <url>   (ref lines on stdin)
+
+It runs on every commit, so the hook path imports nothing beyond os, sys
+and mmap until it has to spawn git (no typing, json or GUI modules), and
+binary-searches a precompiled index (hook_index: sorted normalized path ->
+bound identity) instead of parsing repositories.json. The index is rebuilt on the first
+commit after accounts.json or repositories.json change.
+
+Skip the check once with `git commit --no-verify`, or set GHM_SKIP_IDENTITY_CHECK=1.
+"""
+import mmap
+import os
+import sys
+
+INDEX_FILE = "hook_index"
+INDEX_VERSION = 1
+HOOK_TYPES = ("pre-commit", "pre-push")
+HOOK_MARKER = "# GitHub Account Manager Pro identity check"
+ZERO_SHA = "0" * 40
+
+# Exit codes seen by git
+HOOK_OK = 0
+HOOK_BLOCK = 1
+
+
+def _key(path: str) -> str:
+    # Same normalization as path_trie.path_components, without importing it
+    return os.path.normcase(os.path.abspath(path)).replace("\\", "/").rstrip("/")
+
+
+def _header(data_dir: str) -> bytes:
+    """First line of the index: format version plus the stores it was compiled from."""
+    parts = [f"ghm-hook-index {INDEX_VERSION}"]
+    for name in ("accounts.json", "repositories.json"):
+        try:
+            st = os.stat(os.path.join(data_dir, name))
+            parts.append(f"{st.st_mtime_ns}:{st.st_size}")
+        except OSError:
+            parts.append("-")
+    return " ".join(parts).encode()
+
+
+def build_index(data_dir: str) -> bytes:
+    """
+    Compiles bindings into hook_index: a header line, then one
+    "path key<TAB>alias<TAB>name<TAB>email" line per binding, sorted by key
+    so the hook can binary-search it without loading it. Returns the content.
+    """
+    from account_manager import AccountManager
+    from repository_manager import RepositoryManager
+
+    header = _header(data_dir)
+    accounts = {acc["id"]: acc for acc in AccountManager(os.path.join(data_dir, "accounts.json")).get_accounts()}
+    lines = []
+    for binding in RepositoryManager(os.path.join(data_dir, "repositories.json")).get_all_bindings():
+        acc = accounts.get(binding["account_id"])
+        if not acc or not acc.get("email"):
+            continue
+        fields = [_key(binding["path"]), acc["alias"], acc["username"], acc["email"]]
+        if any("\t" in f or "\n" in f for f in fields):
+            continue  # cannot be represented in the line format
+        lines.append("\t".join(fields).encode("utf-8"))
+    lines.sort(key=lambda line: line.split(b"\t", 1)[0])
+    content = header + b"\n" + b"".join(line + b"\n" for line in lines)
+
+    index_path = os.path.join(data_dir, INDEX_FILE)
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, index_path)
+    except OSError:
+        pass  # read-only data dir: the index is simply rebuilt next time
+    return content
+
+
+def open_index(data_dir: str):
+    """Returns the compiled index (mmap or bytes), rebuilding it if the stores changed."""
+    header = _header(data_dir)
+    try:
+        with open(os.path.join(data_dir, INDEX_FILE), 'rb') as f:
+            index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if index[:index.find(b"\n")] == header:
+            return index
+        index.close()
+    except (OSError, ValueError):
+        pass
+    return build_index(data_dir)
+
+
+def _search(index, key: bytes):
+    """Binary search over the sorted lines; O(log n) without parsing the file."""
+    lo = index.find(b"\n") + 1
+    first = lo
+    hi = len(index)
+    prefix = key + b"\t"
+    while lo < hi:
+        mid = (lo + hi) // 2
+        newline = index.rfind(b"\n", first, mid)
+        line_start = newline + 1 if newline >= 0 else first
+        line_end = index.find(b"\n", line_start)
+        line = index[line_start:line_end]
+        if line.startswith(prefix):
+            return line.decode("utf-8").split("\t")[1:4]
+        if line.split(b"\t", 1)[0] < key:
+            lo = line_end + 1
+        else:
+            hi = line_start
+    return None
+
+
+def lookup(index, path: str):
+    """(alias, name, email) bound to path or its nearest bound parent, else None."""
+    current = _key(path)
+    while True:
+        entry = _search(index, current.encode("utf-8"))
+        if entry is not None:
+            return entry
+        parent = current.rsplit("/", 1)[0]
+        if parent == current or not parent:
+            break
+        current = parent
+
+    # Linked worktrees carry the binding of their main repository
+    if os.path.isfile(os.path.join(path, ".git")):
+        from git_config import resolve_git_dirs
+        _, common_dir = resolve_git_dirs(path)
+        if common_dir and os.path.basename(common_dir) == ".git":
+            return lookup(index, os.path.dirname(common_dir))
+    return None
+
+
+def _git(*args) -> str:
+    """Runs git and returns stdout ("" on failure)."""
+    if not hasattr(os, "posix_spawnp"):
+        import subprocess
+        result = subprocess.run(["git", *args], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                text=True, encoding='utf-8', errors='replace', timeout=30)
+        return result.stdout if result.returncode == 0 else ""
+
+    # Importing subprocess costs more than the rest of the hook put together
+    read_fd, write_fd = os.pipe()
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    try:
+        pid = os.posix_spawnp("git", ["git", *args], os.environ, file_actions=[
+            (os.POSIX_SPAWN_DUP2, write_fd, 1), (os.POSIX_SPAWN_DUP2, devnull, 2),
+            (os.POSIX_SPAWN_CLOSE, read_fd)])
+    except OSError:
+        os.close(read_fd)
+        return ""
+    finally:
+        os.close(write_fd)
+        os.close(devnull)
+    chunks = []
+    while True:
+        chunk = os.read(read_fd, 65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    os.close(read_fd)
+    _, status = os.waitpid(pid, 0)
+    if os.waitstatus_to_exitcode(status) != 0:
+        return ""
+    return b"".join(chunks).decode("utf-8", errors="replace")
+
+
+def _ident_email(ident: str) -> str:
+    # "Name <email> 1700000000 +0100"
+    start, end = ident.find("<"), ident.find(">")
+    return ident[start + 1:end] if 0 <= start < end else ""
+
+
+def check_pre_commit(expected_email: str) -> list:
+    """Returns the identities that do not match (empty when the commit may proceed)."""
+    idents = {}
+    for line in _git("var", "-l").splitlines():
+        name, _, value = line.partition("=")
+        if name in ("GIT_AUTHOR_IDENT", "GIT_COMMITTER_IDENT"):
+            idents[name] = _ident_email(value)
+    author, committer = idents.get("GIT_AUTHOR_IDENT", ""), idents.get("GIT_COMMITTER_IDENT", "")
+    # A different --author is fine as long as you commit it as yourself
+    if expected_email.lower() in (author.lower(), committer.lower()):
+        return []
+    return [f"commit author {author or '(unset)'}"]
+
+
+def check_pre_push(expected_email: str, remote: str, ref_lines) -> list:
+    """Outgoing commits made under neither the bound author nor committer email."""
+    problems = []
+    for line in ref_lines:
+        parts = line.split()
+        if len(parts) != 4 or parts[1] == ZERO_SHA:
+            continue  # malformed or branch deletion
+        local_sha, remote_sha = parts[1], parts[3]
+        # Commits the remote already has (e.g. others' work brought in by a
+        # merge of origin/main) are not this push's to check
+        commits = None
+        if remote_sha != ZERO_SHA:
+            commits = _git("log", "--format=%h%x00%ae%x00%ce", local_sha, f"^{remote_sha}", "--not", f"--remotes={remote}")
+        if not commits:
+            # New branch, or the remote tip is not known locally
+            commits = _git("log", "--format=%h%x00%ae%x00%ce", local_sha, "--not", f"--remotes={remote}")
+        for commit in commits.splitlines():
+            sha, author, committer = (commit.split("\0") + ["", ""])[:3]
+            if expected_email.lower() not in (author.lower(), committer.lower()):
+                problems.append(f"{sha} by {author}")
+    return problems
+
+
+def run_hook(hook: str, data_dir: str, args: list, stdin=None) -> int:
+    if os.environ.get("GHM_SKIP_IDENTITY_CHECK"):
+        return HOOK_OK
+    entry = lookup(open_index(data_dir), os.getcwd())
+    if entry is None:
+        return HOOK_OK  # repository is not managed
+    alias, name, email = entry
+
+    if hook == "pre-commit":
+        problems = check_pre_commit(email)
+    elif hook == "pre-push":
+        problems = check_pre_push(email, args[0] if args else "origin", stdin or sys.stdin)
+    else:
+        return HOOK_OK
+    if not problems:
+        return HOOK_OK
+
+    shown = problems[:10] + ([f"... and {len(problems) - 10} more"] if len(problems) > 10 else [])
+    sys.stderr.write(
+        f"Identity check failed: this repository is bound to {alias} <{email}>, but found\n"
+        + "".join(f"    {p}\n" for p in shown)
+        + f"Fix:  git config user.email {email}   (or re-bind it in GitHub Account Manager Pro)\n"
+        + "Skip once:  --no-verify\n"
+    )
+    return HOOK_BLOCK
+
+
+# --- Installation (not on the hook's hot path) ---
+
+def render_hook(hook: str, data_dir: str, chain: bool = False) -> str:
+    """Shell wrapper git runs. chain=True also runs the repository's own hook (core.hooksPath mode)."""
+    import shlex  # not at the top: it pulls in re, which the hook itself never needs
+
+    # Quoted for sh: paths may hold quotes, $ or backticks
+    python = shlex.quote(sys.executable.replace("\\", "/"))
+    script = shlex.quote(os.path.abspath(__file__).replace("\\", "/"))
+    data = shlex.quote(os.path.abspath(data_dir).replace("\\", "/"))
+    # -S: skip site-packages setup, the hook only needs the standard library
+    lines = ["#!/bin/sh", HOOK_MARKER]
+    if hook == "pre-push":
+        # stdin is consumed twice when chaining, so keep a copy
+        lines += ['input=$(cat)',
+                  f'printf "%s\\n" "$input" | {python} -S {script} {hook} {data} "$@" || exit $?']
+    else:
+        lines.append(f'{python} -S {script} {hook} {data} "$@" || exit $?')
+    if chain:
+        lines += [f'local_hook="$(git rev-parse --git-common-dir)/hooks/{hook}"',
+                  'if [ -x "$local_hook" ]; then']
+        if hook == "pre-push":
+            lines.append('    printf "%s\\n" "$input" | "$local_hook" "$@" || exit $?')
+        else:
+            lines.append('    "$local_hook" "$@" || exit $?')
+        lines.append('fi')
+    return "\n".join(lines) + "\n"
+
+
+def _write_hook(hooks_dir: str, hook: str, content: str):
+    path = os.path.join(hooks_dir, hook)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            if HOOK_MARKER not in f.read():
+                raise FileExistsError(f"{path} already exists and was not installed by this app")
+    os.makedirs(hooks_dir, exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write(content)
+    os.chmod(path, 0o755)
+
+
+def _remove_hook(hooks_dir: str, hook: str):
+    path = os.path.join(hooks_dir, hook)
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            ours = HOOK_MARKER in f.read()
+        if ours:
+            os.remove(path)
+    except OSError:
+        pass
+
+
+def install_repo_hooks(repo_path: str, data_dir: str, uninstall: bool = False):
+    """Installs (or removes) the hooks in one repository's hooks directory."""
+    from git_config import resolve_git_dirs
+    _, common_dir = resolve_git_dirs(repo_path)
+    if not common_dir:
+        raise ValueError(f"Not a git repository: {repo_path}")
+    hooks_dir = os.path.join(common_dir, "hooks")
+    for hook in HOOK_TYPES:
+        if uninstall:
+            _remove_hook(hooks_dir, hook)
+        else:
+            _write_hook(hooks_dir, hook, render_hook(hook, data_dir))
+    if not uninstall:
+        build_index(data_dir)
+
+
+def install_global_hooks(data_dir: str, uninstall: bool = False):
+    """
+    Points the global core.hooksPath at <data_dir>/hooks, covering every
+    repository. Repositories' own .git/hooks scripts keep running (chained).
+    """
+    import subprocess
+    hooks_dir = os.path.join(os.path.abspath(data_dir), "hooks")
+    if uninstall:
+        for hook in HOOK_TYPES:
+            _remove_hook(hooks_dir, hook)
+        current = _git("config", "--global", "--get", "core.hooksPath").strip()
+        if current and os.path.abspath(os.path.expanduser(current)) == os.path.abspath(hooks_dir):
+            subprocess.run(["git", "config", "--global", "--unset", "core.hooksPath"], check=True)
+        return
+    for hook in HOOK_TYPES:
+        _write_hook(hooks_dir, hook, render_hook(hook, data_dir, chain=True))
+    subprocess.run(["git", "config", "--global", "core.hooksPath", hooks_dir.replace("\\", "/")], check=True)
+    build_index(data_dir)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        sys.stderr.write("usage: commit_hook.py <pre-commit|pre-push> <data_dir> [hook args...]\n")
+        sys.exit(2)
+    sys.exit(run_hook(sys.argv[1], sys.argv[2], sys.argv[3:]))
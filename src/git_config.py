@@ -0,0 +1,323 @@
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+from metrics import timed
+
+# Reads git config files directly instead of spawning `git config`.
+# Keys are returned the way `git config --list` prints them: section and key
+# lower-cased, subsection kept as written ("remote.origin.url", "core.sshcommand").
+
+_ESCAPES = {'"': '"', '\\': '\\', 'n': '\n', 't': '\t', 'b': '\b'}
+
+
+def _parse_value(raw: str, lines, index: int) -> Tuple[str, int]:
+    """
+    Parses a value starting at `raw`, following backslash line continuations.
+    Returns (value, index of the last line consumed).
+    """
+    out = []
+    pending_space = ""
+    in_quotes = False
+    while True:
+        i = 0
+        continued = False
+        while i < len(raw):
+            c = raw[i]
+            if c == '\\':
+                if i + 1 >= len(raw):
+                    continued = True
+                    break
+                out.append(pending_space)
+                pending_space = ""
+                out.append(_ESCAPES.get(raw[i + 1], raw[i + 1]))
+                i += 2
+                continue
+            if c == '"':
+                out.append(pending_space)
+                pending_space = ""
+                in_quotes = not in_quotes
+            elif not in_quotes and c in '#;':
+                break
+            elif not in_quotes and c in ' \t':
+                # Whitespace outside quotes is kept (as spaces) only between words
+                if out:
+                    pending_space += " "
+            else:
+                out.append(pending_space)
+                pending_space = ""
+                out.append(c)
+            i += 1
+        if continued and index + 1 < len(lines):
+            index += 1
+            raw = lines[index].rstrip('\r\n')
+            continue
+        break
+    return "".join(out), index
+
+
+def _parse_section(header: str) -> Optional[str]:
+    """'[remote "origin"]' -> 'remote.origin', '[Core]' -> 'core'."""
+    header = header.strip()
+    if '"' in header:
+        name, _, sub = header.partition('"')
+        sub = sub.rsplit('"', 1)[0].replace('\\"', '"').replace('\\\\', '\\')
+        return f"{name.strip().lower()}.{sub}"
+    # Plain [section] or deprecated [section.subsection]; both are case-insensitive
+    return header.lower()
+
+
+def parse_git_config(text: str) -> Dict[str, str]:
+    """Parses git config text. Multi-valued keys keep the last value, as git does."""
+    values: Dict[str, str] = {}
+    lines = text.splitlines()
+    section = None
+    index = 0
+    while index < len(lines):
+        line = lines[index].strip()
+        index += 1
+        if not line or line[0] in '#;':
+            continue
+        if line.startswith('['):
+            end = line.find(']')
+            if end == -1:
+                continue
+            section = _parse_section(line[1:end])
+            line = line[end + 1:].strip()
+            if not line or line[0] in '#;':
+                continue
+        if section is None:
+            continue
+        name, sep, raw = line.partition('=')
+        key = f"{section}.{name.strip().lower()}"
+        if not sep:
+            # "key" on its own is boolean true
+            values[key] = "true"
+            continue
+        value, index = _parse_value(raw, lines, index - 1)
+        index += 1
+        values[key] = value
+    return values
+
+
+@timed("config.read")
+def read_git_config(path: str) -> Dict[str, str]:
+    """Parses a config file; a missing file reads as empty."""
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return parse_git_config(f.read())
+    except FileNotFoundError:
+        return {}
+
+
+def resolve_git_dirs(repo_path: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Returns (git_dir, common_dir) for a checkout.
+    Handles .git directories, gitfiles (submodules, --separate-git-dir) and
+    linked worktrees, whose shared config lives in the common dir.
+    Returns (None, None) when repo_path is not a checkout.
+    """
+    dot_git = os.path.join(repo_path, ".git")
+    if os.path.isdir(dot_git):
+        return dot_git, dot_git
+    if not os.path.isfile(dot_git):
+        return None, None
+    try:
+        with open(dot_git, 'r', encoding='utf-8', errors='replace') as f:
+            first = f.readline().strip()
+    except OSError:
+        return None, None
+    if not first.startswith("gitdir:"):
+        return None, None
+    git_dir = first[len("gitdir:"):].strip()
+    if not os.path.isabs(git_dir):
+        git_dir = os.path.normpath(os.path.join(repo_path, git_dir))
+
+    common_dir = git_dir
+    commondir_file = os.path.join(git_dir, "commondir")
+    if os.path.isfile(commondir_file):
+        try:
+            with open(commondir_file, 'r', encoding='utf-8') as f:
+                common = f.read().strip()
+            common_dir = common if os.path.isabs(common) else os.path.normpath(os.path.join(git_dir, common))
+        except OSError:
+            pass
+    return git_dir, common_dir
+
+
+def repo_config_path(repo_path: str) -> Optional[str]:
+    """Path of the config file `git config --local` writes to for this checkout."""
+    _, common_dir = resolve_git_dirs(repo_path)
+    return os.path.join(common_dir, "config") if common_dir else None
+
+
+class ConfigLockedError(OSError):
+    """Another process (usually git) holds <config>.lock."""
+
+
+def _format_value(value: str) -> str:
+    """Formats a value the way `git config` writes it."""
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"')
+               .replace('\n', '\\n').replace('\t', '\\t').replace('\b', '\\b'))
+    if value != value.strip() or '#' in value or ';' in value:
+        return f'"{escaped}"'
+    return escaped
+
+
+def _line_continues(line: str) -> bool:
+    """True when a key line's value continues on the next line (trailing backslash)."""
+    stripped = line.rstrip('\r\n')
+    trailing = len(stripped) - len(stripped.rstrip('\\'))
+    return trailing % 2 == 1
+
+
+def _rewrite_locked(config_path: str, edit: Callable[[List[str]], Optional[List[str]]]) -> bool:
+    """
+    Rewrites a config file the way git does: <config>.lock is created
+    exclusively *before* the file is read, so no git write can land between
+    the read and the rename. `edit` gets the current lines and returns the
+    new ones (None: leave the file alone). The file keeps its mode.
+    Returns True when the file was rewritten.
+    """
+    lock_path = config_path + ".lock"
+    try:
+        fd = os.open(lock_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    except FileExistsError:
+        raise ConfigLockedError(f"{lock_path} exists; another git process may be running.")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', errors='surrogateescape', newline='') as f:
+            try:
+                with open(config_path, 'r', encoding='utf-8', errors='surrogateescape', newline='') as src:
+                    lines = src.read().splitlines(keepends=True)
+                mode = os.stat(config_path).st_mode & 0o777
+            except FileNotFoundError:
+                lines, mode = [], None
+            if lines and not lines[-1].endswith('\n'):
+                lines[-1] += '\n'
+            new_lines = edit(lines)
+            if new_lines is not None:
+                f.writelines(new_lines)
+        if new_lines is None:
+            os.remove(lock_path)
+            return False
+        if mode is not None:
+            os.chmod(lock_path, mode)
+        os.replace(lock_path, config_path)
+        return True
+    except BaseException:
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+        raise
+
+
+@timed("config.write")
+def set_config_values(config_path: str, values: Dict[str, str]):
+    """
+    Sets several "section.key" values (no subsections) in one write, under
+    git's lock (see _rewrite_locked). Existing keys are replaced in place
+    (last occurrence, as git does); new keys are appended to the last
+    matching section, or to a new section.
+    """
+    pending = {}
+    for full_key, value in values.items():
+        section, _, key = full_key.rpartition('.')
+        if not section or '.' in section:
+            raise ValueError(f"Unsupported config key: {full_key}")
+        pending[(section.lower(), key.lower())] = (key, value)
+    _rewrite_locked(config_path, lambda lines: _apply_values(lines, pending))
+
+
+def _apply_values(lines: List[str], pending: Dict[Tuple[str, str], Tuple[str, str]]) -> List[str]:
+    """Edits config lines in place; `pending` maps (section, key lower-cased) -> (key, value)."""
+    # Locate sections and key lines: (section, key) -> [start, end) of its last occurrence
+    key_spans: Dict[Tuple[str, str], Tuple[int, int]] = {}
+    section_end: Dict[str, int] = {}
+    section = None
+    i = 0
+    while i < len(lines):
+        stripped = lines[i].strip()
+        start = i
+        i += 1
+        if not stripped or stripped[0] in '#;':
+            continue
+        if stripped.startswith('['):
+            end = stripped.find(']')
+            header = stripped[1:end] if end != -1 else ""
+            section = None if '"' in header or '.' in header else header.strip().lower()
+            if section:
+                section_end[section] = i
+            rest = stripped[end + 1:].strip() if end != -1 else ""
+            if not rest or rest[0] in '#;':
+                continue
+            stripped = rest
+        if section is None:
+            continue
+        name = stripped.partition('=')[0].strip().lower()
+        while _line_continues(lines[i - 1]) and i < len(lines):
+            i += 1
+        key_spans[(section, name)] = (start, i)
+        section_end[section] = i
+
+    # Replace in place, bottom-up so earlier indexes stay valid
+    replacements = []
+    inserts: Dict[str, List[str]] = {}
+    for (section, key_lower), (key, value) in pending.items():
+        line = f"\t{key} = {_format_value(value)}\n"
+        if (section, key_lower) in key_spans:
+            replacements.append((key_spans[(section, key_lower)], line))
+        else:
+            inserts.setdefault(section, []).append(line)
+
+    edits = [(span, [line]) for span, line in replacements]
+    new_sections = []
+    for section, new_lines in inserts.items():
+        if section in section_end:
+            pos = section_end[section]
+            edits.append(((pos, pos), new_lines))
+        else:
+            new_sections.append(f"[{section}]\n")
+            new_sections.extend(new_lines)
+    for (start, end), new_lines in sorted(edits, key=lambda e: e[0], reverse=True):
+        lines[start:end] = new_lines
+    lines.extend(new_sections)
+    return lines
+
+
+def move_include_ifs_last(config_path: str, includes_dir: str) -> bool:
+    """
+    Moves the [includeIf ...] sections whose path points into `includes_dir`
+    (the directory bindings this app writes) below every other section. git
+    keeps the last value it reads, so a [user] section written after a
+    binding's includeIf would override the bound identity inside the tree.
+    The user's own includeIf sections stay where they are.
+    Returns True when the file was rewritten.
+    """
+    prefix = os.path.join(os.path.normcase(os.path.abspath(includes_dir)), "")
+
+    def managed(section: List[str]) -> bool:
+        header = section[0].lstrip()
+        if not header[1:].lower().startswith('includeif'):
+            return False
+        for key, value in parse_git_config("".join(section)).items():
+            if key.endswith(".path") and os.path.normcase(
+                    os.path.abspath(os.path.expanduser(value))).startswith(prefix):
+                return True
+        return False
+
+    def edit(lines: List[str]) -> Optional[List[str]]:
+        # Lines before the first header, then one list per section
+        sections: List[List[str]] = [[]]
+        for line in lines:
+            if line.lstrip().startswith('['):
+                sections.append([])
+            sections[-1].append(line)
+        head, tail = [], []
+        for section in sections:
+            (tail if section and managed(section) else head).extend(section)
+        reordered = head + tail
+        return None if reordered == lines else reordered
+
+    if not os.path.exists(config_path):
+        return False
+    return _rewrite_locked(config_path, edit)
@@ -1,96 +1,217 @@
 import subprocess
 import os
-import shutil
 import re
-from typing import Tuple, Optional
+import threading
+from typing import Tuple, Optional, Callable, Dict
 
-class GPGManager:
+from command_runner import CommandRunner, get_runner
+
+# Selectable key algorithms.
+# "future-default" asks gpg for its modern default (ed25519 primary + cv25519
+# encryption subkey), which needs no prime search and is created in milliseconds.
+# RSA keys are still offered for compatibility with older tooling.
+GPG_ALGORITHMS: Dict[str, Dict] = {
+    "ed25519": {"label": "Ed25519 / Cv25519 (fast)", "quick_algo": "future-default"},
+    "rsa3072": {"label": "RSA 3072", "key_length": 3072},
+    "rsa4096": {"label": "RSA 4096 (slow)", "key_length": 4096},
+}
+DEFAULT_GPG_ALGORITHM = "ed25519"
+
+# Human readable names for gpg "PROGRESS <what>" status lines
+_PROGRESS_LABELS = {
+    "primegen": "Searching for primes",
+    "need_entropy": "Waiting for entropy",
+    "pk_dsa": "Generating key",
+    "pk_elg": "Generating key",
+}
+
+
+class GPGKeyGeneration:
+    """
+    Handle for a key generation running on a background worker.
+    The UI polls `progress` / `done` and may call `cancel()` at any time.
+    """
     def __init__(self):
-        self.gpg_executable = shutil.which("gpg")
+        self.progress = "Starting..."
+        self.result: Tuple[bool, str, str, str] = (False, "", "", "")
+        self.done = threading.Event()
+        self._cancel = threading.Event()
+        self._process: Optional[subprocess.Popen] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """Stops the running gpg process."""
+        self._cancel.set()
+        process = self._process
+        if process and process.poll() is None:
+            process.kill()
+
+
+class GPGManager:
+    def __init__(self, gnupg_home: Optional[str] = None, runner: Optional[CommandRunner] = None):
+        self.runner = runner or get_runner()
+        # Optional GNUPGHOME override (used by the benchmark with a temporary keyring)
+        self.gnupg_home = gnupg_home
+
+    @property
+    def gpg_executable(self) -> Optional[str]:
+        return self.runner.resolve("gpg")
 
     def is_gpg_installed(self) -> bool:
-        return self.gpg_executable is not None
+        return self.runner.is_available("gpg")
+
+    def _base_args(self) -> list:
+        return ["--homedir", self.gnupg_home] if self.gnupg_home else []
 
-    def generate_gpg_key(self, name: str, email: str, passphrase: str) -> Tuple[bool, str, str, str]:
+    def _export_public_key(self, key_id: str) -> subprocess.CompletedProcess:
+        return self.runner.run("gpg", self._base_args() + ["--armor", "--export", key_id])
+
+    def start_gpg_key_generation(self, name: str, email: str, passphrase: str,
+                                 algorithm: str = DEFAULT_GPG_ALGORITHM,
+                                 done_callback: Callable = None) -> GPGKeyGeneration:
+        """
+        Runs generate_gpg_key in a background thread.
+        done_callback(result) is called from the worker thread when finished.
+        """
+        job = GPGKeyGeneration()
+
+        def _run():
+            def _progress(msg):
+                job.progress = msg
+            job.result = self.generate_gpg_key(name, email, passphrase, algorithm,
+                                               progress_callback=_progress, job=job)
+            job.done.set()
+            if done_callback: done_callback(job.result)
+
+        threading.Thread(target=_run, daemon=True).start()
+        return job
+
+    def generate_gpg_key(self, name: str, email: str, passphrase: str,
+                         algorithm: str = DEFAULT_GPG_ALGORITHM,
+                         progress_callback: Callable = None,
+                         job: Optional[GPGKeyGeneration] = None) -> Tuple[bool, str, str, str]:
         """
         Generates a GPG key using batch mode.
+        progress_callback(message) receives gpg progress updates.
         Returns: (Success, Message, KeyID, PublicKeyBlock)
         """
         if not self.is_gpg_installed():
             return False, "GPG is not installed or not found in PATH.", "", ""
 
-        # Batch Config
-        # Using RSA 4096, 0 expiry (never)
-        batch_config = f"""
+        spec = GPG_ALGORITHMS.get(algorithm)
+        if spec is None:
+            return False, f"Unknown GPG algorithm: {algorithm}", "", ""
+
+        if "quick_algo" in spec:
+            # Passphrase goes through stdin, never on the command line
+            args = self._base_args() + [
+                "--batch", "--status-fd", "1",
+                "--pinentry-mode", "loopback", "--passphrase-fd", "0",
+                "--quick-gen-key", f"{name} <{email}>", spec["quick_algo"], "default", "never"
+            ]
+            stdin_data = f"{passphrase}\n"
+        else:
+            # Batch Config
+            # RSA primary + RSA subkey, 0 expiry (never)
+            key_length = spec["key_length"]
+            args = self._base_args() + ["--batch", "--status-fd", "1", "--gen-key"]
+            stdin_data = f"""
 Key-Type: 1
-Key-Length: 4096
+Key-Length: {key_length}
 Subkey-Type: 1
-Subkey-Length: 4096
+Subkey-Length: {key_length}
 Name-Real: {name}
 Name-Email: {email}
 Expire-Date: 0
 Passphrase: {passphrase}
 %commit
 """
-        
+
         try:
-            # Run GPG generation
-            process = subprocess.run(
-                ["gpg", "--batch", "--gen-key"],
-                input=batch_config,
+            # Run GPG generation.
+            # stderr is merged into stdout so a single reader sees both the
+            # "[GNUPG:]" status lines and the human readable log.
+            # Generation has no timeout (RSA 4096 may take minutes); Cancel kills it.
+            with self.runner.process(
+                "gpg", args,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
                 text=True,
-                capture_output=True,
                 encoding='utf-8'  # Force UTF-8
-            )
+            ) as process:
+                if job:
+                    job._process = process
+                    if job.cancelled:
+                        process.kill()
+
+                process.stdin.write(stdin_data)
+                process.stdin.close()
+
+                log_lines = []
+                fingerprint = None
+                progress_ticks = 0
+                for line in process.stdout:
+                    log_lines.append(line)
+                    if not line.startswith("[GNUPG:] "):
+                        continue
+                    parts = line.split()
+                    if len(parts) >= 4 and parts[1] == "KEY_CREATED":
+                        fingerprint = parts[3]
+                    elif len(parts) >= 3 and parts[1] == "PROGRESS" and progress_callback:
+                        progress_ticks += 1
+                        label = _PROGRESS_LABELS.get(parts[2], "Generating key")
+                        progress_callback(f"{label}{'.' * (progress_ticks % 4)}")
+                process.wait()
 
+            if job and job.cancelled:
+                return False, "GPG key generation cancelled.", "", ""
+
+            output_log = "".join(log_lines)
             if process.returncode != 0:
-                return False, f"GPG Generation Failed:\n{process.stderr}", "", ""
-
-            # Generation usually prints to stderr. We need to find the key ID.
-            # Output example:
-            # gpg: key 7385AF37FCF5E2D8 marked as ultimately trusted
-            # gpg: revocation certificate stored as '...'
-            
-            output_log = process.stderr + process.stdout
-            
-            # Regex to find Key ID (16 or 40 char hex)
-            # Look for "gpg: key XXXXXXXX marked as ultimately trusted" OR "key XXXXXXXX created"
-            match = re.search(r"key\s+([0-9A-F]+)\s+marked as ultimately trusted", output_log, re.IGNORECASE)
-            if not match:
-                 match = re.search(r"key\s+([0-9A-F]+)\s+created", output_log, re.IGNORECASE)
-                 
-            if match:
-                key_id = match.group(1)
-                
+                return False, f"GPG Generation Failed:\n{output_log}", "", ""
+
+            if progress_callback: progress_callback("Exporting public key")
+
+            # KEY_CREATED carries the full fingerprint; the long key ID is its last 16 chars.
+            if fingerprint:
+                key_id = fingerprint[-16:]
+            else:
+                # Older gpg builds: look for
+                # "gpg: key XXXXXXXX marked as ultimately trusted" OR "key XXXXXXXX created"
+                match = re.search(r"key\s+([0-9A-F]+)\s+marked as ultimately trusted", output_log, re.IGNORECASE)
+                if not match:
+                    match = re.search(r"key\s+([0-9A-F]+)\s+created", output_log, re.IGNORECASE)
+                key_id = match.group(1) if match else None
+
+            if key_id:
                 # Get Public Key
-                pub_key_process = subprocess.run(
-                    ["gpg", "--armor", "--export", key_id],
-                    text=True,
-                    capture_output=True,
-                    encoding='utf-8'
-                )
-                
+                pub_key_process = self._export_public_key(key_id)
+
                 if pub_key_process.returncode == 0:
                     pub_key = pub_key_process.stdout
                     return True, "Key generated successfully.", key_id, pub_key
                 else:
                     return True, "Key generated but failed to export public key.", key_id, ""
-            
-            # Fallback: Try list keys matching the email if regex failed
+
+            # Fallback: Try list keys matching the email if parsing failed
             # This is risky if multiple keys exist, but helpful as fallback
-            list_proc = subprocess.run(
-                ["gpg", "--list-keys", "--keyid-format", "LONG", email],
-                text=True, capture_output=True, encoding='utf-8'
-            )
-            # Parse output for 'pub   rsa4096/1234567890ABCDEF'
-            match_list = re.search(r"pub\s+rsa\d+/([0-9A-F]+)", list_proc.stdout, re.IGNORECASE)
+            list_proc = self.runner.query("gpg", self._base_args() + ["--list-keys", "--keyid-format", "LONG", email])
+            # Parse output for 'pub   rsa4096/1234567890ABCDEF' or 'pub   ed25519/...'
+            match_list = re.search(r"pub\s+\w+/([0-9A-F]+)", list_proc.stdout, re.IGNORECASE)
             if match_list:
                 key_id = match_list.group(1)
                 # Export
-                pub_key_proc = subprocess.run(["gpg", "--armor", "--export", key_id], text=True, capture_output=True, encoding='utf-8')
+                pub_key_proc = self._export_public_key(key_id)
                 return True, "Key generated successfully (Found via list).", key_id, pub_key_proc.stdout
-            
+
             return False, f"Key generated but finding Key ID failed. Log:\n{output_log}", "", ""
 
-        except Exception as e:
+        except (OSError, ValueError, subprocess.SubprocessError) as e:
+            if job and job.cancelled:
+                # Killing gpg mid-write surfaces as a broken pipe
+                return False, "GPG key generation cancelled.", "", ""
             return False, f"Error executing GPG: {str(e)}", "", ""
@@ -0,0 +1,175 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Callable, Tuple
+
+from atomic_file import write_json
+from git_config import read_git_config, repo_config_path
+from ssh_manager import GitSwitcher, MAX_BIND_WORKERS
+
+# Audit result statuses
+AUDIT_OK = "ok"                # local config matches the bound account
+AUDIT_DRIFT = "drift"          # one or more identity keys differ
+AUDIT_MISSING = "missing"      # the repository path no longer exists
+AUDIT_STALE = "stale"          # path exists but is no longer a checkout, or the account was deleted
+AUDIT_UNCHANGED = "unchanged"  # skipped: config untouched since the last clean audit
+
+# Keys set by GitSwitcher.set_local_git_user, as read_git_config names them
+IDENTITY_KEYS = ("user.name", "user.email", "core.sshcommand")
+
+
+class IdentityAuditor:
+    """
+    Checks that every per-repo binding still carries the bound account's
+    user.name, user.email and core.sshCommand. Configs are parsed directly
+    (no git processes) on a thread pool. Repos whose config mtime has not
+    changed since they last audited clean are skipped.
+    """
+    def __init__(self, account_manager, repo_manager, git_switcher: GitSwitcher,
+                 state_file: Optional[str] = None, max_workers: int = MAX_BIND_WORKERS):
+        self.account_manager = account_manager
+        self.repo_manager = repo_manager
+        self.git_switcher = git_switcher
+        self.state_file = state_file
+        self.max_workers = max_workers
+        # path -> {"mtime": config mtime_ns, "identity": expected identity signature}
+        self._state: Dict[str, Dict] = self._load_state()
+        # The watcher thread, the audit dialog and the CLI may audit / repair at the same time
+        self._state_lock = threading.Lock()
+
+    def _load_state(self) -> Dict[str, Dict]:
+        if not self.state_file or not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return {}
+
+    def _save_state(self):
+        """Writes the state file atomically. Call with _state_lock held."""
+        if not self.state_file:
+            return
+        try:
+            write_json(self.state_file, self._state, indent=None)
+        except OSError:
+            pass
+
+    @staticmethod
+    def expected_identity(account: Dict) -> Dict[str, str]:
+        return {
+            "user.name": account["username"],
+            "user.email": account["email"],
+            "core.sshcommand": GitSwitcher.build_ssh_command(account["ssh_key_path"]),
+        }
+
+    @staticmethod
+    def _signature(expected: Dict[str, str]) -> str:
+        return "\0".join(expected[k] for k in IDENTITY_KEYS)
+
+    def audit_repo(self, repo: Dict, force: bool = False) -> Dict:
+        """Audits a single per-repo binding."""
+        path = repo["path"]
+        result = {
+            "path": path,
+            "alias": repo.get("alias", os.path.basename(path)),
+            "account_id": repo["account_id"],
+            "status": AUDIT_OK,
+            "message": "",
+            "drift": {},
+            "config_mtime": None,
+        }
+
+        account = self.account_manager.get_account_by_id(repo["account_id"])
+        if not os.path.isdir(path):
+            result.update(status=AUDIT_MISSING, message="Repository folder no longer exists.")
+            return result
+        if account is None:
+            result.update(status=AUDIT_STALE, message="Bound account no longer exists.")
+            return result
+
+        config_path = repo_config_path(path)
+        try:
+            mtime = os.stat(config_path).st_mtime_ns if config_path else None
+        except OSError:
+            mtime = None
+        if mtime is None:
+            result.update(status=AUDIT_STALE, message="Not a git repository anymore (no .git/config).")
+            return result
+        result["config_mtime"] = mtime
+
+        expected = self.expected_identity(account)
+        with self._state_lock:
+            previous = self._state.get(path)
+        if (not force and previous and previous["mtime"] == mtime
+                and previous["identity"] == self._signature(expected)):
+            result["status"] = AUDIT_UNCHANGED
+            return result
+
+        actual = read_git_config(config_path)
+        for key in IDENTITY_KEYS:
+            if actual.get(key) != expected[key]:
+                result["drift"][key] = {"expected": expected[key], "actual": actual.get(key)}
+        if result["drift"]:
+            result["status"] = AUDIT_DRIFT
+            result["message"] = ", ".join(sorted(result["drift"])) + " changed"
+        return result
+
+    def audit(self, repos: Optional[List[Dict]] = None, force: bool = False,
+              progress_callback: Callable = None) -> List[Dict]:
+        """
+        Audits all per-repo bindings (or the given subset) in parallel.
+        progress_callback(done, total) is called from the calling thread.
+        """
+        repos = self.repo_manager.get_repos() if repos is None else repos
+        total = len(repos)
+        results = []
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as pool:
+            for done, result in enumerate(pool.map(lambda r: self.audit_repo(r, force), repos), 1):
+                results.append(result)
+                if progress_callback and (done % 100 == 0 or done == total):
+                    progress_callback(done, total)
+
+        with self._state_lock:
+            for result in results:
+                if result["status"] == AUDIT_OK:
+                    account = self.account_manager.get_account_by_id(result["account_id"])
+                    self._state[result["path"]] = {
+                        "mtime": result["config_mtime"],
+                        "identity": self._signature(self.expected_identity(account)),
+                    }
+                elif result["status"] != AUDIT_UNCHANGED:
+                    self._state.pop(result["path"], None)
+            self._save_state()
+        return results
+
+    def repair(self, results: List[Dict], progress_callback: Callable = None) -> List[Tuple[str, bool, str]]:
+        """Re-applies the bound identity to every drifted repository in `results`."""
+        drifted = [r for r in results if r["status"] == AUDIT_DRIFT]
+        by_account: Dict[str, List[str]] = {}
+        for r in drifted:
+            by_account.setdefault(r["account_id"], []).append(r["path"])
+
+        outcome = []
+        done_before = 0
+        for account_id, paths in by_account.items():
+            account = self.account_manager.get_account_by_id(account_id)
+            if account is None:
+                outcome += [(p, False, "Bound account no longer exists.") for p in paths]
+                continue
+
+            def _progress(done, total, offset=done_before):
+                if progress_callback: progress_callback(offset + done, len(drifted))
+
+            outcome += self.git_switcher.bind_repositories(
+                paths, account["username"], account["email"], account["ssh_key_path"],
+                max_workers=self.max_workers, progress_callback=_progress)
+            done_before += len(paths)
+
+        # Repaired repos are re-verified by the next audit
+        with self._state_lock:
+            for path, _, _ in outcome:
+                self._state.pop(path, None)
+            self._save_state()
+        return outcome
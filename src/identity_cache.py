@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from account_manager import AccountManager
+from repository_manager import RepositoryManager, BINDING_DIRECTORY
+from git_config import read_git_config, resolve_git_dirs
+from ssh_manager import GitSwitcher
+
+# Identity sources, in git's order of precedence
+SOURCE_LOCAL = "local"    # user.* in the repository's own config
+SOURCE_TREE = "tree"      # directory binding (includeIf) covering the path
+SOURCE_GLOBAL = "global"  # ~/.gitconfig
+
+# How long "this directory is not inside a repository" is trusted
+NEGATIVE_ROOT_TTL = 5.0
+MAX_ROOT_CACHE = 4096
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class IdentityCache:
+    """
+    Resolved git identities kept in memory.
+    Every answer is validated with a few stat() calls against the files it
+    was computed from (global config, ~/.ssh/config, the repository config,
+    accounts.json, repositories.json) and recomputed only when one changed,
+    so repeated lookups never spawn git or re-parse unchanged files.
+    """
+    def __init__(self, accounts_file: str, repos_file: str, git_switcher: Optional[GitSwitcher] = None):
+        self.accounts_file = accounts_file
+        self.repos_file = repos_file
+        self.git_switcher = git_switcher or GitSwitcher()
+        self._lock = threading.RLock()
+        self._stores_sig = None
+        self._accounts: Optional[AccountManager] = None
+        self._repos: Optional[RepositoryManager] = None
+        self._by_email: Dict[str, Dict] = {}
+        self._global: Optional[Tuple[Tuple, Dict]] = None
+        self._configs: Dict[str, Tuple[Optional[int], Dict[str, str]]] = {}
+        self._roots: Dict[str, Tuple[Optional[str], float]] = {}
+
+    def invalidate(self):
+        """Drops everything (e.g. right after an activation)."""
+        with self._lock:
+            self._stores_sig = None
+            self._global = None
+            self._configs.clear()
+            self._roots.clear()
+
+    def _stores(self) -> Tuple[AccountManager, RepositoryManager]:
+        """Reloads accounts/repositories when the GUI or CLI rewrote them."""
+        sig = (_mtime(self.accounts_file), _mtime(self.repos_file))
+        if sig != self._stores_sig:
+            self._accounts = AccountManager(storage_file=self.accounts_file)
+            self._repos = RepositoryManager(storage_file=self.repos_file)
+            self._by_email = {acc["email"].lower(): acc for acc in self._accounts.get_accounts() if acc.get("email")}
+            self._stores_sig = sig
+            self._global = None
+        return self._accounts, self._repos
+
+    def _account_for_email(self, email: Optional[str]) -> Optional[Dict]:
+        return self._by_email.get(email.lower()) if email else None
+
+    def global_identity(self) -> Dict:
+        """{"name", "email", "account", "account_id", "username", "ssh_identity", "source"} for the global config."""
+        with self._lock:
+            self._stores()
+            paths = self.git_switcher.global_config_paths() + [self.git_switcher.ssh_config_path]
+            sig = tuple(_mtime(p) for p in paths)
+            if self._global and self._global[0] == sig:
+                return self._global[1]
+
+            name, email = self.git_switcher.read_global_user()
+            account = self._account_for_email(email)
+            identity = {
+                "name": name,
+                "email": email,
+                "account": account["alias"] if account else None,
+                "account_id": account["id"] if account else None,
+                "username": account["username"] if account else None,
+                "ssh_identity": self.git_switcher.get_current_ssh_identity(),
+                "source": SOURCE_GLOBAL,
+            }
+            self._global = (sig, identity)
+            return identity
+
+    def _repo_root(self, path: str) -> Optional[str]:
+        """Nearest enclosing checkout (cached; negative answers expire quickly)."""
+        now = time.monotonic()
+        cached = self._roots.get(path)
+        if cached and (cached[0] is not None or now - cached[1] < NEGATIVE_ROOT_TTL):
+            if cached[0] is None or os.path.exists(os.path.join(cached[0], ".git")):
+                return cached[0]
+
+        root = None
+        current = path
+        while True:
+            if os.path.exists(os.path.join(current, ".git")):
+                root = current
+                break
+            parent = os.path.dirname(current)
+            if parent == current:
+                break
+            current = parent
+
+        if len(self._roots) >= MAX_ROOT_CACHE:
+            self._roots.clear()
+        self._roots[path] = (root, now)
+        return root
+
+    def _local_config(self, repo_root: str) -> Dict[str, str]:
+        _, common_dir = resolve_git_dirs(repo_root)
+        if not common_dir:
+            return {}
+        config_path = os.path.join(common_dir, "config")
+        mtime = _mtime(config_path)
+        cached = self._configs.get(config_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        values = read_git_config(config_path)
+        self._configs[config_path] = (mtime, values)
+        return values
+
+    def identity_for(self, path: str) -> Dict:
+        """
+        Effective identity for a directory: the repository's local user.*
+        if set, else the directory binding covering it, else global.
+        """
+        path = os.path.abspath(os.path.expanduser(path))
+        with self._lock:
+            accounts, repos = self._stores()
+            identity = dict(self.global_identity())
+            identity["path"] = path
+            identity["repo"] = self._repo_root(path)
+            binding = repos.resolve(path)
+            identity["binding"] = binding["path"] if binding else None
+
+            local = self._local_config(identity["repo"]) if identity["repo"] else {}
+            if local.get("user.email"):
+                account = self._account_for_email(local["user.email"])
+                identity.update(name=local.get("user.name", identity["name"]), email=local["user.email"],
+                                account=account["alias"] if account else None,
+                                account_id=account["id"] if account else None,
+                                username=account["username"] if account else None, source=SOURCE_LOCAL)
+            elif binding and binding.get("binding") == BINDING_DIRECTORY and identity["repo"]:
+                account = accounts.get_account_by_id(binding["account_id"])
+                if account:
+                    identity.update(name=account["username"], email=account["email"], account=account["alias"],
+                                    account_id=account["id"], username=account["username"], source=SOURCE_TREE)
+            return identity
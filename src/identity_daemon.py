@@ -0,0 +1,140 @@
+"""
+Local identity daemon for shell prompts.
+
+Keeps an IdentityCache in memory and answers one-line requests over a Unix
+domain socket, so a prompt can show the active identity without spawning git:
+
+    PING                -> PONG
+    PROMPT <directory>  -> account alias (or email) for that directory, "" if none
+    GET <directory>     -> the full identity as one line of JSON
+    INVALIDATE          -> OK (drop cached state)
+
+Example (bash):  printf 'PROMPT %s\\n' "$PWD" | nc -U "$GHM_IDENTITY_SOCK"
+"""
+import json
+import logging
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+from typing import Optional
+
+from identity_cache import IdentityCache
+
+MAX_REQUEST = 4096
+
+
+def is_supported() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+
+def default_socket_path() -> str:
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return os.environ.get("GHM_IDENTITY_SOCK") or os.path.join(runtime_dir, f"ghm-identity-{uid}.sock")
+
+
+def prompt_text(identity: dict) -> str:
+    return identity.get("account") or identity.get("email") or ""
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline(MAX_REQUEST).decode("utf-8", errors="replace").strip()
+        command, _, arg = line.partition(" ")
+        command = command.upper()
+        cache: IdentityCache = self.server.identity_cache
+        try:
+            if command == "PING":
+                reply = "PONG"
+            elif command == "PROMPT":
+                reply = prompt_text(cache.identity_for(arg or "/"))
+            elif command == "GET":
+                reply = json.dumps(cache.identity_for(arg or "/"))
+            elif command == "INVALIDATE":
+                cache.invalidate()
+                reply = "OK"
+            else:
+                reply = "ERR unknown command"
+        except Exception as e:
+            logging.error(f"Identity daemon request failed ({line!r}): {e}")
+            reply = f"ERR {e}"
+        self.wfile.write(reply.encode("utf-8") + b"\n")
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class IdentityDaemon:
+    """Serves IdentityCache lookups on a Unix socket from a background thread."""
+    def __init__(self, identity_cache: IdentityCache, socket_path: Optional[str] = None):
+        self.identity_cache = identity_cache
+        self.socket_path = socket_path or default_socket_path()
+        self._server: Optional[_Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._server is not None
+
+    def _bind(self):
+        if not is_supported():
+            raise OSError("Unix domain sockets are not available on this platform.")
+        if os.path.exists(self.socket_path):
+            # A live daemon answers; a leftover socket file from a crash does not
+            if query("PING", self.socket_path) == "PONG":
+                raise OSError(f"An identity daemon is already listening on {self.socket_path}")
+            os.unlink(self.socket_path)
+        old_umask = os.umask(0o177)  # socket is private to the user
+        try:
+            self._server = _Server(self.socket_path, _Handler)
+        finally:
+            os.umask(old_umask)
+        self._server.identity_cache = self.identity_cache
+
+    def start(self):
+        """Runs the server on a daemon thread (used by both the CLI and tray mode)."""
+        if self.running:
+            return
+        self._bind()
+        self._thread = threading.Thread(target=self._server.serve_forever, name="IdentityDaemon", daemon=True)
+        self._thread.start()
+        logging.info(f"Identity daemon listening on {self.socket_path}")
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+        self._cleanup()
+
+    def _cleanup(self):
+        if self._server:
+            self._server.server_close()
+            self._server = None
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+
+
+def query(request: str, socket_path: Optional[str] = None, timeout: float = 0.5) -> Optional[str]:
+    """Sends one request; returns the reply line, or None if no daemon is listening."""
+    if not is_supported():
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path or default_socket_path())
+            sock.sendall(request.encode("utf-8") + b"\n")
+            chunks = []
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                if chunk.endswith(b"\n"):
+                    break
+        return b"".join(chunks).decode("utf-8", errors="replace").rstrip("\n")
+    except OSError:
+        return None
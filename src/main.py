@@ -1,44 +1,50 @@
+import os
+import sys
+
+# Single instance: a second launch hands its request to the running app and
+# exits before the GUI stack is even imported.
+if __name__ == "__main__":
+    from app_paths import DATA_DIR as _DATA_DIR
+    from single_instance import SingleInstance, hand_off
+    _PROBE = os.environ.get("GHM_STARTUP_PROBE") or os.environ.get("GHM_TRAY_PROBE")
+    INSTANCE = None if _PROBE else SingleInstance(_DATA_DIR)
+    if INSTANCE and not INSTANCE.acquire():
+        if hand_off(_DATA_DIR, {"command": "show"}) is None:
+            print("GitHub Account Manager Pro is already running but did not respond.")
+        sys.exit(0)
+
 import customtkinter as ctk
 import tkinter as tk
-import sys
-from tkinter import messagebox, filedialog
-import os
+from tkinter import messagebox, filedialog, ttk
+import gc
 import logging
 import traceback
 from datetime import datetime
 import threading
-from PIL import Image
-import pystray
-from pystray import MenuItem as item
+import queue
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import cached_property
 from account_manager import AccountManager
 from ssh_manager import GitSwitcher
+from snapshot_store import SnapshotStore
 from avatar_manager import AvatarManager
-from repository_manager import RepositoryManager
-from gpg_manager import GPGManager
-
-# Determine Base Path (Frozen vs Source)
-if getattr(sys, 'frozen', False):
-    # Running as compiled exe
-    # Mutable data (logs, config) goes relative to the EXE
-    BASE_DIR = os.path.dirname(sys.executable)
-    # Assets (images) go in the temp folder provided by PyInstaller
-    ASSETS_DIR = sys._MEIPASS
-else:
-    # Running from source
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    ASSETS_DIR = BASE_DIR
-
-# Setup Logging
-log_dir = os.path.join(BASE_DIR, "logs")
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
-    
-log_file = os.path.join(log_dir, f"app_{datetime.now().strftime('%Y%m%d')}.log")
-logging.basicConfig(
-    filename=log_file, 
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+from repository_manager import RepositoryManager, BINDING_DIRECTORY
+from repo_discovery import RepositoryDiscovery
+from identity_audit import IdentityAuditor, AUDIT_OK, AUDIT_UNCHANGED, AUDIT_DRIFT
+from binding_watcher import BindingEnforcer
+from settings_manager import SettingsManager
+from repo_health import RepoHealthCollector
+from identity_cache import IdentityCache
+from identity_daemon import IdentityDaemon, is_supported as unix_sockets_supported
+from task_scheduler import TaskScheduler
+from search_index import AccountRepoIndex
+from metrics import METRICS, timed, resident_memory_bytes, release_free_memory
+from profiler import Profiler, profiling_options
+from app_logging import setup_logging, stop_logging
+from app_paths import BASE_DIR, ASSETS_DIR, DATA_DIR, LOG_DIR, ACCOUNTS_FILE, REPOS_FILE, GIT_INCLUDES_DIR, SNAPSHOTS_DIR
+
+# Setup Logging (queued, written as JSON lines by a background thread; see app_logging.py)
+setup_logging(LOG_DIR)
 
 # Set Theme
 
@@ -47,82 +53,448 @@ ctk.set_appearance_mode("System")  # Modes: "System" (standard), "Dark", "Light"
 ctk.set_default_color_theme("blue")  # Themes: "blue" (standard), "green", "dark-blue"
 
 class App(ctk.CTk):
-    def __init__(self):
+    def __init__(self, instance=None, profiler=None, profile_seconds=None):
         super().__init__()
         self.title("GitHub Account Manager Pro")
         self.geometry("900x650")
         
         # Local Keys Directory & Data - Use BASE_DIR for persistence
         self.local_keys_dir = os.path.join(BASE_DIR, "ssh_keys")
+        # Per-account git config files referenced by directory (includeIf) bindings
+        self.git_includes_dir = GIT_INCLUDES_DIR
         self.avatars_dir = os.path.join(BASE_DIR, "avatars")
         
-        # Config Files - Explicitly pass persistent paths
-        self.accounts_file = os.path.join(BASE_DIR, "data", "accounts.json") 
-        self.repos_file = os.path.join(BASE_DIR, "data", "repositories.json")
+        # Config Files - Explicitly pass persistent paths (shared with cli.py)
+        self.accounts_file = ACCOUNTS_FILE
+        self.repos_file = REPOS_FILE
         
         # Ensure data dir exists
-        data_dir = os.path.join(BASE_DIR, "data")
+        data_dir = DATA_DIR
         if not os.path.exists(data_dir):
              os.makedirs(data_dir)
              
         # Icon - Use ASSETS_DIR (bundled)
         self.icon_path = os.path.join(ASSETS_DIR, "denastech.png")
         
+        # All blocking work (git, ssh, gpg, network) runs here; results come back on the Tk thread
+        self.scheduler = TaskScheduler(self)
+        self.scheduler.start()
+        
         # Managers - Pass persistent paths
+        # (the rest are created on first use, see the cached properties below)
         self.account_manager = AccountManager(storage_file=self.accounts_file)
-        self.avatar_manager = AvatarManager(self.avatars_dir)
+        self.avatar_manager = AvatarManager(self.avatars_dir, scheduler=self.scheduler)
         self.repo_manager = RepositoryManager(storage_file=self.repos_file)
-        self.gpg_manager = GPGManager()
-        self.git_switcher = GitSwitcher()
+        self.git_switcher = GitSwitcher(snapshots=SnapshotStore(SNAPSHOTS_DIR), includes_dir=self.git_includes_dir)
+        self.settings = SettingsManager(storage_file=os.path.join(data_dir, "settings.json"))
+        # Resolved identities, revalidated by file mtimes; shared by the status bar and the daemon
+        self.identity_cache = IdentityCache(self.accounts_file, self.repos_file, self.git_switcher)
+        self.identity_daemon = IdentityDaemon(self.identity_cache)
 
-        # System Tray State
+        # Status bar model: (name, email, username, has_avatar) and its image
+        self._status_key = None
+        self._status_image = None
+        self._status_avatar_requested = set()
+        # Account matching the global identity (checked in the tray menu)
+        self._active_account_id = None
+        # Latest account picked in the tray; earlier picks still queued are dropped
+        self._tray_request = None
+
+        # Search over accounts and bindings, built on a worker (see ensure_search_index)
+        self._search_index = None
+        self._search_building = False
+        # A watch-set refresh is queued (see on_bindings_changed)
+        self._watch_refresh_pending = False
+        # Watch Mode is started/stopped on workers, one change at a time (see apply_watch_mode)
+        self._watch_lock = threading.Lock()
+        self._search_after = {}
+
+        # System Tray State (one icon for the app's lifetime, hidden while the window shows)
         self.tray_icon = None
 
         # UI Setup
         self.setup_ui()
         self.refresh_account_list()
-        self.update_status_bar()
         
         self.current_dialog = None
         
+        # Answer hand-off requests from later launches and the CLI
+        self.instance = instance
+        if self.instance:
+            self.instance.serve(self.handle_instance_request)
+        
+        # Services that are not needed for the first frame start once it is drawn
+        self.after(200, self.start_background_services)
+        self.after(self.STATUS_POLL_MS, self.poll_identity)
+        
+        # Profiling capture (started before the window when asked for on the command line)
+        self.profiler = profiler or Profiler(LOG_DIR)
+        if self.profiler.running and profile_seconds:
+            self.after(int(profile_seconds * 1000), self.stop_profiling)
+        self.bind_all("<Control-Shift-P>", lambda event: self.toggle_profiling())
+        
         # Override Close Event
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
-        
+
+    # --- Lazily created managers (not needed to paint the first window) ---
+
+    @cached_property
+    def gpg_manager(self):
+        from gpg_manager import GPGManager
+        return GPGManager()
+
+    @cached_property
+    def repo_discovery(self):
+        return RepositoryDiscovery(cache_file=os.path.join(DATA_DIR, "discovery_cache.json"))
+
+    @cached_property
+    def identity_auditor(self):
+        return IdentityAuditor(self.account_manager, self.repo_manager, self.git_switcher,
+                               state_file=os.path.join(DATA_DIR, "audit_state.json"))
+
+    @cached_property
+    def health_collector(self):
+        return RepoHealthCollector(cache_file=os.path.join(DATA_DIR, "health_cache.json"))
+
+    @cached_property
+    def binding_enforcer(self):
+        return BindingEnforcer(self.account_manager, self.repo_manager, self.git_switcher, self.identity_auditor,
+                               on_identity_change=lambda: self.refresh_identity(force=True))
+
+    def ensure_search_index(self):
+        """Builds the index on a worker (seconds for 100k bindings); the managers keep it current afterwards."""
+        if self._search_index is not None or self._search_building:
+            return
+        self._search_building = True
+
+        def ready(index):
+            self._search_index = index
+            self._search_building = False
+            # Searches typed while it was building showed a placeholder
+            if self.ui_built and self.entry_account_search.get().strip():
+                self.refresh_account_list()
+            if hasattr(self, "entry_repo_search") and self.entry_repo_search.get().strip():
+                self.refresh_repo_list()
+
+        def failed(error):
+            self._search_building = False
+
+        self.scheduler.submit(AccountRepoIndex, self.account_manager, self.repo_manager,
+                              on_done=ready, on_error=failed, name="search.index")
+
+    def search(self, kind, query):
+        """Matching accounts or bindings, or None while the index is still being built."""
+        if self._search_index is None:
+            self.ensure_search_index()
+            return None
+        if kind == "accounts":
+            return self._search_index.search_accounts(query)
+        return self._search_index.search_repos(query)
+
+    def on_bindings_changed(self, event, repo):
+        """Keeps the watch set in line with the bindings, off the Tk thread and once per burst of changes."""
+        if self._watch_refresh_pending or "binding_enforcer" not in self.__dict__:
+            return
+        if not self.binding_enforcer.running:
+            return
+        self._watch_refresh_pending = True
+
+        def refresh():
+            self._watch_refresh_pending = False
+            if self.binding_enforcer.running:
+                self.binding_enforcer.refresh()
+
+        self.scheduler.submit(refresh, name="watch.refresh")
+
+    def start_background_services(self):
+        self.ensure_search_index()
+        self.repo_manager.add_listener(self.on_bindings_changed)
+
+        # Watch Mode (re-enforce bindings when configs change); reading every
+        # bound repository's config happens off the Tk thread
+        if self.settings.get("watch_mode", False):
+            self.scheduler.submit(self.apply_watch_mode, name="watch.start")
+
+        # Identity daemon (answers shell prompts while the app sits in the tray)
+        if self.settings.get("identity_daemon", False) and unix_sockets_supported():
+            try:
+                self.identity_daemon.start()
+                self.switch_daemon.select()
+            except OSError as e:
+                logging.error(f"Identity daemon not started: {e}")
+
+    def report_first_paint(self):
+        """GHM_STARTUP_PROBE: prints a marker once the first frame is drawn, then exits."""
+        self.update_idletasks()
+        lazy = [m for m in ("pystray", "requests", "gpg_manager") if m in sys.modules]
+        print("FIRST_PAINT " + ",".join(lazy), flush=True)
+        self.destroy_and_exit()
+        
+    def report_tray_footprint(self):
+        """GHM_TRAY_PROBE: prints the RSS with every tab built and once tray mode released the UI, then exits."""
+        for name in list(self._tab_builders):
+            self.tab_view.set(name)
+            self.on_tab_changed()
+        self.update()
+        gc.collect()
+        shown = resident_memory_bytes()
+        self.withdraw()
+        self.release_ui()
+
+        def _wait():
+            if self.ui_built:
+                self.after(200, _wait)
+                return
+            print(f"TRAY_FOOTPRINT {shown} {resident_memory_bytes()}", flush=True)
+            self.destroy_and_exit()
+        _wait()
+
+    # How long the window stays hidden before its widgets are released
+    TRAY_RELEASE_DELAY_MS = 5000
+
     def on_closing(self):
         """Minimize to tray instead of closing."""
         self.withdraw()
-        threading.Thread(target=self.create_tray_icon, daemon=True).start()
+        if not self.show_tray_icon():
+            self.quit_app() # Fallback
+            return
+        self.after(self.TRAY_RELEASE_DELAY_MS, self.release_ui)
 
-    def create_tray_icon(self):
+    def show_tray_icon(self):
+        """Shows the tray icon, creating it and its thread the first time. False when there is no tray."""
+        if self.tray_icon is not None:
+            self.tray_icon.visible = True
+            return True
         try:
-            image = Image.open(self.icon_path)
-            menu = (
-                item("Make Active", self.show_window, default=True),
-                item("Quit", self.quit_app)
-            )
-            self.tray_icon = pystray.Icon("name", image, "GitHub Manager", menu)
-            self.tray_icon.run()
+            self.tray_icon = self.create_tray_icon()
         except Exception as e:
             logging.error(f"Failed to create tray icon: {e}")
-            self.quit_app() # Fallback
+            return False
+        threading.Thread(target=self.tray_icon.run, name="tray", daemon=True).start()
+        return True
+
+    def create_tray_icon(self):
+        # Only needed once the window is hidden, so not imported at startup
+        import pystray
+        from PIL import Image
+        image = Image.open(self.icon_path)
+        image.load()
+        # The items are generated again on every update_menu(), so they follow the account list
+        return pystray.Icon("name", image, "GitHub Manager", pystray.Menu(self.tray_menu_items))
+
+    def tray_menu_items(self):
+        """Show Window, one entry per account (the active one checked), Quit. Runs on the tray thread."""
+        from pystray import Menu, MenuItem as item
+        yield item("Show Window", self.show_window, default=True)
+        yield Menu.SEPARATOR
+        accounts = list(self.account_manager.get_accounts())
+        if not accounts:
+            yield item("No saved accounts", None, enabled=False)
+        for acc in accounts:
+            yield item(acc['alias'], self._tray_action(acc), checked=self._tray_checked(acc['id']), radio=True)
+        yield Menu.SEPARATOR
+        yield item("Quit", self.quit_app)
+
+    # pystray picks the call signature from the argument count, so no default arguments here
+    def _tray_action(self, acc):
+        return lambda: self.activate_from_tray(acc)
+
+    def _tray_checked(self, account_id):
+        return lambda menu_item: self._active_account_id == account_id
+
+    def update_tray_menu(self):
+        """Regenerates the tray menu (accounts or the active one changed). Safe from any thread."""
+        if self.tray_icon is not None:
+            self.tray_icon.update_menu()
+
+    def activate_from_tray(self, acc):
+        """Switches the global identity from the tray menu, without building or showing the window."""
+        # Check the entry right away; refresh_identity() corrects it if the switch fails
+        self._active_account_id = acc['id']
+        self._tray_request = acc['id']
+        self.update_tray_menu()
+
+        def switch():
+            # Quick successive picks: only the latest one still waiting is carried out
+            if self._tray_request != acc['id']:
+                return None
+            return self.git_switcher.activate_account(acc['alias'], acc['email'], acc['ssh_key_path'], acc.get('gpg_key_id'))
+
+        def done(result):
+            if result is None:
+                return  # superseded
+            success, msg = result
+            self.refresh_identity(force=True)
+            if success:
+                logging.info(f"Tray: {msg}")
+            else:
+                self.notify_tray("Switch failed", msg)
+
+        self.scheduler.submit(switch, on_done=done, on_error=lambda e: done((False, str(e))), name="tray.activate")
+
+    def notify_tray(self, title, message):
+        logging.error(f"{title}: {message}")
+        icon = self.tray_icon
+        if icon is not None and getattr(icon, "HAS_NOTIFICATION", False):
+            icon.notify(message, title)
 
     def show_window(self, icon=None, item=None):
-        """Restore window from tray."""
+        """Restore window from tray (safe from the tray and server threads)."""
         if self.tray_icon:
-            self.tray_icon.stop()
-            self.tray_icon = None
+            self.tray_icon.visible = False
         
-        self.after(0, self.deiconify)
+        self.scheduler.call_soon(self.restore_ui)
+
+    def release_ui(self):
+        """
+        Tray mode: destroys the widget tree and drops decoded avatars, so the
+        hidden app keeps only its managers. restore_ui() rebuilds the window.
+        """
+        if not self.ui_built or self.state() != "withdrawn":
+            return  # already released, or restored in the meantime
+        dialogs = [w for w in self.winfo_children() if isinstance(w, tk.Toplevel)]
+        if self.scheduler.busy or getattr(self, "_health_running", False) or dialogs:
+            # Results of running work still go to the widgets; try again later
+            self.after(self.TRAY_RELEASE_DELAY_MS, self.release_ui)
+            return
+
+        before = resident_memory_bytes()
+        self.sidebar_frame.destroy()
+        self.tab_view.destroy()
+        # Drop every reference to the destroyed widgets (the tab checks use hasattr)
+        for name in [n for n, v in vars(self).items() if isinstance(v, tk.Misc)]:
+            delattr(self, name)
+        if hasattr(self, "selected_account"):
+            del self.selected_account
+        self.current_dialog = None
+        self.account_buttons = []
+        self.accounts_cache = []
+        self._status_image = None
+        self.avatar_manager.clear_cache()
+        self.ui_built = False
+
+        gc.collect()
+        release_free_memory()
+        after = resident_memory_bytes()
+        if before and after:
+            logging.info(f"Tray mode: UI released, RSS {before / 2**20:.1f} MiB -> {after / 2**20:.1f} MiB")
+
+    def restore_ui(self):
+        """Rebuilds the window if tray mode released it, then shows it."""
+        if not self.ui_built:
+            self.setup_ui()
+            self.refresh_account_list()
+            if self._status_key is not None:
+                self.apply_identity(self._status_key)
+            if self.identity_daemon.running:
+                self.switch_daemon.select()
+        self.deiconify()
+
+    def bring_to_front(self):
+        self.deiconify()
+        self.lift()
+        self.focus_force()
+
+    # Forwarded requests wait this long for the Tk thread / the switch (cli.py waits a bit longer)
+    INSTANCE_REQUEST_TIMEOUT = 20
+
+    def call_on_ui(self, fn, *args, timeout=None):
+        """Runs fn(*args) on the Tk thread and waits for its result. For server threads only."""
+        finished = threading.Event()
+        outcome = {}
+
+        def run():
+            try:
+                outcome["result"] = fn(*args)
+            except Exception as e:
+                outcome["error"] = e
+            finally:
+                finished.set()
+
+        self.scheduler.call_soon(run)
+        if not finished.wait(self.INSTANCE_REQUEST_TIMEOUT if timeout is None else timeout):
+            raise TimeoutError("the window did not respond")
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["result"]
+
+    def find_account_reloading(self, account_id):
+        """The account with this id, re-reading the store once if it is unknown (added through the CLI)."""
+        acc = self.account_manager.get_account_by_id(account_id)
+        if acc is None:
+            self.account_manager.reload()
+            self.refresh_account_list()
+            acc = self.account_manager.get_account_by_id(account_id)
+        return acc
+
+    def handle_instance_request(self, request):
+        """Requests forwarded by a second launch or the CLI (runs on a server thread)."""
+        command = request.get("command")
+        if command == "show":
+            self.show_window()
+            self.scheduler.call_soon(self.bring_to_front)
+            return {"ok": True, "message": "Window restored."}
+        if command == "switch":
+            try:
+                acc = self.call_on_ui(self.find_account_reloading, request.get("account_id"))
+                if acc is None:
+                    return {"ok": False, "message": "Unknown account."}
+                # Same pool (and GitSwitcher lock) as switches from the window and the tray
+                task = self.scheduler.submit(self.git_switcher.activate_account, acc['alias'], acc['email'],
+                                             acc['ssh_key_path'], acc.get('gpg_key_id'), name="instance.switch")
+                result = task.future.result(timeout=self.INSTANCE_REQUEST_TIMEOUT)
+            except (TimeoutError, FutureTimeoutError):
+                return {"ok": False, "message": "Timed out waiting for the running app; the switch may still complete."}
+            except Exception as e:
+                return {"ok": False, "message": f"Switch failed: {e}"}
+            if result is None:
+                return {"ok": False, "message": "The application is shutting down."}
+            success, msg = result
+            if success:
+                self.scheduler.call_soon(self.refresh_identity, True)
+            return {"ok": success, "message": msg}
+        if command == "metrics":
+            text = METRICS.to_json() + "\n" if request.get("format") == "json" else METRICS.to_prometheus()
+            return {"ok": True, "message": text}
+        return {"ok": False, "message": f"Unknown command: {command}"}
 
     def quit_app(self, icon=None, item=None):
         """Completely exit application."""
         if self.tray_icon:
             self.tray_icon.stop()
+            self.tray_icon = None
         
-        self.after(0, self.destroy_and_exit)
+        self.scheduler.call_soon(self.destroy_and_exit)
+
+    def toggle_profiling(self):
+        if self.profiler.running:
+            self.stop_profiling(notify=True)
+        else:
+            self.profiler.start()
+            messagebox.showinfo("Profiling", "Profiling started.\n\nUse the same menu item (or Ctrl+Shift+P) to stop "
+                                             "and write the capture to the logs folder.")
+
+    def stop_profiling(self, notify=False):
+        written = self.profiler.stop()
+        if notify and written:
+            messagebox.showinfo("Profiling", "Profile written:\n\n" + "\n".join(written))
+
+    def show_hidden_menu(self, event):
+        """Right-click on the sidebar title: diagnostics tools not worth a visible button."""
+        menu = tk.Menu(self, tearoff=0)
+        menu.add_command(label="Stop Profiling" if self.profiler.running else "Start Profiling",
+                         command=self.toggle_profiling)
+        menu.tk_popup(event.x_root, event.y_root)
 
     def destroy_and_exit(self):
+        # Still capturing at exit: keep what was recorded
+        self.stop_profiling()
+        self.scheduler.shutdown()
+        self.identity_daemon.stop()
+        if self.instance:
+            self.instance.close()
         self.destroy()
+        stop_logging()
         os._exit(0) # Force kill threads
 
     def setup_ui(self):
@@ -132,10 +504,11 @@ class App(ctk.CTk):
         # -- Sidebar (Left) --
         self.sidebar_frame = ctk.CTkFrame(self, width=200, corner_radius=0)
         self.sidebar_frame.grid(row=0, column=0, rowspan=4, sticky="nsew")
-        self.sidebar_frame.grid_rowconfigure(4, weight=1)
+        self.sidebar_frame.grid_rowconfigure(5, weight=1)
         
         self.logo_label = ctk.CTkLabel(self.sidebar_frame, text="Git Manager", font=ctk.CTkFont(size=20, weight="bold"))
         self.logo_label.grid(row=0, column=0, padx=20, pady=(20, 10))
+        self.logo_label.bind("<Button-3>", self.show_hidden_menu)
         
         self.btn_add = ctk.CTkButton(self.sidebar_frame, text="Add Account", command=self.show_add_dialog)
         self.btn_add.grid(row=1, column=0, padx=20, pady=10)
@@ -147,24 +520,36 @@ class App(ctk.CTk):
         self.lbl_accounts = ctk.CTkLabel(self.sidebar_frame, text="SAVED ACCOUNTS", anchor="w")
         self.lbl_accounts.grid(row=3, column=0, padx=20, pady=(10, 0))
         
-        self.scroll_accounts = ctk.CTkScrollableFrame(self.sidebar_frame, label_text="")
-        self.scroll_accounts.grid(row=4, column=0, padx=20, pady=10, sticky="nsew")
+        self.entry_account_search = ctk.CTkEntry(self.sidebar_frame, placeholder_text="Search accounts...")
+        self.entry_account_search.grid(row=4, column=0, padx=20, pady=(10, 0), sticky="ew")
+        self.entry_account_search.bind("<KeyRelease>", lambda event: self.schedule_search(self.refresh_account_list))
         
-        self.scroll_accounts.grid(row=4, column=0, padx=20, pady=10, sticky="nsew")
+        self.scroll_accounts = ctk.CTkScrollableFrame(self.sidebar_frame, label_text="")
+        self.scroll_accounts.grid(row=5, column=0, padx=20, pady=10, sticky="nsew")
         
         # -- Main Area (Right) --
         # Use Tabview
-        self.tab_view = ctk.CTkTabview(self)
+        self.tab_view = ctk.CTkTabview(self, command=self.on_tab_changed)
         self.tab_view.grid(row=0, column=1, rowspan=4, padx=20, pady=10, sticky="nsew")
         
         self.tab_dashboard = self.tab_view.add("Dashboard")
         self.tab_repos = self.tab_view.add("Repository Manager")
+        self.tab_health = self.tab_view.add("Health")
+        self.tab_diagnostics = self.tab_view.add("Diagnostics")
         
         # === DASHBOARD TAB ===
         self.setup_dashboard_tab()
         
-        # === REPO MANAGER TAB ===
-        self.setup_repo_tab()
+        # === REPO MANAGER / HEALTH / DIAGNOSTICS TABS ===
+        # Built the first time they are opened
+        self._tab_builders = {"Repository Manager": self.setup_repo_tab, "Health": self.setup_health_tab,
+                              "Diagnostics": self.setup_diagnostics_tab}
+        self.ui_built = True
+
+    def on_tab_changed(self):
+        builder = self._tab_builders.pop(self.tab_view.get(), None)
+        if builder:
+            builder()
 
     def setup_dashboard_tab(self):
         # Header
@@ -180,6 +565,11 @@ class App(ctk.CTk):
         self.btn_verify = ctk.CTkButton(self.header_frame, text="Test Connection", width=100, command=self.test_connection, fg_color="#2CC985", hover_color="#229C68")
         self.btn_verify.pack(side="right")
 
+        self.switch_daemon = ctk.CTkSwitch(self.header_frame, text="Serve Prompts", width=120, command=self.toggle_identity_daemon)
+        self.switch_daemon.pack(side="right", padx=10)
+        if not unix_sockets_supported():
+            self.switch_daemon.configure(state="disabled")
+
         # Details Area
         self.details_frame = ctk.CTkFrame(self.tab_dashboard)
         self.details_frame.pack(fill="both", expand=True, pady=20)
@@ -216,6 +606,17 @@ class App(ctk.CTk):
         
         ctk.CTkLabel(top_bar, text="Managed Repositories (Local Overrides)", font=ctk.CTkFont(size=16, weight="bold")).pack(side="left")
         ctk.CTkButton(top_bar, text="+ Add Repository", command=self.add_repository).pack(side="right")
+        ctk.CTkButton(top_bar, text="Scan Folder...", fg_color="transparent", border_width=2, text_color=("gray10", "#DCE4EE"), command=self.scan_repositories).pack(side="right", padx=10)
+        self.switch_watch = ctk.CTkSwitch(top_bar, text="Watch", width=80, command=self.toggle_watch_mode)
+        self.switch_watch.pack(side="right", padx=(10, 0))
+        if self.settings.get("watch_mode", False):
+            self.switch_watch.select()
+        ctk.CTkButton(top_bar, text="Audit", width=70, fg_color="#2CC985", hover_color="#229C68", command=self.audit_repositories).pack(side="right", padx=(10, 0))
+        ctk.CTkButton(top_bar, text="Bind Directory Tree...", fg_color="transparent", border_width=2, text_color=("gray10", "#DCE4EE"), command=self.bind_directory_tree).pack(side="right")
+        
+        self.entry_repo_search = ctk.CTkEntry(self.tab_repos, placeholder_text="Search by alias, path or account...")
+        self.entry_repo_search.pack(fill="x")
+        self.entry_repo_search.bind("<KeyRelease>", lambda event: self.schedule_search(self.refresh_repo_list))
         
         # Scrollable List
         self.scroll_repos = ctk.CTkScrollableFrame(self.tab_repos)
@@ -223,14 +624,211 @@ class App(ctk.CTk):
         
         self.refresh_repo_list()
 
+    HEALTH_COLUMNS = (
+        ("alias", "Repository", 140), ("account", "Bound To", 100), ("branch", "Branch", 110),
+        ("state", "State", 90), ("sync", "Ahead/Behind", 90), ("author", "Last Commit Author", 200),
+    )
+
+    def setup_health_tab(self):
+        top_bar = ctk.CTkFrame(self.tab_health, fg_color="transparent")
+        top_bar.pack(fill="x", pady=10)
+        
+        self.lbl_health_status = ctk.CTkLabel(top_bar, text="Click Refresh to collect repository status.", text_color="gray")
+        self.lbl_health_status.pack(side="left")
+        ctk.CTkButton(top_bar, text="Full Refresh", width=90, fg_color="transparent", border_width=2, text_color=("gray10", "#DCE4EE"),
+                      command=lambda: self.refresh_health(force=True)).pack(side="right")
+        ctk.CTkButton(top_bar, text="Refresh", width=90, command=self.refresh_health).pack(side="right", padx=10)
+        
+        # A Treeview handles thousands of rows without one widget per repository
+        table_frame = ctk.CTkFrame(self.tab_health)
+        table_frame.pack(fill="both", expand=True, pady=10)
+        self.health_tree = ttk.Treeview(table_frame, columns=[c[0] for c in self.HEALTH_COLUMNS], show="headings")
+        for col, heading, width in self.HEALTH_COLUMNS:
+            self.health_tree.heading(col, text=heading)
+            self.health_tree.column(col, width=width, anchor="w")
+        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.health_tree.yview)
+        self.health_tree.configure(yscrollcommand=scrollbar.set)
+        self.health_tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        self.health_tree.tag_configure("warn", foreground="#E0AA00")
+        self.health_tree.tag_configure("error", foreground="#FF5555")
+        
+        self._health_queue = queue.Queue()
+        self._health_running = False
+
+    def refresh_health(self, force=False):
+        """Collects repository health in the background; rows stream in as they finish."""
+        if self._health_running:
+            return
+        repos = self.repo_manager.get_repos()
+        accounts = {a['id']: a for a in self.account_manager.get_accounts()}
+        expected = {acc_id: a['email'] for acc_id, a in accounts.items()}
+        self._health_accounts = {acc_id: a['alias'] for acc_id, a in accounts.items()}
+        self._health_total = len(repos)
+        self._health_done = 0
+        self._health_running = True
+        
+        # Drop rows for repositories that are no longer managed
+        paths = {r['path'] for r in repos}
+        self._health_repo_accounts = {r['path']: r['account_id'] for r in repos}
+        for iid in self.health_tree.get_children():
+            if iid not in paths:
+                self.health_tree.delete(iid)
+        
+        # Rows are queued by the collector's workers and applied in batches by drain_health_queue
+        def _collect(task):
+            try:
+                self.health_collector.collect(repos, expected, force=force, result_callback=self._health_queue.put,
+                                              should_stop=task.should_stop)
+            finally:
+                self._health_queue.put(None)
+        
+        self.scheduler.submit_job(_collect)
+        self.after(100, self.drain_health_queue)
+
+    def drain_health_queue(self):
+        # Apply at most a batch of rows per tick so the UI stays responsive
+        finished = False
+        for _ in range(500):
+            try:
+                health = self._health_queue.get_nowait()
+            except queue.Empty:
+                break
+            if health is None:
+                finished = True
+                break
+            self._health_done += 1
+            self.update_health_row(health)
+        
+        self.lbl_health_status.configure(text=f"{self._health_done}/{self._health_total} repositories"
+                                              + ("" if finished else " (scanning...)"))
+        if finished:
+            self._health_running = False
+        else:
+            self.after(100, self.drain_health_queue)
+
+    def update_health_row(self, health):
+        account = self._health_accounts.get(self._health_repo_accounts.get(health['path']), "Unknown")
+        if health.get('error'):
+            values = (health['alias'], account, "-", "error", "-", health['error'])
+            tags = ("error",)
+        else:
+            state = "clean"
+            if health['dirty']:
+                state = f"{health['changed']} changed" if health['changed'] else f"{health['untracked']} untracked"
+            sync = f"+{health['ahead']} / -{health['behind']}" if health['upstream'] else "no upstream"
+            author = f"{health['last_author']} <{health['last_email']}>" if health.get('last_email') else "(no commits)"
+            if health['identity_ok'] is False:
+                author = "MISMATCH: " + author
+            values = (health['alias'], account, health['branch'] or "(detached)", state, sync, author)
+            tags = ("warn",) if health['identity_ok'] is False else ()
+        
+        if self.health_tree.exists(health['path']):
+            self.health_tree.item(health['path'], values=values, tags=tags)
+        else:
+            self.health_tree.insert("", "end", iid=health['path'], values=values, tags=tags)
+
+    # --- Diagnostics: per-operation latency histograms (see metrics.py) ---
+
+    DIAGNOSTICS_COLUMNS = (
+        ("operation", "Operation", 200), ("count", "Count", 80), ("p50", "p50 (ms)", 90),
+        ("p95", "p95 (ms)", 90), ("max", "Max (ms)", 90),
+    )
+    DIAGNOSTICS_REFRESH_MS = 2000
+
+    def setup_diagnostics_tab(self):
+        top_bar = ctk.CTkFrame(self.tab_diagnostics, fg_color="transparent")
+        top_bar.pack(fill="x", pady=10)
+
+        ctk.CTkLabel(top_bar, text="Latency of recent operations since the app started.", text_color="gray").pack(side="left")
+        ctk.CTkButton(top_bar, text="Export...", width=90, command=self.export_metrics).pack(side="right")
+        ctk.CTkButton(top_bar, text="Reset", width=90, fg_color="transparent", border_width=2, text_color=("gray10", "#DCE4EE"),
+                      command=self.reset_metrics).pack(side="right", padx=10)
+
+        table_frame = ctk.CTkFrame(self.tab_diagnostics)
+        table_frame.pack(fill="both", expand=True, pady=10)
+        self.diagnostics_tree = ttk.Treeview(table_frame, columns=[c[0] for c in self.DIAGNOSTICS_COLUMNS], show="headings")
+        for col, heading, width in self.DIAGNOSTICS_COLUMNS:
+            self.diagnostics_tree.heading(col, text=heading)
+            self.diagnostics_tree.column(col, width=width, anchor="w" if col == "operation" else "e")
+        self.diagnostics_tree.pack(fill="both", expand=True)
+
+        self.refresh_diagnostics()
+
+    def refresh_diagnostics(self):
+        """Redraws the histogram table while the Diagnostics tab is showing."""
+        if not self.ui_built:
+            return  # released in tray mode; the rebuilt tab starts a new loop
+        if self.tab_view.get() == "Diagnostics" and self.state() != "withdrawn":
+            snapshot = METRICS.snapshot()
+            for iid in self.diagnostics_tree.get_children():
+                if iid not in snapshot:
+                    self.diagnostics_tree.delete(iid)
+            for name, stats in snapshot.items():
+                values = (name, stats['count'], f"{stats['p50'] * 1000:.1f}", f"{stats['p95'] * 1000:.1f}",
+                          f"{stats['max'] * 1000:.1f}")
+                if self.diagnostics_tree.exists(name):
+                    self.diagnostics_tree.item(name, values=values)
+                else:
+                    self.diagnostics_tree.insert("", "end", iid=name, values=values)
+        self.after(self.DIAGNOSTICS_REFRESH_MS, self.refresh_diagnostics)
+
+    def reset_metrics(self):
+        METRICS.reset()
+        self.diagnostics_tree.delete(*self.diagnostics_tree.get_children())
+
+    def export_metrics(self):
+        path = filedialog.asksaveasfilename(
+            title="Export Metrics", initialdir=LOG_DIR,
+            initialfile=f"metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            filetypes=[("JSON", "*.json"), ("Prometheus text", "*.prom"), ("All files", "*.*")])
+        if not path:
+            return
+        text = METRICS.to_prometheus() if path.endswith((".prom", ".txt")) else METRICS.to_json()
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+        except OSError as e:
+            messagebox.showerror("Export Failed", str(e))
+            return
+        logging.info(f"Metrics exported to {path}")
+
+    # One card per binding; longer lists are narrowed with the search box
+    REPO_LIST_LIMIT = 500
+    SEARCH_DEBOUNCE_MS = 150
+
+    def schedule_search(self, refresh):
+        """Re-runs a list refresh once typing pauses."""
+        pending = self._search_after.pop(refresh.__name__, None)
+        if pending:
+            self.after_cancel(pending)
+        self._search_after[refresh.__name__] = self.after(self.SEARCH_DEBOUNCE_MS, refresh)
+
+    @timed("ui.refresh_repos")
     def refresh_repo_list(self):
+        if not hasattr(self, "scroll_repos"):
+            return  # tab not built yet; it lists the bindings when first opened
+
         for widget in self.scroll_repos.winfo_children():
             widget.destroy()
             
-        repos = self.repo_manager.get_repos()
+        query = self.entry_repo_search.get().strip()
+        if query:
+            repos = self.search("repos", query)
+            if repos is None:
+                ctk.CTkLabel(self.scroll_repos, text="Building the search index...", text_color="gray").pack(pady=20)
+                return
+        else:
+            # Directory trees first, then individual repositories
+            repos = self.repo_manager.get_directory_bindings() + self.repo_manager.get_repos()
         if not repos:
-            ctk.CTkLabel(self.scroll_repos, text="No repositories managed yet.", text_color="gray").pack(pady=20)
+            text = "No repositories match the search." if query else "No repositories managed yet."
+            ctk.CTkLabel(self.scroll_repos, text=text, text_color="gray").pack(pady=20)
             return
+        if len(repos) > self.REPO_LIST_LIMIT:
+            ctk.CTkLabel(self.scroll_repos, text=f"Showing {self.REPO_LIST_LIMIT} of {len(repos)}; search to find the others.",
+                         text_color="gray").pack(pady=(5, 0))
+            repos = repos[:self.REPO_LIST_LIMIT]
 
         for repo in repos:
             # Find account name
@@ -238,28 +836,22 @@ class App(ctk.CTk):
             acc = self.account_manager.get_account_by_id(repo['account_id'])
             if acc:
                 acc_name = acc['alias']
+            is_tree = repo.get('binding') == BINDING_DIRECTORY
                 
             card = ctk.CTkFrame(self.scroll_repos)
             card.pack(fill="x", pady=5, padx=5)
             
-            ctk.CTkLabel(card, text=repo['alias'], font=ctk.CTkFont(weight="bold")).pack(side="left", padx=10)
+            title = f"{repo['alias']} (tree)" if is_tree else repo['alias']
+            ctk.CTkLabel(card, text=title, font=ctk.CTkFont(weight="bold")).pack(side="left", padx=10)
             ctk.CTkLabel(card, text=repo['path'], text_color="gray").pack(side="left", padx=10)
             
             ctk.CTkButton(card, text="Delete", width=60, fg_color="#FF5555", hover_color="#CC0000", 
-                          command=lambda p=repo['path']: self.delete_repo(p)).pack(side="right", padx=10, pady=5)
+                          command=lambda r=repo: self.delete_repo(r)).pack(side="right", padx=10, pady=5)
             
             ctk.CTkLabel(card, text=f"Bound to: {acc_name}", text_color="#3B8ED0").pack(side="right", padx=10)
 
-    def add_repository(self):
-        path = filedialog.askdirectory(title="Select Repository Folder")
-        if not path:
-            return
-            
-        if not os.path.exists(os.path.join(path, ".git")):
-             messagebox.showerror("Invalid Repo", "The selected folder is not a git repository (missing .git).")
-             return
-
-        # Ask user which account to bind
+    def ask_account(self, title, prompt, on_select):
+        """Shows a small dialog to pick an account. on_select(account, dialog) runs on confirm."""
         accounts = self.account_manager.get_accounts()
         if not accounts:
              messagebox.showinfo("No Accounts", "Please add GitHub accounts first.")
@@ -269,43 +861,167 @@ class App(ctk.CTk):
         
         # Simple Dialog to pick account
         dialog = ctk.CTkToplevel(self)
-        dialog.title("Bind Repository")
+        dialog.title(title)
         dialog.geometry("400x200")
         dialog.attributes("-topmost", True)
         
-        ctk.CTkLabel(dialog, text="Select Account for this Repo:", font=ctk.CTkFont(weight="bold")).pack(pady=10)
+        ctk.CTkLabel(dialog, text=prompt, font=ctk.CTkFont(weight="bold")).pack(pady=10)
         
         combo = ctk.CTkComboBox(dialog, values=aliases)
         combo.pack(pady=10)
         
         def confirm():
             selection = combo.get()
-            if not selection: return
-            
+            if selection not in aliases: return
             # Match back to account
-            idx = aliases.index(selection)
-            acc = accounts[idx]
+            on_select(accounts[aliases.index(selection)], dialog)
+            
+        ctk.CTkButton(dialog, text="Bind Account", command=confirm).pack(pady=20)
+
+    def add_repository(self):
+        path = filedialog.askdirectory(title="Select Repository Folder")
+        if not path:
+            return
             
+        if not os.path.exists(os.path.join(path, ".git")):
+             messagebox.showerror("Invalid Repo", "The selected folder is not a git repository (missing .git).")
+             return
+
+        def confirm(acc, dialog):
             folder_name = os.path.basename(path)
+            conflict = self.repo_manager.binding_conflict(path)
+            if conflict:
+                messagebox.showerror("Already Bound", conflict)
+                return
+            
+            def done(result):
+                success, msg = result
+                if not success:
+                     messagebox.showerror("Git Error", msg)
+                     return
+                     
+                # 2. Save to DB
+                self.repo_manager.add_repo(path, folder_name, acc['id'])
+                self.refresh_repo_list()
+                messagebox.showinfo("Success", f"Repository '{folder_name}' is now bound to {acc['alias']}!")
+                if dialog.winfo_exists():
+                    dialog.destroy()
             
             # 1. Update Git Local Config
-            success, msg = self.git_switcher.set_local_git_user(path, acc['username'], acc['email'], acc['ssh_key_path'])
-            if not success:
-                 messagebox.showerror("Git Error", msg)
-                 return
-                 
-            # 2. Save to DB
-            self.repo_manager.add_repo(path, folder_name, acc['id'])
-            self.refresh_repo_list()
-            messagebox.showinfo("Success", f"Repository '{folder_name}' is now bound to {acc['alias']}!")
-            dialog.destroy()
+            self.scheduler.submit(self.git_switcher.set_local_git_user, path, acc['username'], acc['email'],
+                                  acc['ssh_key_path'], on_done=done)
             
-        ctk.CTkButton(dialog, text="Bind Account", command=confirm).pack(pady=20)
+        # Show who owns the folder today (own binding or an enclosing directory tree)
+        prompt = "Select Account for this Repo:"
+        owner = self.repo_manager.resolve(path)
+        if owner:
+            acc = self.account_manager.get_account_by_id(owner['account_id'])
+            prompt = f"Currently bound to {acc['alias'] if acc else 'Unknown'} via {owner['alias']}.\n{prompt}"
+        
+        # Ask user which account to bind
+        self.ask_account("Bind Repository", prompt, confirm)
+
+    def bind_directory_tree(self):
+        """Binds every repository (present and future) under a folder via includeIf."""
+        path = filedialog.askdirectory(title="Select Folder (e.g. ~/work)")
+        if not path:
+            return
+
+        def confirm(acc, dialog):
+            folder_name = os.path.basename(os.path.normpath(path))
+            include_path = os.path.join(self.git_includes_dir, f"{acc['id']}.gitconfig")
+            conflict = self.repo_manager.binding_conflict(path, BINDING_DIRECTORY)
+            if conflict:
+                messagebox.showerror("Already Bound", conflict)
+                return
+            
+            def done(result):
+                success, msg = result
+                if not success:
+                     messagebox.showerror("Git Error", msg)
+                     return
+                
+                # 2. Save to DB
+                self.repo_manager.add_directory_binding(path, folder_name, acc['id'], include_path)
+                self.refresh_repo_list()
+                messagebox.showinfo("Success", f"All repositories under '{path}' now use {acc['alias']}.\n\n"
+                                               "Repositories with their own local user config keep it.")
+                if dialog.winfo_exists():
+                    dialog.destroy()
+            
+            # 1. One global includeIf entry + the account's include file
+            self.scheduler.submit(self.git_switcher.bind_directory, path, include_path, acc['username'], acc['email'],
+                                  acc['ssh_key_path'], acc.get('gpg_key_id'), on_done=done)
+
+        self.ask_account("Bind Directory Tree", "Select Account for this Folder:", confirm)
+
+    def scan_repositories(self):
+        """Finds every checkout under a folder and binds them all to one account."""
+        root = filedialog.askdirectory(title="Select Folder to Scan for Repositories")
+        if not root:
+            return
+        if not self.account_manager.get_accounts():
+             messagebox.showinfo("No Accounts", "Please add GitHub accounts first.")
+             return
+        BulkBindDialog(self, root)
+
+    def toggle_watch_mode(self):
+        """Starts/stops re-enforcing bindings when their config files change."""
+        enabled = bool(self.switch_watch.get())
+        self.settings.set("watch_mode", enabled)
+        # Starting reads every bound config and stopping joins the watcher: both off the Tk thread
+        self.scheduler.submit(self.apply_watch_mode, name="watch.start" if enabled else "watch.stop")
+
+    def apply_watch_mode(self):
+        """Brings the enforcer in line with the latest setting (quick toggles collapse to the last one)."""
+        with self._watch_lock:
+            enabled = self.settings.get("watch_mode", False)
+            if enabled and not self.binding_enforcer.running:
+                self.binding_enforcer.start()
+            elif not enabled and self.binding_enforcer.running:
+                self.binding_enforcer.stop()
+
+    def toggle_identity_daemon(self):
+        """Starts/stops answering identity lookups on the local socket."""
+        enabled = bool(self.switch_daemon.get())
+        if enabled:
+            try:
+                self.identity_daemon.start()
+            except OSError as e:
+                self.switch_daemon.deselect()
+                messagebox.showerror("Identity Daemon", str(e))
+                return
+        else:
+            self.identity_daemon.stop()
+        self.settings.set("identity_daemon", enabled)
 
-    def delete_repo(self, path):
-        if messagebox.askyesno("Confirm", "Stop managing this repository? (Git config will remain as is)"):
-            self.repo_manager.remove_repo(path)
-            self.refresh_repo_list()
+    def audit_repositories(self):
+        """Checks every bound repository for identity drift."""
+        if not self.repo_manager.get_repos():
+            messagebox.showinfo("Audit", "No repositories managed yet.")
+            return
+        AuditDialog(self)
+
+    def delete_repo(self, repo):
+        if repo.get('binding') == BINDING_DIRECTORY:
+            if not messagebox.askyesno("Confirm", "Remove this directory binding? (The includeIf entry is removed from your global git config)"):
+                return
+            def done(result):
+                success, msg = result
+                if not success:
+                    # Keep the record: the includeIf still applies the account to the tree
+                    messagebox.showerror("Error", msg)
+                    return
+                self.repo_manager.remove_repo(repo['path'])
+                self.refresh_repo_list()
+            
+            self.scheduler.submit(self.git_switcher.unbind_directory, repo['path'], on_done=done,
+                                  on_error=lambda e: done((False, f"Failed to remove includeIf: {e}")))
+            return
+        elif not messagebox.askyesno("Confirm", "Stop managing this repository? (Git config will remain as is)"):
+            return
+        self.repo_manager.remove_repo(repo['path'])
+        self.refresh_repo_list()
 
 
     def create_detail_row(self, parent, label_text, row):
@@ -314,24 +1030,27 @@ class App(ctk.CTk):
         lbl.grid(row=row, column=1, sticky="w", padx=20, pady=5)
         return lbl
 
+    @timed("ui.refresh_accounts")
     def refresh_account_list(self):
+        self.update_tray_menu()
+        if not self.ui_built:
+            return  # tray mode; restore_ui() lists the accounts again
         # Clear scrollable frame
         for widget in self.scroll_accounts.winfo_children():
             widget.destroy()
             
-        self.accounts_cache = self.account_manager.get_accounts()
+        query = self.entry_account_search.get().strip()
+        self.accounts_cache = self.search("accounts", query) if query else self.account_manager.get_accounts()
         self.account_buttons = []
+        if self.accounts_cache is None:
+            self.accounts_cache = []
+            ctk.CTkLabel(self.scroll_accounts, text="Building the search index...", text_color="gray").pack(pady=10)
+        elif query and not self.accounts_cache:
+            ctk.CTkLabel(self.scroll_accounts, text="No matching accounts.", text_color="gray").pack(pady=10)
         
         for idx, acc in enumerate(self.accounts_cache):
-            # Load if exists immediately
-            avatar_img = self.avatar_manager.load_avatar_image(acc['username'])
-            
-            # If not exists, trigger fetch in background (silent, no callback spam)
-            if not avatar_img:
-                 self.avatar_manager.fetch_avatar(acc['username'], self.on_single_avatar_downloaded)
-
+            # Avatars are decoded in the background and attached when ready
             btn = ctk.CTkButton(self.scroll_accounts, text=f"  {acc['alias']}", 
-                                image=avatar_img,
                                 compound="left",
                                 anchor="w",
                                 height=50,
@@ -340,7 +1059,29 @@ class App(ctk.CTk):
             btn.pack(pady=5, fill="x")
             self.account_buttons.append(btn)
         
-        self.update_status_bar()
+        self.load_account_avatars()
+        # Accounts may have changed which one matches the global identity
+        self.refresh_identity()
+
+    def load_account_avatars(self):
+        """Decodes sidebar avatars on a worker thread, then attaches them on the Tk thread."""
+        buttons = list(zip(self.account_buttons, [acc['username'] for acc in self.accounts_cache]))
+        
+        def _load():
+            return [username for _, username in buttons if self.avatar_manager.load_avatar_pil(username) is None]
+        
+        def _attach(missing):
+            if not self.ui_built:
+                return
+            for btn, username in buttons:
+                image = self.avatar_manager.load_avatar_image(username)
+                if image and btn.winfo_exists():
+                    btn.configure(image=image)
+            # If not exists, trigger fetch in background (silent, no callback spam)
+            for username in missing:
+                self.avatar_manager.fetch_avatar(username, self.on_single_avatar_downloaded)
+        
+        self.scheduler.submit(_load, on_done=_attach)
 
     def on_single_avatar_downloaded(self, username, path):
         # Determine if we need to refresh.
@@ -349,25 +1090,64 @@ class App(ctk.CTk):
         if not hasattr(self, '_refresh_pending') or not self._refresh_pending:
             self._refresh_pending = True
             self.after(1000, self.perform_delayed_refresh)
+        self.refresh_identity()
 
     def perform_delayed_refresh(self):
         self._refresh_pending = False
         self.refresh_account_list() 
 
+    # How often ~/.gitconfig is checked for outside changes (one stat per file, off the Tk thread)
+    STATUS_POLL_MS = 2000
+
+    def poll_identity(self):
+        self.refresh_identity()
+        self.after(self.STATUS_POLL_MS, self.poll_identity)
+
+    def refresh_identity(self, force=False):
+        """
+        Revalidates the cached global identity on a worker thread (git config
+        and ~/.ssh/config are only re-read when their mtime changed, or
+        after an activation with force=True). The status bar is redrawn only
+        when the result differs. Safe to call from any thread.
+        """
+        if force:
+            self.identity_cache.invalidate()
+
+        def _check():
+            identity = self.identity_cache.global_identity()
+            if identity.get("account_id") != self._active_account_id:
+                self._active_account_id = identity.get("account_id")
+                self.update_tray_menu()
+            username = identity.get("username")
+            has_avatar = bool(username) and self.avatar_manager.load_avatar_pil(username, size=(60, 60)) is not None
+            return (identity["name"], identity["email"], username, has_avatar)
+
+        def _apply(key):
+            _, _, username, has_avatar = key
+            if username and not has_avatar and username not in self._status_avatar_requested:
+                self._status_avatar_requested.add(username)
+                self.avatar_manager.fetch_avatar(username, lambda *_: self.refresh_identity())
+            if key != self._status_key:
+                self.apply_identity(key)
+
+        self.scheduler.submit(_check, on_done=_apply)
+
+    def apply_identity(self, key):
+        """Adopts a new status bar model (Tk thread); builds its avatar once."""
+        self._status_key = key
+        if not self.ui_built:
+            return  # tray mode; restore_ui() draws it
+        _, _, username, has_avatar = key
+        self._status_image = self.avatar_manager.load_avatar_image(username, size=(60, 60)) if has_avatar else None
+        self.update_status_bar()
+
     def update_status_bar(self):
-        name, email = self.git_switcher.get_current_global_user()
+        """Draws the cached model; never touches the filesystem or spawns processes."""
+        if self._status_key is None:
+            return  # first check still running; the label shows "Loading..."
+        name, email, _, _ = self._status_key
         if name and email:
-            # Try to match name/email to an account to get username for avatar
-            # This is a bit loose because git config doesn't store 'username', only name.
-            # But we can try to find email in our DB
-            found_img = None
-            for acc in self.accounts_cache:
-                if acc['email'] == email:
-                    self.avatar_manager.fetch_avatar(acc['username'], None)
-                    found_img = self.avatar_manager.load_avatar_image(acc['username'], size=(60,60))
-                    break
-            
-            self.lbl_current_user.configure(text=f"  {name}\n  <{email}>", image=found_img, compound="left", text_color="#3B8ED0")
+            self.lbl_current_user.configure(text=f"  {name}\n  <{email}>", image=self._status_image, compound="left", text_color="#3B8ED0")
         else:
             self.lbl_current_user.configure(text="Not configured", image=None, text_color="gray")
 
@@ -415,6 +1195,32 @@ class App(ctk.CTk):
             self.current_dialog.focus()
             self.current_dialog.lift()
 
+    def propagate_account_edit(self, before, account):
+        """Re-applies an edited account to every repository and directory tree bound to it."""
+        identity_keys = ('username', 'email', 'ssh_key_path', 'gpg_key_id')
+        if all(before.get(k) == account.get(k) for k in identity_keys):
+            return
+        
+        bindings = [b for b in self.repo_manager.get_all_bindings() if b['account_id'] == account['id']]
+        repo_paths = [b['path'] for b in bindings if b.get('binding') != BINDING_DIRECTORY]
+        include_paths = [b['include_path'] for b in bindings if b.get('binding') == BINDING_DIRECTORY and b.get('include_path')]
+        if not repo_paths and not include_paths:
+            return
+        
+        def work(progress):
+            return self.git_switcher.propagate_identity(account, repo_paths, include_paths, progress_callback=progress)
+        
+        def done(results):
+            failed = [(path, msg) for path, ok, msg in results if not ok]
+            logging.info(f"Propagated edit of {account['alias']} to {len(results) - len(failed)} bindings, {len(failed)} failed")
+            if failed:
+                details = "\n".join(f"{p}: {m}" for p, m in failed[:10])
+                messagebox.showwarning("Update Bound Repositories",
+                                       f"{len(results) - len(failed)} updated, {len(failed)} failed:\n{details}")
+        
+        ProgressDialog(self, "Updating Bound Repositories",
+                       f"Applying changes to {len(repo_paths)} repositories bound to {account['alias']}...", work, done)
+
     def delete_account(self):
         if not hasattr(self, 'selected_account'):
             return
@@ -429,15 +1235,23 @@ class App(ctk.CTk):
             self.btn_delete.configure(state="disabled")
 
     def import_current_account(self):
-        name, email = self.git_switcher.get_current_global_user()
+        def _probe():
+            name, email = self.git_switcher.get_current_global_user()
+            ssh_key = self.git_switcher.get_current_ssh_identity()
+            using_https = not ssh_key and self.git_switcher.check_if_using_https()
+            return name, email, ssh_key, using_https
+        
+        self.scheduler.submit(_probe, on_done=self._import_current_account)
+
+    def _import_current_account(self, probe):
+        name, email, ssh_key, using_https = probe
         if not name or not email:
             messagebox.showerror("Error", "No global git user configured found.")
             return
             
-        ssh_key = self.git_switcher.get_current_ssh_identity()
         if not ssh_key:
             # Check if likely using HTTPS
-            if self.git_switcher.check_if_using_https():
+            if using_https:
                 msg = (
                     "Akun saat ini terdeteksi menggunakan HTTPS/Token.\n\n"
                     "Aplikasi ini menggunakan SSH Key untuk fitur One-Click Switch.\n"
@@ -488,14 +1302,19 @@ class App(ctk.CTk):
 
     def test_connection(self):
         self.btn_verify.configure(text="Testing...", state="disabled")
-        self.update()
-        result = self.git_switcher.test_ssh_connection()
-        self.btn_verify.configure(text="Test Connection", state="normal")
         
-        if "successfully authenticated" in result:
-             messagebox.showinfo("Connection Success", f"GitHub Response:\n\n{result}")
-        else:
-             messagebox.showwarning("Connection Issue", f"GitHub Response:\n\n{result}")
+        def done(result):
+            self.btn_verify.configure(text="Test Connection", state="normal")
+            if "successfully authenticated" in result:
+                 messagebox.showinfo("Connection Success", f"GitHub Response:\n\n{result}")
+            else:
+                 messagebox.showwarning("Connection Issue", f"GitHub Response:\n\n{result}")
+        
+        def failed(error):
+            self.btn_verify.configure(text="Test Connection", state="normal")
+            messagebox.showwarning("Connection Issue", str(error))
+        
+        self.scheduler.submit(self.git_switcher.test_ssh_connection, on_done=done, on_error=failed)
 
     def activate_selected_account(self):
         if not hasattr(self, 'selected_account'):
@@ -503,13 +1322,19 @@ class App(ctk.CTk):
             
         acc = self.selected_account
         gpg_id = acc.get('gpg_key_id', None)
-        success, msg = self.git_switcher.activate_account(acc['alias'], acc['email'], acc['ssh_key_path'], gpg_id)
+        self.btn_activate.configure(state="disabled")
         
-        if success:
-            messagebox.showinfo("Success", f"Active identity switched to:\n{acc['alias']}\n{acc['email']}")
-            self.update_status_bar()
-        else:
-            messagebox.showerror("Error", msg)
+        def done(result):
+            success, msg = result
+            self.btn_activate.configure(state="normal")
+            if success:
+                self.refresh_identity(force=True)
+                messagebox.showinfo("Success", f"Active identity switched to:\n{acc['alias']}\n{acc['email']}")
+            else:
+                messagebox.showerror("Error", msg)
+        
+        self.scheduler.submit(self.git_switcher.activate_account, acc['alias'], acc['email'], acc['ssh_key_path'], gpg_id,
+                              on_done=done, on_error=lambda e: done((False, str(e))))
 
 class AddAccountDialog(ctk.CTkToplevel):
     def __init__(self, parent, account_to_edit=None):
@@ -569,6 +1394,14 @@ class AddAccountDialog(ctk.CTkToplevel):
         
         self.ent_gpg = ctk.CTkEntry(gpg_frm, placeholder_text="e.g. 3AA5C34371567BD2")
         self.ent_gpg.pack(side="left", fill="x", expand=True)
+        
+        # Key algorithm for "Generate" (label -> GPG_ALGORITHMS key)
+        from gpg_manager import GPG_ALGORITHMS, DEFAULT_GPG_ALGORITHM
+        self.default_gpg_algorithm = DEFAULT_GPG_ALGORITHM
+        self.gpg_algo_labels = {spec["label"]: algo for algo, spec in GPG_ALGORITHMS.items()}
+        self.opt_gpg_algo = ctk.CTkOptionMenu(gpg_frm, values=list(self.gpg_algo_labels), width=150)
+        self.opt_gpg_algo.set(GPG_ALGORITHMS[DEFAULT_GPG_ALGORITHM]["label"])
+        self.opt_gpg_algo.pack(side="left", padx=(5,0))
         ctk.CTkButton(gpg_frm, text="Generate", width=80, fg_color="#E0AA00", hover_color="#C09000", text_color="black", command=self.generate_gpg).pack(side="left", padx=(5,0))
         
         # Generator Button
@@ -590,17 +1423,24 @@ class AddAccountDialog(ctk.CTkToplevel):
         filename = f"id_ed25519_{safe_alias}"
         
         if messagebox.askyesno("Generate Key", f"Generate new SSH key '{filename}' for {email}?\n\nLocation: {self.parent.local_keys_dir}"):
-            success, msg, pub_key = self.parent.git_switcher.generate_ssh_key(email, filename, output_dir=self.parent.local_keys_dir)
-            if success:
-                # Show Public Key and instructions
-                self.show_pubkey_dialog(pub_key)
-                
-                # Auto fill path
-                full_path = os.path.join(self.parent.local_keys_dir, filename)
-                self.ent_key.delete(0, tk.END)
-                self.ent_key.insert(0, full_path)
-            else:
-                messagebox.showerror("Generation Failed", msg)
+            self.parent.scheduler.submit(self.parent.git_switcher.generate_ssh_key, email, filename,
+                                         self.parent.local_keys_dir,
+                                         on_done=lambda result: self.on_ssh_key_generated(filename, result))
+
+    def on_ssh_key_generated(self, filename, result):
+        success, msg, pub_key = result
+        if not self.winfo_exists():
+            return
+        if success:
+            # Show Public Key and instructions
+            self.show_pubkey_dialog(pub_key)
+            
+            # Auto fill path
+            full_path = os.path.join(self.parent.local_keys_dir, filename)
+            self.ent_key.delete(0, tk.END)
+            self.ent_key.insert(0, full_path)
+        else:
+            messagebox.showerror("Generation Failed", msg)
 
     def generate_gpg(self):
         # Validation
@@ -625,22 +1465,32 @@ class AddAccountDialog(ctk.CTkToplevel):
              messagebox.showerror("Mismatch", "Passphrases do not match.")
              return
 
-        self.attributes("-topmost", False) # Release focus during heavy process
-        self.parent.update_idletasks()
+        algorithm = self.gpg_algo_labels.get(self.opt_gpg_algo.get(), self.default_gpg_algorithm)
+        self.attributes("-topmost", False) # Release focus while the progress dialog is up
         
-        # Show loading (simple blocking for now, ideally threaded)
-        # threading this is better but sticking to simple for stability as per user pref
-        messagebox.showinfo("Generating", "Generating GPG Key... This may take a minute.\nClick OK to start.")
+        # Generation runs on the task scheduler; progress and the result come back on the Tk thread
+        from gpg_manager import GPGKeyGeneration
+        job = GPGKeyGeneration()
+        dialog = GPGProgressDialog(self, job, self.on_gpg_generated)
         
-        success, msg, key_id, pub_key = self.parent.gpg_manager.generate_gpg_key(name, email, passphrase)
+        def _generate(task):
+            return self.parent.gpg_manager.generate_gpg_key(name, email, passphrase, algorithm,
+                                                            progress_callback=task.progress, job=job)
         
+        dialog.task = self.parent.scheduler.submit_job(_generate, on_progress=dialog.on_progress,
+                                                       on_done=dialog.finish, name="gpg-keygen")
+
+    def on_gpg_generated(self, result):
+        success, msg, key_id, pub_key = result
+        if not self.winfo_exists():
+            return
         self.attributes("-topmost", True)
         
         if success:
              self.ent_gpg.delete(0, tk.END)
              self.ent_gpg.insert(0, key_id)
              self.show_pubkey_dialog(pub_key, key_type="GPG")
-        else:
+        elif msg:
              messagebox.showerror("GPG Error", msg)
 
     def show_pubkey_dialog(self, pub_key, key_type="SSH"):
@@ -696,7 +1546,10 @@ class AddAccountDialog(ctk.CTkToplevel):
              return
              
         if self.account_to_edit:
-            self.parent.account_manager.update_account(self.account_to_edit['id'], alias, username, email, key_path, gpg_key)
+            before = dict(self.account_to_edit)
+            updated = self.parent.account_manager.update_account(self.account_to_edit['id'], alias, username, email, key_path, gpg_key)
+            if updated:
+                self.parent.propagate_account_edit(before, updated)
         else:
             self.parent.account_manager.add_account(alias, username, email, key_path, gpg_key)
             
@@ -710,17 +1563,328 @@ class AddAccountDialog(ctk.CTkToplevel):
         logging.error(f"Uncaught Exception:\n{error_msg}")
         messagebox.showerror("Application Error", f"An unexpected error occurred:\n\n{val}\n\nSee logs for details.")
 
+class BulkBindDialog(ctk.CTkToplevel):
+    """Discovers repositories under a folder in the background and binds them in parallel."""
+
+    def __init__(self, parent, root):
+        super().__init__(parent)
+        self.parent = parent
+        self.root_dir = root
+        self.found = []
+        self.task = None
+        
+        self.title("Bind Repositories")
+        self.geometry("560x460")
+        self.attributes("-topmost", True)
+        self.protocol("WM_DELETE_WINDOW", self.cancel)
+        
+        self.lbl_status = ctk.CTkLabel(self, text=f"Scanning {root}...", wraplength=520)
+        self.lbl_status.pack(pady=(20, 10), padx=20)
+        
+        self.progress = ctk.CTkProgressBar(self, mode="indeterminate", width=500)
+        self.progress.pack(pady=5)
+        self.progress.start()
+        
+        self.txt_found = ctk.CTkTextbox(self, height=200, width=520)
+        self.txt_found.pack(padx=20, pady=10)
+        
+        action_frame = ctk.CTkFrame(self, fg_color="transparent")
+        action_frame.pack(pady=10)
+        
+        self.accounts = self.parent.account_manager.get_accounts()
+        self.aliases = [f"{a['alias']} ({a['username']})" for a in self.accounts]
+        self.combo = ctk.CTkComboBox(action_frame, values=self.aliases, width=220)
+        self.combo.pack(side="left", padx=10)
+        self.btn_bind = ctk.CTkButton(action_frame, text="Bind All", state="disabled", command=self.bind_all)
+        self.btn_bind.pack(side="left", padx=10)
+        
+        self.task = self.parent.scheduler.submit_job(
+            self._discover, on_progress=self.on_discovery_progress, on_done=self.on_discovered, name="discover")
+
+    def _discover(self, task):
+        return self.parent.repo_discovery.discover(
+            self.root_dir, progress_callback=task.progress, should_stop=task.should_stop)
+
+    def on_discovery_progress(self, visited, found):
+        if self.winfo_exists():
+            self.lbl_status.configure(text=f"Scanning... {visited} folders, {found} repositories found")
+
+    def on_discovered(self, found):
+        if not self.winfo_exists():
+            return
+        self.found = found
+        self.progress.stop()
+        self.progress.configure(mode="determinate")
+        self.progress.set(0)
+        self.lbl_status.configure(text=f"Found {len(self.found)} repositories under {self.root_dir}")
+        lines = [f"[{r['kind']}] {r['path']}" for r in self.found]
+        self.txt_found.insert("0.0", "\n".join(lines) if lines else "No repositories found.")
+        self.txt_found.configure(state="disabled")
+        if self.found:
+            self.btn_bind.configure(state="normal")
+
+    def bind_all(self):
+        selection = self.combo.get()
+        if selection not in self.aliases:
+            return
+        acc = self.accounts[self.aliases.index(selection)]
+        self.btn_bind.configure(state="disabled")
+        
+        def _progress(done, total):
+            if self.winfo_exists():
+                self.progress.set(done / total if total else 1)
+                self.lbl_status.configure(text=f"Binding {done}/{total} repositories to {acc['alias']}...")
+        
+        # Folders already bound as a directory tree keep that binding
+        conflicts = []
+        for r in self.found:
+            conflict = self.parent.repo_manager.binding_conflict(r["path"])
+            if conflict:
+                conflicts.append((r["path"], False, conflict))
+        skipped = {path for path, _, _ in conflicts}
+        
+        def _bind(task):
+            paths = [r["path"] for r in self.found if r["path"] not in skipped]
+            return conflicts + self.parent.git_switcher.bind_repositories(
+                paths, acc['username'], acc['email'], acc['ssh_key_path'], progress_callback=task.progress)
+        
+        _progress(0, len(self.found))
+        self.task = self.parent.scheduler.submit_job(
+            _bind, on_progress=_progress, on_done=lambda results: self.on_bound(acc, results), name="bulk-bind")
+
+    def on_bound(self, acc, results):
+        bound = [(path, os.path.basename(path), acc['id']) for path, ok, _ in results if ok]
+        failed = [(path, msg) for path, ok, msg in results if not ok]
+        self.parent.repo_manager.add_repos(bound)
+        self.parent.refresh_repo_list()
+        
+        logging.info(f"Bulk bind to {acc['alias']}: {len(bound)} bound, {len(failed)} failed")
+        summary = f"{len(bound)} repositories bound to {acc['alias']}."
+        if failed:
+            details = "\n".join(f"{p}: {m}" for p, m in failed[:10])
+            summary += f"\n\n{len(failed)} failed:\n{details}"
+        if self.winfo_exists():
+            self.destroy()
+        messagebox.showinfo("Bulk Binding", summary)
+
+    def cancel(self):
+        # Binding already under way is allowed to finish so the store matches git config
+        if self.task is not None and self.task.name == "discover":
+            self.task.cancel()
+        self.destroy()
+
+class AuditDialog(ctk.CTkToplevel):
+    """Runs the identity audit in the background and offers one-click repair."""
+
+    def __init__(self, parent, force=False):
+        super().__init__(parent)
+        self.parent = parent
+        self.results = []
+        self.repair_results = None
+        
+        self.title("Identity Audit")
+        self.geometry("700x480")
+        self.attributes("-topmost", True)
+        
+        self.lbl_status = ctk.CTkLabel(self, text="Auditing repositories...", wraplength=660)
+        self.lbl_status.pack(pady=(20, 10), padx=20)
+        
+        self.progress = ctk.CTkProgressBar(self, width=660)
+        self.progress.pack(pady=5)
+        self.progress.set(0)
+        
+        self.scroll = ctk.CTkScrollableFrame(self)
+        self.scroll.pack(fill="both", expand=True, padx=20, pady=10)
+        
+        btn_frame = ctk.CTkFrame(self, fg_color="transparent")
+        btn_frame.pack(pady=(0, 15))
+        self.btn_repair = ctk.CTkButton(btn_frame, text="Repair All", state="disabled", command=self.repair_all)
+        self.btn_repair.pack(side="left", padx=10)
+        self.btn_full = ctk.CTkButton(btn_frame, text="Full Re-Audit", state="disabled", fg_color="gray", command=lambda: self.run_audit(force=True))
+        self.btn_full.pack(side="left", padx=10)
+        
+        self.run_audit(force)
+
+    def on_progress(self, done, total):
+        if self.winfo_exists():
+            self.progress.set(done / total if total else 0)
+
+    def run_audit(self, force=False):
+        self.btn_repair.configure(state="disabled")
+        self.btn_full.configure(state="disabled")
+        
+        def _audit(task):
+            return self.parent.identity_auditor.audit(force=force, progress_callback=task.progress)
+        
+        self.parent.scheduler.submit_job(_audit, on_progress=self.on_progress, on_done=self.on_audited, name="audit")
+
+    def on_audited(self, results):
+        self.results = results
+        if not self.winfo_exists():
+            return
+        self.progress.set(1)
+        self.show_results()
+
+    def show_results(self):
+        for widget in self.scroll.winfo_children():
+            widget.destroy()
+        
+        problems = [r for r in self.results if r['status'] not in (AUDIT_OK, AUDIT_UNCHANGED)]
+        skipped = sum(1 for r in self.results if r['status'] == AUDIT_UNCHANGED)
+        drifted = sum(1 for r in problems if r['status'] == AUDIT_DRIFT)
+        self.lbl_status.configure(text=f"{len(self.results)} repositories audited: {len(problems)} need attention "
+                                       f"({drifted} drifted), {skipped} unchanged since the last clean audit.")
+        
+        if not problems:
+            ctk.CTkLabel(self.scroll, text="All bound repositories match their accounts.", text_color="gray").pack(pady=20)
+        for result in problems:
+            card = ctk.CTkFrame(self.scroll)
+            card.pack(fill="x", pady=4, padx=4)
+            
+            ctk.CTkLabel(card, text=f"[{result['status'].upper()}] {result['alias']}", font=ctk.CTkFont(weight="bold")).pack(anchor="w", padx=10, pady=(5, 0))
+            details = [result['path']]
+            for key, diff in result['drift'].items():
+                details.append(f"{key}: {diff['actual'] or '(unset)'}  ->  {diff['expected']}")
+            if result['message'] and not result['drift']:
+                details.append(result['message'])
+            ctk.CTkLabel(card, text="\n".join(details), text_color="gray", justify="left", anchor="w").pack(anchor="w", padx=10, pady=(0, 5))
+            
+            if result['status'] == AUDIT_DRIFT:
+                ctk.CTkButton(card, text="Repair", width=70, command=lambda r=result: self.repair([r])).pack(anchor="e", padx=10, pady=(0, 5))
+        
+        self.btn_repair.configure(state="normal" if drifted else "disabled")
+        self.btn_full.configure(state="normal")
+
+    def repair_all(self):
+        self.repair(self.results)
+
+    def repair(self, results):
+        self.btn_repair.configure(state="disabled")
+        self.lbl_status.configure(text="Repairing...")
+        paths = {r['path'] for r in results if r['status'] == AUDIT_DRIFT}
+        current = list(self.results)
+        
+        def _repair(task):
+            self.repair_results = self.parent.identity_auditor.repair(results, progress_callback=task.progress)
+            # Re-check just the repaired repositories
+            repaired = [r for r in self.parent.repo_manager.get_repos() if r['path'] in paths]
+            rechecked = {r['path']: r for r in self.parent.identity_auditor.audit(repaired)}
+            return [rechecked.get(r['path'], r) for r in current]
+        
+        self.parent.scheduler.submit_job(_repair, on_progress=self.on_progress, on_done=self.on_audited, name="repair")
+
+class ProgressDialog(ctk.CTkToplevel):
+    """
+    Runs work(progress) on the parent's task scheduler while showing a
+    progress bar. progress(done, total) may be called from the worker;
+    on_done(result) runs on the Tk thread once the work finishes; if it
+    fails, the error is shown instead.
+    """
+
+    def __init__(self, parent, title, text, work, on_done):
+        super().__init__(parent)
+        self.text = text
+        self.on_done = on_done
+        self.heading = title
+        
+        self.title(title)
+        self.geometry("460x140")
+        self.attributes("-topmost", True)
+        
+        self.lbl_status = ctk.CTkLabel(self, text=text, wraplength=420)
+        self.lbl_status.pack(pady=(20, 10), padx=20)
+        
+        self.progress = ctk.CTkProgressBar(self, width=420)
+        self.progress.pack(pady=5)
+        self.progress.set(0)
+        
+        parent.scheduler.submit_job(lambda task: work(task.progress), on_progress=self.on_progress,
+                                    on_done=self.finish, on_error=self.fail, name=title)
+
+    def on_progress(self, done, total):
+        if not self.winfo_exists():
+            return
+        self.progress.set(done / total if total else 0)
+        if total:
+            self.lbl_status.configure(text=f"{self.text}\n{done}/{total}")
+
+    def finish(self, result):
+        if self.winfo_exists():
+            self.destroy()
+        if result is not None:
+            self.on_done(result)
+
+    def fail(self, error):
+        # The scheduler has logged the traceback
+        if self.winfo_exists():
+            self.destroy()
+        messagebox.showerror(self.heading, f"{self.heading} failed: {error}")
+
+class GPGProgressDialog(ctk.CTkToplevel):
+    """Shows progress of a background GPG key generation with a Cancel button."""
+
+    def __init__(self, parent, job, on_done):
+        super().__init__(parent)
+        self.job = job
+        self.on_done = on_done
+        self.task = None
+        
+        self.title("Generating GPG Key")
+        self.geometry("360x160")
+        self.attributes("-topmost", True)
+        self.protocol("WM_DELETE_WINDOW", self.cancel)
+        
+        self.lbl_status = ctk.CTkLabel(self, text=job.progress)
+        self.lbl_status.pack(pady=(20, 10))
+        
+        self.progress = ctk.CTkProgressBar(self, mode="indeterminate", width=300)
+        self.progress.pack(pady=5)
+        self.progress.start()
+        
+        ctk.CTkButton(self, text="Cancel", fg_color="gray", command=self.cancel).pack(pady=15)
+
+    def on_progress(self, message):
+        if self.winfo_exists():
+            self.lbl_status.configure(text=message)
+
+    def finish(self, result):
+        if self.winfo_exists():
+            self.progress.stop()
+            self.destroy()
+        if not self.job.cancelled:
+            self.on_done(result)
+
+    def cancel(self):
+        # Kills gpg; the cancelled task's completion callback is dropped
+        self.job.cancel()
+        if self.task is not None:
+            self.task.cancel()
+        self.progress.stop()
+        self.destroy()
+
 if __name__ == "__main__":
     try:
-        app = App()
+        # --profile [SECONDS] / --profile-ops a,b (or GHM_PROFILE / GHM_PROFILE_OPS)
+        profile_enabled, profile_seconds, profile_ops = profiling_options(sys.argv[1:])
+        profiler = Profiler(LOG_DIR, operations=profile_ops)
+        if profile_enabled:
+            profiler.start()
+        app = App(instance=INSTANCE, profiler=profiler, profile_seconds=profile_seconds)
+        if os.environ.get("GHM_STARTUP_PROBE"):
+            # Used by benchmarks/bench_gui_startup.py
+            app.after(0, lambda: app.after_idle(app.report_first_paint))
+        elif os.environ.get("GHM_TRAY_PROBE"):
+            # Used by benchmarks/bench_tray_memory.py
+            app.after(0, lambda: app.after_idle(app.report_tray_footprint))
         app.mainloop()
     except KeyboardInterrupt:
         # User pressed Ctrl+C - graceful exit
         print("\n✅ Application closed by user (Ctrl+C)")
         logging.info("Application closed via KeyboardInterrupt")
     except Exception as e:
+        logging.exception("Failed to start application")
         # Try to show a message box if tk is initialized, otherwise print
         try:
              messagebox.showerror("Critical Error", f"Failed to start application:\n{str(e)}")
-        except:
+        except Exception:
              print(f"Critical Error: {e}")
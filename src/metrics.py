@@ -0,0 +1,195 @@
+"""
+In-process latency metrics.
+
+Code wraps interesting operations in timing spans:
+
+    with span("activate"):
+        ...
+
+    @timed("config.read")
+    def read_git_config(path): ...
+
+Each operation gets a histogram with its total count, max and the p50/p95
+of its most recent samples. Recording a span costs about a microsecond and
+nothing is written anywhere until snapshot() / to_json() / to_prometheus()
+is asked for (the Diagnostics tab, or an export for fleet tooling).
+
+resident_memory_bytes() reports the process footprint (tray mode logs it
+before and after releasing the UI).
+"""
+import functools
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# Percentiles are computed over this many most recent samples per operation
+SAMPLE_WINDOW = 1024
+PROMETHEUS_METRIC = "ghm_operation_duration_seconds"
+
+
+class Histogram:
+    """Latency distribution of one operation (seconds)."""
+    __slots__ = ("count", "total", "max", "_samples", "_next")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._samples: List[float] = []
+        self._next = 0
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if len(self._samples) < SAMPLE_WINDOW:
+            self._samples.append(seconds)
+        else:
+            self._samples[self._next] = seconds
+            self._next = (self._next + 1) % SAMPLE_WINDOW
+
+    @staticmethod
+    def _percentile(ordered: List[float], fraction: float) -> float:
+        if not ordered:
+            return 0.0
+        # Nearest-rank
+        return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+    def summary(self) -> Dict:
+        ordered = sorted(self._samples)
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "p50": self._percentile(ordered, 0.50),
+            "p95": self._percentile(ordered, 0.95),
+            "max": self.max,
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+        # Optional hook(name) -> context manager wrapped around every span
+        # (the profiler uses it to capture selected operations)
+        self.span_hook: Optional[Callable] = None
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.add(seconds)
+
+    @contextmanager
+    def span(self, name: str):
+        """Times the block (including when it raises) under `name`."""
+        hook = self.span_hook
+        start = time.perf_counter()
+        try:
+            if hook is None:
+                yield
+            else:
+                with hook(name):
+                    yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name: str):
+        """Decorator form of span()."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                hook = self.span_hook
+                start = time.perf_counter()
+                try:
+                    if hook is None:
+                        return fn(*args, **kwargs)
+                    with hook(name):
+                        return fn(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """{operation: {count, sum, p50, p95, max}} with times in seconds, sorted by name."""
+        with self._lock:
+            items = [(name, h.summary()) for name, h in self._histograms.items()]
+        return dict(sorted(items))
+
+    def to_json(self) -> str:
+        import json
+        return json.dumps({"generated_at": time.time(), "unit": "seconds", "operations": self.snapshot()}, indent=2)
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format: one summary, labelled by operation."""
+        lines = [
+            f"# HELP {PROMETHEUS_METRIC} Latency of GitHub Account Manager operations.",
+            f"# TYPE {PROMETHEUS_METRIC} summary",
+        ]
+        snapshot = self.snapshot()
+        for name, stats in snapshot.items():
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'{PROMETHEUS_METRIC}{{operation="{label}",quantile="0.5"}} {stats["p50"]:.6f}')
+            lines.append(f'{PROMETHEUS_METRIC}{{operation="{label}",quantile="0.95"}} {stats["p95"]:.6f}')
+            lines.append(f'{PROMETHEUS_METRIC}_sum{{operation="{label}"}} {stats["sum"]:.6f}')
+            lines.append(f'{PROMETHEUS_METRIC}_count{{operation="{label}"}} {stats["count"]}')
+        lines.append(f"# TYPE {PROMETHEUS_METRIC}_max gauge")
+        for name, stats in snapshot.items():
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'{PROMETHEUS_METRIC}_max{{operation="{label}"}} {stats["max"]:.6f}')
+        return "\n".join(lines) + "\n"
+
+
+def resident_memory_bytes() -> Optional[int]:
+    """Current resident set size of this process, or None where it cannot be read."""
+    try:
+        if sys.platform.startswith("linux"):
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                            ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                            ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+    except (OSError, ValueError, AttributeError):
+        pass
+    return None
+
+
+def release_free_memory():
+    """Hands freed heap pages back to the OS (glibc keeps them otherwise); no-op elsewhere."""
+    if not sys.platform.startswith("linux"):
+        return
+    try:
+        import ctypes
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+# Process-wide registry used by the span()/timed() helpers below
+METRICS = MetricsRegistry()
+span = METRICS.span
+timed = METRICS.timed
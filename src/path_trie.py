@@ -0,0 +1,108 @@
+import os
+from typing import Any, Iterator, List, Optional, Tuple
+
+
+def path_components(path: str) -> List[str]:
+    """
+    Normalizes a path into its components.
+    "~" is expanded, the path made absolute, and case folded on Windows, so
+    "C:\\Work\\Repo\\" and "c:/work/repo" produce the same key.
+    """
+    normalized = os.path.normcase(os.path.abspath(os.path.expanduser(path)))
+    return [part for part in normalized.replace("\\", "/").split("/") if part]
+
+
+class _Node:
+    __slots__ = ("children", "value", "has_value")
+
+    def __init__(self):
+        self.children = {}
+        self.value = None
+        self.has_value = False
+
+
+class PathTrie:
+    """
+    Maps filesystem paths to values, keyed on normalized path components.
+    Every lookup walks at most one node per component, so the cost depends
+    on the depth of the path, not on how many paths are stored.
+    """
+    def __init__(self):
+        self._root = _Node()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _find_node(self, path: str) -> Optional[_Node]:
+        node = self._root
+        for part in path_components(path):
+            node = node.children.get(part)
+            if node is None:
+                return None
+        return node
+
+    def insert(self, path: str, value: Any):
+        node = self._root
+        for part in path_components(path):
+            child = node.children.get(part)
+            if child is None:
+                child = node.children[part] = _Node()
+            node = child
+        if not node.has_value:
+            self._size += 1
+        node.value = value
+        node.has_value = True
+
+    def remove(self, path: str) -> Any:
+        """Removes a path and returns its value (None if it was not present)."""
+        parts = path_components(path)
+        trail = [self._root]
+        for part in parts:
+            child = trail[-1].children.get(part)
+            if child is None:
+                return None
+            trail.append(child)
+        node = trail[-1]
+        if not node.has_value:
+            return None
+        value = node.value
+        node.value = None
+        node.has_value = False
+        self._size -= 1
+        # Prune branches that no longer lead to a value
+        for depth in range(len(parts), 0, -1):
+            current = trail[depth]
+            if current.has_value or current.children:
+                break
+            del trail[depth - 1].children[parts[depth - 1]]
+        return value
+
+    def get(self, path: str) -> Any:
+        """Exact match."""
+        node = self._find_node(path)
+        return node.value if node is not None and node.has_value else None
+
+    def longest_prefix(self, path: str) -> Any:
+        """Value of the deepest stored path that is `path` itself or one of its parents."""
+        node = self._root
+        best = node.value if node.has_value else None
+        for part in path_components(path):
+            node = node.children.get(part)
+            if node is None:
+                break
+            if node.has_value:
+                best = node.value
+        return best
+
+    def iter_under(self, path: str) -> Iterator[Any]:
+        """Directory match: values stored at `path` or anywhere below it."""
+        start = self._find_node(path)
+        if start is None:
+            return
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            if node.has_value:
+                yield node.value
+            stack.extend(node.children.values())
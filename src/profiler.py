@@ -0,0 +1,209 @@
+"""
+Field profiling: cProfile + tracemalloc captures written to logs/.
+
+A capture covers either a window of time or only selected operations
+(the span names used by metrics.py, e.g. "activate" or "subprocess.git"):
+
+  * window:     the Tk thread is profiled from start() to stop(), plus every
+                instrumented operation on worker threads;
+  * operations: only the listed operations are profiled, on any thread.
+
+Either way tracemalloc runs for the whole capture, and stop() writes
+    logs/profile_<stamp>.pstats      (open with `python -m pstats`)
+    logs/profile_<stamp>_memory.txt  (top allocation growth since start)
+    logs/profile_<stamp>.tracemalloc (raw final snapshot)
+
+Enabled with `main.py --profile [SECONDS] [--profile-ops a,b]`, the
+GHM_PROFILE / GHM_PROFILE_OPS environment variables, or at runtime from the
+hidden menu on the sidebar title (right-click) or Ctrl+Shift+P.
+"""
+import cProfile
+import logging
+import os
+import pstats
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from metrics import METRICS
+
+TRACEMALLOC_FRAMES = 10
+MEMORY_DIFF_TOP = 50
+# Finished operation profiles are merged into one Stats this many at a time,
+# so a capture left running all session stays bounded
+CAPTURE_FOLD = 100
+# GHM_PROFILE values that mean "on" rather than a window in seconds
+_SWITCH_VALUES = ("1", "true", "yes", "on")
+
+
+def profiling_options(argv: List[str], environ=os.environ) -> Tuple[bool, Optional[float], List[str]]:
+    """
+    Reads the profiling switch from the command line, falling back to the
+    environment. Returns (enabled, window_seconds or None, operations).
+    `--profile` / GHM_PROFILE=1 profile until stopped; `--profile 0.5` /
+    GHM_PROFILE=0.5 (any positive number of seconds) limits the window.
+    """
+    enabled, seconds, operations = False, None, []
+    value = environ.get("GHM_PROFILE", "").strip()
+    if value and value != "0":
+        enabled = True
+        seconds = None if value.lower() in _SWITCH_VALUES else _seconds(value)
+    if environ.get("GHM_PROFILE_OPS"):
+        enabled = True
+        operations = _operations(environ["GHM_PROFILE_OPS"])
+
+    for i, arg in enumerate(argv):
+        if arg == "--profile" or arg.startswith("--profile="):
+            enabled = True
+            if "=" in arg:
+                seconds = _seconds(arg.split("=", 1)[1])
+            elif i + 1 < len(argv) and _seconds(argv[i + 1]) is not None:
+                seconds = _seconds(argv[i + 1])
+        elif arg == "--profile-ops" and i + 1 < len(argv):
+            enabled = True
+            operations = _operations(argv[i + 1])
+        elif arg.startswith("--profile-ops="):
+            enabled = True
+            operations = _operations(arg.split("=", 1)[1])
+    return enabled, seconds, operations
+
+
+def _seconds(value: str) -> Optional[float]:
+    """A positive number of seconds, or None when `value` is not one."""
+    try:
+        seconds = float(value)
+    except ValueError:
+        return None
+    return seconds if 0 < seconds < float("inf") else None
+
+
+def _operations(value: str) -> List[str]:
+    return [op.strip() for op in value.split(",") if op.strip()]
+
+
+class Profiler:
+    def __init__(self, log_dir: str, operations: Optional[Iterable[str]] = None):
+        self.log_dir = log_dir
+        # Empty: window capture; otherwise only these span names are profiled
+        self.operations = set(operations or ())
+        self._window: Optional[cProfile.Profile] = None
+        self._captured: List[cProfile.Profile] = []
+        self._folded: Optional[pstats.Stats] = None
+        self._started_tracemalloc = False
+        self._baseline = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.running = False
+
+    def start(self):
+        """Starts a capture; in window mode the calling (Tk) thread is profiled."""
+        if self.running:
+            return
+        if not self.operations:
+            window = cProfile.Profile()
+            try:
+                window.enable()
+            except ValueError as e:
+                # Another profiling tool is active (one per interpreter on 3.12+)
+                logging.warning(f"Profiling not started: {e}")
+                return
+            self._window = window
+            self._local.active = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_tracemalloc = True
+        self._baseline = tracemalloc.take_snapshot()
+        self._captured = []
+        self._folded = None
+        self.running = True
+        METRICS.span_hook = self.operation
+        logging.info(f"Profiling started ({', '.join(sorted(self.operations)) or 'window'})")
+
+    def stop(self) -> List[str]:
+        """Ends the capture and writes it to the log directory. Call from the thread that started it."""
+        if not self.running:
+            return []
+        self.running = False
+        METRICS.span_hook = None
+        if self._window is not None:
+            self._window.disable()
+            self._local.active = False
+        snapshot = tracemalloc.take_snapshot()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+        os.makedirs(self.log_dir, exist_ok=True)
+        stem = os.path.join(self.log_dir, f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        written = []
+        with self._lock:
+            profiles = ([self._window] if self._window is not None else []) + self._captured
+            stats = self._folded
+            self._window, self._folded, self._captured = None, None, []
+        if profiles or stats is not None:
+            if stats is None:
+                stats = pstats.Stats(profiles.pop(0))
+            for profile in profiles:
+                stats.add(profile)
+            stats.dump_stats(f"{stem}.pstats")
+            written.append(f"{stem}.pstats")
+
+        written.append(self._write_memory_diff(f"{stem}_memory.txt", snapshot))
+        snapshot.dump(f"{stem}.tracemalloc")
+        written.append(f"{stem}.tracemalloc")
+        logging.info(f"Profiling stopped, wrote {', '.join(written)}")
+        return written
+
+    def _write_memory_diff(self, path: str, snapshot) -> str:
+        # Leave out the profiler's own bookkeeping
+        filters = [tracemalloc.Filter(False, path) for path in (__file__, tracemalloc.__file__, pstats.__file__)]
+        current = snapshot.filter_traces(filters)
+        diff = current.compare_to(self._baseline.filter_traces(filters), "lineno")
+        total = sum(stat.size for stat in current.statistics("filename"))
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"Traced memory at stop: {total / 1024:.1f} KiB\n")
+            f.write(f"Top {MEMORY_DIFF_TOP} allocation sites by growth since the capture started:\n\n")
+            for stat in diff[:MEMORY_DIFF_TOP]:
+                f.write(f"{stat}\n")
+        return path
+
+    @contextmanager
+    def operation(self, name: str):
+        """
+        metrics span hook: profiles one operation on whatever thread runs it.
+        Nested spans and the window thread are already covered and skipped,
+        since a thread can only have one active profiler.
+        """
+        if not self.running or getattr(self._local, "active", False) or \
+                (self.operations and name not in self.operations):
+            yield
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler per interpreter, not per
+            # thread: with a window capture or another span being profiled,
+            # this operation runs unprofiled rather than failing
+            yield
+            return
+        self._local.active = True
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._local.active = False
+            with self._lock:
+                if self.running:
+                    self._captured.append(profile)
+                    if len(self._captured) >= CAPTURE_FOLD:
+                        self._fold()
+
+    def _fold(self):
+        """Merges the finished operation profiles into one Stats (call with the lock held)."""
+        if self._folded is None:
+            self._folded = pstats.Stats(self._captured.pop(0))
+        self._folded.add(*self._captured)
+        self._captured = []
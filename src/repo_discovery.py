@@ -0,0 +1,153 @@
+import json
+import os
+from typing import List, Dict, Optional, Callable
+
+# Directories that never contain repositories worth binding but can hold
+# hundreds of thousands of entries. They are skipped without being listed.
+PRUNE_DIRS = {
+    "node_modules", "bower_components", "vendor",
+    ".venv", "venv", "__pycache__", ".tox", ".nox",
+    ".mypy_cache", ".pytest_cache", ".ruff_cache",
+    "build", "dist", "target", "out", ".gradle", ".next", ".cache",
+    "$RECYCLE.BIN", "System Volume Information",
+}
+
+CACHE_VERSION = 1
+
+
+class RepositoryDiscovery:
+    """
+    Walks a directory tree with os.scandir and finds git checkouts:
+    - "repo":     a regular checkout with a .git directory
+    - "gitfile":  a .git file pointing elsewhere (submodules, --separate-git-dir)
+    - "worktree": a .git file pointing into <main>/.git/worktrees/<name>
+
+    Listings are cached per directory keyed by its mtime, so a re-scan only
+    calls scandir on directories whose entries changed since the last run.
+    """
+    def __init__(self, cache_file: Optional[str] = None, prune_dirs=None):
+        self.cache_file = cache_file
+        self.prune_dirs = set(prune_dirs) if prune_dirs is not None else set(PRUNE_DIRS)
+        self._cache: Dict[str, Dict] = self._load_cache()
+
+    def _load_cache(self) -> Dict[str, Dict]:
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+            if data.get("version") != CACHE_VERSION:
+                return {}
+            return data.get("dirs", {})
+        except (json.JSONDecodeError, OSError, AttributeError):
+            return {}
+
+    def _save_cache(self):
+        if not self.cache_file:
+            return
+        try:
+            with open(self.cache_file, 'w') as f:
+                json.dump({"version": CACHE_VERSION, "dirs": self._cache}, f)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _read_gitfile(path: str) -> Optional[str]:
+        """Returns the gitdir a .git file points to, or None if it is not a gitfile."""
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                first = f.readline().strip()
+        except OSError:
+            return None
+        if not first.startswith("gitdir:"):
+            return None
+        target = first[len("gitdir:"):].strip()
+        if not os.path.isabs(target):
+            target = os.path.normpath(os.path.join(os.path.dirname(path), target))
+        return target
+
+    def _scan_dir(self, path: str, mtime: int) -> Dict:
+        """Lists one directory and classifies its .git entry (if any)."""
+        subdirs = []
+        repo = None
+        with os.scandir(path) as it:
+            for entry in it:
+                name = entry.name
+                if name == ".git":
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            repo = {"kind": "repo", "git_dir": entry.path}
+                        elif entry.is_file():
+                            git_dir = self._read_gitfile(entry.path)
+                            if git_dir:
+                                parent = os.path.basename(os.path.dirname(git_dir))
+                                kind = "worktree" if parent == "worktrees" else "gitfile"
+                                repo = {"kind": kind, "git_dir": git_dir}
+                    except OSError:
+                        pass
+                    continue
+                if name in self.prune_dirs:
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(name)
+                except OSError:
+                    continue
+        return {"mtime": mtime, "subdirs": subdirs, "repo": repo}
+
+    def discover(self, root: str, progress_callback: Callable = None,
+                 should_stop: Callable = None) -> List[Dict]:
+        """
+        Returns [{"path", "kind", "git_dir"}] for every checkout under root.
+        progress_callback(dirs_visited, repos_found) is called periodically.
+        should_stop() lets a caller abort a long walk early.
+        """
+        root = os.path.abspath(root)
+        found = []
+        visited = 0
+        seen = set()
+        stack = [root]
+        aborted = False
+
+        while stack:
+            if should_stop and should_stop():
+                aborted = True
+                break
+            path = stack.pop()
+            try:
+                st = os.stat(path)
+            except OSError:
+                self._cache.pop(path, None)
+                continue
+
+            visited += 1
+            cached = self._cache.get(path)
+            if cached is None or cached["mtime"] != st.st_mtime_ns:
+                try:
+                    cached = self._scan_dir(path, st.st_mtime_ns)
+                except OSError:
+                    continue
+                self._cache[path] = cached
+
+            repo = cached["repo"]
+            if repo:
+                found.append({"path": path, "kind": repo["kind"], "git_dir": repo["git_dir"]})
+            seen.add(path)
+
+            for name in cached["subdirs"]:
+                stack.append(os.path.join(path, name))
+
+            if progress_callback and visited % 500 == 0:
+                progress_callback(visited, len(found))
+
+        # Drop cache entries under root that no longer exist (or are now pruned)
+        if not aborted:
+            prefix = root.rstrip(os.sep) + os.sep
+            for stale in [p for p in self._cache if (p == root or p.startswith(prefix)) and p not in seen]:
+                del self._cache[stale]
+
+        self._save_cache()
+        if progress_callback:
+            progress_callback(visited, len(found))
+        found.sort(key=lambda r: r["path"])
+        return found
@@ -0,0 +1,170 @@
+import json
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from command_runner import CommandRunner, get_runner
+from git_config import resolve_git_dirs
+
+MAX_HEALTH_WORKERS = min(8, (os.cpu_count() or 4))
+CACHE_VERSION = 1
+
+
+def parse_status_v2(output: str) -> Dict:
+    """Parses `git status --porcelain=v2 --branch` output."""
+    health = {"branch": None, "upstream": None, "ahead": 0, "behind": 0, "changed": 0, "untracked": 0}
+    for line in output.splitlines():
+        if line.startswith("# branch.head "):
+            head = line[len("# branch.head "):]
+            health["branch"] = None if head == "(detached)" else head
+        elif line.startswith("# branch.upstream "):
+            health["upstream"] = line[len("# branch.upstream "):]
+        elif line.startswith("# branch.ab "):
+            ahead, behind = line[len("# branch.ab "):].split()
+            health["ahead"] = int(ahead.lstrip("+"))
+            health["behind"] = int(behind.lstrip("-"))
+        elif line[:2] in ("1 ", "2 ", "u "):
+            health["changed"] += 1
+        elif line.startswith("? "):
+            health["untracked"] += 1
+    return health
+
+
+class RepoHealthCollector:
+    """
+    Collects branch, dirty state, ahead/behind and last commit author for
+    bound repositories on a bounded pool of git processes.
+    Results are cached per repository and keyed by the mtimes of the files
+    git touches when that state changes (index, HEAD, the checked-out ref,
+    packed-refs, FETCH_HEAD), so a refresh only runs git where something moved.
+    """
+    def __init__(self, cache_file: Optional[str] = None, max_workers: int = MAX_HEALTH_WORKERS,
+                 runner: Optional[CommandRunner] = None):
+        self.cache_file = cache_file
+        self.max_workers = max_workers
+        self.runner = runner or get_runner()
+        self._lock = threading.Lock()
+        # path -> {"key": [...], "health": {...}}
+        self._cache: Dict[str, Dict] = self._load_cache()
+
+    def _load_cache(self) -> Dict[str, Dict]:
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+            return data.get("repos", {}) if data.get("version") == CACHE_VERSION else {}
+        except (json.JSONDecodeError, OSError, AttributeError):
+            return {}
+
+    def _save_cache(self):
+        if not self.cache_file:
+            return
+        with self._lock:
+            snapshot = dict(self._cache)
+        try:
+            with open(self.cache_file, 'w') as f:
+                json.dump({"version": CACHE_VERSION, "repos": snapshot}, f)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _mtime(path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def cache_key(self, repo_path: str) -> Optional[List]:
+        """Mtimes that change whenever status or HEAD can change. None if not a repo."""
+        git_dir, common_dir = resolve_git_dirs(repo_path)
+        if not git_dir:
+            return None
+        head_path = os.path.join(git_dir, "HEAD")
+        ref_path = None
+        try:
+            with open(head_path, 'r', encoding='utf-8') as f:
+                head = f.read().strip()
+            if head.startswith("ref: "):
+                ref_path = os.path.join(common_dir, *head[5:].split("/"))
+        except OSError:
+            return None
+        return [
+            self._mtime(os.path.join(git_dir, "index")),
+            self._mtime(head_path),
+            self._mtime(ref_path) if ref_path else None,
+            self._mtime(os.path.join(common_dir, "packed-refs")),
+            self._mtime(os.path.join(git_dir, "FETCH_HEAD")),
+        ]
+
+    def _run_git(self, repo_path: str, args: List[str]) -> Tuple[int, str, str]:
+        # --no-optional-locks: status must not rewrite the index, or it would
+        # bump the index mtime and invalidate its own cache entry.
+        result = self.runner.run("git", ["--no-optional-locks", *args], cwd=repo_path, timeout=60, read_only=True)
+        return result.returncode, result.stdout, result.stderr
+
+    def collect_one(self, repo: Dict, expected_email: Optional[str], force: bool = False) -> Dict:
+        path = repo["path"]
+        key = self.cache_key(path) if os.path.isdir(path) else None
+        if key is None:
+            return {"path": path, "alias": repo.get("alias"), "error": "Not a git repository", "cached": False}
+
+        with self._lock:
+            cached = self._cache.get(path)
+        if not force and cached and cached["key"] == key:
+            health = dict(cached["health"])
+            health["cached"] = True
+        else:
+            try:
+                code, out, err = self._run_git(path, ["status", "--porcelain=v2", "--branch"])
+                if code != 0:
+                    return {"path": path, "alias": repo.get("alias"), "error": err.strip() or "git status failed", "cached": False}
+                health = parse_status_v2(out)
+                code, out, _ = self._run_git(path, ["log", "-1", "--format=%an%x00%ae"])
+                name, _, email = out.strip().partition("\0") if code == 0 else ("", "", "")
+                health["last_author"] = name or None
+                health["last_email"] = email or None
+            except (OSError, subprocess.TimeoutExpired) as e:
+                return {"path": path, "alias": repo.get("alias"), "error": str(e), "cached": False}
+            with self._lock:
+                self._cache[path] = {"key": key, "health": health}
+            health = dict(health)
+            health["cached"] = False
+
+        health["path"] = path
+        health["alias"] = repo.get("alias")
+        health["error"] = None
+        health["dirty"] = bool(health["changed"] or health["untracked"])
+        # Last commit made under the bound identity? (None when nothing to compare)
+        if expected_email and health.get("last_email"):
+            health["identity_ok"] = health["last_email"].lower() == expected_email.lower()
+        else:
+            health["identity_ok"] = None
+        return health
+
+    def collect(self, repos: List[Dict], expected_emails: Dict[str, str], force: bool = False,
+                result_callback: Callable = None, should_stop: Callable = None) -> List[Dict]:
+        """
+        Collects health for all repos. expected_emails maps account_id -> email.
+        result_callback(health) is called as each repository finishes, so a
+        UI can stream rows in. should_stop() aborts remaining work.
+        """
+        def _one(repo):
+            if should_stop and should_stop():
+                return None
+            health = self.collect_one(repo, expected_emails.get(repo["account_id"]), force)
+            if result_callback: result_callback(health)
+            return health
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as pool:
+            results = [h for h in pool.map(_one, repos) if h is not None]
+
+        # Forget repositories that are no longer managed
+        paths = {r["path"] for r in repos}
+        with self._lock:
+            for stale in [p for p in self._cache if p not in paths]:
+                del self._cache[stale]
+        self._save_cache()
+        return results
@@ -1,14 +1,43 @@
 import json
+import logging
 import os
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Iterable, Tuple
+from path_trie import PathTrie, path_components
+from atomic_file import write_json
+from metrics import timed
 
 REPOS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'repositories.json')
 
+# Binding kinds stored in the "binding" field. Entries written before
+# directory bindings existed have no field and are per-repo bindings.
+BINDING_REPO = "repo"            # git config --local in the repository
+BINDING_DIRECTORY = "directory"  # global [includeIf "gitdir:<path>/"] entry
+# Fields that only directory bindings carry
+DIRECTORY_FIELDS = ("include_path",)
+
 class RepositoryManager:
     def __init__(self, storage_file: str = REPOS_FILE):
         self.storage_file = storage_file
         self.repos: List[Dict] = self._load_repos()
+        # Normalized path -> binding entry. Serves exact, directory and
+        # longest-prefix lookups in O(path depth).
+        self._trie = PathTrie()
+        for repo in self.repos:
+            self._trie.insert(repo["path"], repo)
+        # listener(event, binding) after every change: "add", "update" or "remove"
+        self._listeners: List[Callable] = []
+
+    def add_listener(self, listener: Callable):
+        self._listeners.append(listener)
+
+    def _notify(self, event: str, repo: Optional[Dict]):
+        for listener in list(self._listeners):
+            try:
+                listener(event, repo)
+            except Exception:
+                logging.exception(f"Repository listener failed on {event}")
 
+    @timed("store.load")
     def _load_repos(self) -> List[Dict]:
         if not os.path.exists(self.storage_file):
             return []
@@ -18,31 +47,196 @@ class RepositoryManager:
         except json.JSONDecodeError:
             return []
 
-    def _save_repos(self):
-        with open(self.storage_file, 'w') as f:
-            json.dump(self.repos, f, indent=4)
+    @timed("store.save")
+    def _save_repos(self, repos: Optional[List[Dict]] = None):
+        write_json(self.storage_file, self.repos if repos is None else repos)
 
-    def add_repo(self, path: str, alias: str, account_id: str) -> Dict:
+    def binding_conflict(self, path: str, binding: str = BINDING_REPO) -> Optional[str]:
+        """
+        Why `path` cannot be bound as `binding`, or None. A path holds one
+        binding: a repository and a directory tree at the same path would
+        overwrite each other's record.
+        """
+        repo = self._trie.get(path)
+        if repo is None or repo.get("binding", BINDING_REPO) == binding:
+            return None
+        kind = "directory tree" if repo.get("binding") == BINDING_DIRECTORY else "repository"
+        return f"{path} is already bound as a {kind} ({repo['alias']}); remove that binding first."
+
+    @staticmethod
+    def _merge(repo: Dict, values: Dict) -> Dict:
+        """`repo` with `values` applied. Stale fields (an include_path the values do not carry) are dropped."""
+        merged = {k: v for k, v in repo.items() if k not in DIRECTORY_FIELDS or k in values}
+        merged.update(values)
+        return merged
+
+    def _upsert(self, path: str, alias: str, account_id: str, binding: str = BINDING_REPO, **extra) -> Dict:
         # Check if already exists
-        for repo in self.repos:
-            if repo["path"] == path:
-                 repo["alias"] = alias
-                 repo["account_id"] = account_id
-                 self._save_repos()
-                 return repo
+        repo = self._trie.get(path)
+        if repo:
+            conflict = self.binding_conflict(path, binding)
+            if conflict:
+                raise ValueError(conflict)
+            merged = self._merge(repo, {"alias": alias, "account_id": account_id, "binding": binding, **extra})
+            repo.clear()
+            repo.update(merged)
+            self._notify("update", repo)
+            return repo
 
         new_repo = {
             "path": path,
             "alias": alias,
-            "account_id": account_id
+            "account_id": account_id,
+            "binding": binding,
+            **extra
         }
         self.repos.append(new_repo)
-        self._save_repos()
+        self._trie.insert(path, new_repo)
+        self._notify("add", new_repo)
         return new_repo
 
+    def add_repo(self, path: str, alias: str, account_id: str) -> Dict:
+        repo = self._upsert(path, alias, account_id)
+        self._save_repos()
+        return repo
+
+    def add_repos(self, entries: Iterable[Tuple[str, str, str]]) -> List[Dict]:
+        """Adds or updates many (path, alias, account_id) entries with a single save."""
+        entries = list(entries)
+        # Checked up front, so a conflict leaves nothing half-applied
+        for path, _, _ in entries:
+            conflict = self.binding_conflict(path)
+            if conflict:
+                raise ValueError(conflict)
+        added = [self._upsert(path, alias, account_id) for path, alias, account_id in entries]
+        if added:
+            self._save_repos()
+        return added
+
+    @timed("store.import")
+    def import_repos(self, records: Iterable[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Adds or updates many bindings with one atomic save (nothing changes if
+        it fails). Records are dicts with path, alias, account_id and
+        optionally binding / include_path; later records for a path win.
+        A record whose path is bound as the other kind raises ValueError
+        before anything is written.
+        Returns (added, updated); bindings a record did not change are in neither.
+        """
+        # Normalized path -> (path, fields): the same key the trie uses
+        staged: Dict[Tuple[str, ...], Tuple[str, Dict]] = {}
+        for record in records:
+            values = {"alias": record["alias"], "account_id": record["account_id"],
+                      "binding": record.get("binding") or BINDING_REPO}
+            if record.get("include_path"):
+                values["include_path"] = record["include_path"]
+            staged[tuple(path_components(record["path"]))] = (record["path"], values)
+
+        # Write the merged list first, then apply it in memory
+        changes: Dict[int, Dict] = {}
+        new_entries = []
+        for path, values in staged.values():
+            conflict = self.binding_conflict(path, values["binding"])
+            if conflict:
+                raise ValueError(conflict)
+            repo = self._trie.get(path)
+            if repo is None:
+                new_entries.append({"path": path, **values})
+            elif self._merge(repo, values) != repo:
+                changes[id(repo)] = values
+        if not changes and not new_entries:
+            return [], []
+        # Saved entries are built as _upsert builds the in-memory ones
+        self._save_repos([self._merge(r, changes[id(r)]) if id(r) in changes else r for r in self.repos] + new_entries)
+
+        updated = [self._upsert(r["path"], **changes[id(r)]) for r in self.repos if id(r) in changes]
+        # Known to be new: skip _upsert's lookup
+        for entry in new_entries:
+            self.repos.append(entry)
+            self._trie.insert(entry["path"], entry)
+            self._notify("add", entry)
+        return new_entries, updated
+
     def remove_repo(self, path: str):
-        self.repos = [r for r in self.repos if r["path"] != path]
+        repo = self._trie.remove(path)
+        if repo is None:
+            return
+        self.repos = [r for r in self.repos if r is not repo]
         self._save_repos()
+        self._notify("remove", repo)
+
+    def add_directory_binding(self, path: str, alias: str, account_id: str, include_path: str) -> Dict:
+        """Records a directory tree bound through a global includeIf entry."""
+        binding = self._upsert(path, alias, account_id, BINDING_DIRECTORY, include_path=include_path)
+        self._save_repos()
+        return binding
 
     def get_repos(self) -> List[Dict]:
+        """Returns per-repository bindings."""
+        return [r for r in self.repos if r.get("binding", BINDING_REPO) == BINDING_REPO]
+
+    def get_directory_bindings(self) -> List[Dict]:
+        """Returns directory-tree (includeIf) bindings."""
+        return [r for r in self.repos if r.get("binding") == BINDING_DIRECTORY]
+
+    def get_all_bindings(self) -> List[Dict]:
         return self.repos
+
+    # --- Resolution ---------------------------------------------------------
+
+    def find_binding(self, path: str) -> Optional[Dict]:
+        """Exact match: the binding recorded for this very path."""
+        return self._trie.get(path)
+
+    def get_bindings_under(self, directory: str) -> List[Dict]:
+        """Directory match: bindings at or below the directory."""
+        return list(self._trie.iter_under(directory))
+
+    def resolve(self, path: str, follow_worktrees: bool = True) -> Optional[Dict]:
+        """
+        Returns the binding that owns `path` (a repository, any directory
+        inside it, or a directory tree binding above it). Nested bindings win
+        over their parents. Linked worktrees live outside their main
+        checkout, so they are resolved through the main repository.
+        """
+        binding = self._trie.longest_prefix(path)
+        if binding is None and follow_worktrees:
+            main_repo = self._worktree_main_repo(path)
+            if main_repo:
+                binding = self._trie.longest_prefix(main_repo)
+        return binding
+
+    def resolve_account_id(self, path: str) -> Optional[str]:
+        binding = self.resolve(path)
+        return binding["account_id"] if binding else None
+
+    @staticmethod
+    def _worktree_main_repo(path: str) -> Optional[str]:
+        """
+        Walks up to the nearest .git entry. If it is a gitfile pointing to
+        <main>/.git/worktrees/<name>, returns <main>.
+        """
+        current = os.path.abspath(os.path.expanduser(path))
+        while True:
+            dot_git = os.path.join(current, ".git")
+            if os.path.isdir(dot_git):
+                return None
+            if os.path.isfile(dot_git):
+                try:
+                    with open(dot_git, 'r', encoding='utf-8', errors='replace') as f:
+                        first = f.readline().strip()
+                except OSError:
+                    return None
+                if not first.startswith("gitdir:"):
+                    return None
+                git_dir = first[len("gitdir:"):].strip()
+                if not os.path.isabs(git_dir):
+                    git_dir = os.path.normpath(os.path.join(current, git_dir))
+                if os.path.basename(os.path.dirname(git_dir)) != "worktrees":
+                    return None
+                # <main>/.git/worktrees/<name> -> <main>
+                return os.path.dirname(os.path.dirname(os.path.dirname(git_dir)))
+            parent = os.path.dirname(current)
+            if parent == current:
+                return None
+            current = parent
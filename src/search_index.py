@@ -0,0 +1,398 @@
+"""
+Incremental search over saved accounts and repository bindings.
+
+Entries are split into lowercase tokens (words of the alias, username,
+email, path components, ...). The index keeps
+  * token -> entries containing it,
+  * the sorted vocabulary, for prefix ranges, and
+  * trigram -> tokens containing it, for substring and fuzzy matches,
+so a query only touches the vocabulary and posting sets it needs, never
+every entry. Matches come best first: exact token, token prefix,
+substring, then fuzzy (shared trigrams, for typos). Each tier is only
+computed if the ones before it did not fill `limit` results.
+
+AccountRepoIndex keeps one index per kind up to date by listening to
+AccountManager / RepositoryManager mutations.
+"""
+import bisect
+import re
+import threading
+from collections import Counter
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Set, Tuple
+
+from metrics import timed
+
+SEARCH_LIMIT = 200
+# Share of the query's trigrams a token needs to count as a fuzzy match
+FUZZY_THRESHOLD = 0.5
+# Fuzzy matching skips trigrams this common: they say little and cost a lot
+FUZZY_MAX_POSTING = 20000
+# Estimating how selective a term is stops at this many entries / tokens
+COST_CAP = 20000
+COST_MAX_TOKENS = 2000
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+_START, _END = "\x02", "\x03"
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _trigrams(token: str) -> Set[str]:
+    padded = f"{_START}{token}{_END}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Maps keys to searchable text fields. Thread-safe; add() of an existing key replaces it."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # key -> (lowercase text of all fields, tokens, item)
+        self._docs: Dict[Hashable, Tuple[str, Set[str], object]] = {}
+        self._postings: Dict[str, Set[Hashable]] = {}
+        self._grams: Dict[str, Set[str]] = {}
+        # Sorted vocabulary; new tokens wait in _pending and are merged in before the next query
+        self._vocab: List[str] = []
+        self._pending: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._docs
+
+    def add(self, key: Hashable, fields: Iterable[Optional[str]], item=None):
+        values = [f for f in fields if f]
+        text = "\x00".join(values).lower()
+        tokens = set(tokenize(" ".join(values)))
+        with self._lock:
+            if key in self._docs:
+                self._remove(key)
+            self._docs[key] = (text, tokens, item)
+            for token in tokens:
+                docs = self._postings.get(token)
+                if docs is None:
+                    docs = self._postings[token] = set()
+                    self._add_token(token)
+                docs.add(key)
+
+    def remove(self, key: Hashable):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._docs.clear()
+            self._postings.clear()
+            self._grams.clear()
+            self._vocab = []
+            self._pending.clear()
+
+    def _remove(self, key):
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return
+        for token in doc[1]:
+            docs = self._postings[token]
+            docs.discard(key)
+            if not docs:
+                del self._postings[token]
+                self._drop_token(token)
+
+    def _add_token(self, token: str):
+        self._pending.add(token)
+        for gram in _trigrams(token):
+            self._grams.setdefault(gram, set()).add(token)
+
+    def _drop_token(self, token: str):
+        if token in self._pending:
+            self._pending.discard(token)
+        else:
+            i = bisect.bisect_left(self._vocab, token)
+            if i < len(self._vocab) and self._vocab[i] == token:
+                del self._vocab[i]
+        for gram in _trigrams(token):
+            tokens = self._grams.get(gram)
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._grams[gram]
+
+    def prepare(self):
+        """Sorts new vocabulary now (after a bulk load) instead of in the next query."""
+        with self._lock:
+            self._sorted_vocab()
+
+    def _sorted_vocab(self) -> List[str]:
+        if self._pending:
+            # Two sorted runs: list.sort merges them in linear time
+            self._vocab.extend(sorted(self._pending))
+            self._vocab.sort()
+            self._pending.clear()
+        return self._vocab
+
+    # --- Queries ------------------------------------------------------------
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT, fuzzy: bool = True) -> List:
+        """
+        Items whose fields match every whitespace-separated term of the query,
+        best matches first. A term with punctuation ("alice@corp", "work/api")
+        must appear as written.
+        """
+        with self._lock:
+            self._sorted_vocab()
+            terms = [term for term in (self._term(t, fuzzy) for t in query.lower().split()) if term]
+            if not terms:
+                return []
+            # The most selective term drives the ranking; the others only filter
+            terms.sort(key=lambda term: term.cost)
+            primary, others = terms[0], terms[1:]
+            results = []
+            seen = set()
+            for token in primary.ranked_tokens():
+                for key in self._postings.get(token, ()):
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    text, tokens, item = self._docs[key]
+                    if primary.phrase and primary.text not in text:
+                        continue
+                    if all(term.matches(text, tokens) for term in others):
+                        results.append(item)
+                        if len(results) >= limit:
+                            return results
+            return results
+
+    def _term(self, text: str, fuzzy: bool) -> Optional["_Term"]:
+        words = tokenize(text)
+        if not words:
+            return None
+        phrase = len(words) > 1 or words[0] != text
+        # A punctuated term: candidates come from its most selective word, then the whole term is checked
+        options = [_Term(self, text, word, phrase, fuzzy and not phrase) for word in sorted(set(words), key=len, reverse=True)]
+        return min(options, key=lambda term: term.cost)
+
+    def _prefix_tokens(self, word: str) -> Iterator[str]:
+        """Vocabulary entries starting with `word` (excluding itself), in sorted order."""
+        vocab = self._vocab
+        i = bisect.bisect_right(vocab, word)
+        while i < len(vocab) and vocab[i].startswith(word):
+            yield vocab[i]
+            i += 1
+
+    def _substring_tokens(self, word: str) -> Iterator[str]:
+        """Vocabulary entries containing `word` past their first character."""
+        if len(word) < 3:
+            return  # too short for trigrams: prefix matches only
+        postings = sorted((self._grams.get(word[i:i + 3], set()) for i in range(len(word) - 2)), key=len)
+        for token in postings[0].intersection(*postings[1:]):
+            if word in token and not token.startswith(word):
+                yield token
+
+    def _fuzzy_tokens(self, word: str) -> List[str]:
+        """Vocabulary entries sharing most of `word`'s trigrams (typos), most similar first."""
+        grams = _trigrams(word)
+        counts = Counter()
+        for gram in grams:
+            tokens = self._grams.get(gram)
+            if tokens and len(tokens) <= FUZZY_MAX_POSTING:
+                counts.update(tokens)
+        needed = FUZZY_THRESHOLD * len(grams)
+        similar = [(shared, t) for t, shared in counts.items() if shared >= needed and word not in t]
+        similar.sort(key=lambda pair: (-pair[0], abs(len(pair[1]) - len(word))))
+        return [t for _, t in similar]
+
+
+class _Term:
+    """One query term, resolved lazily against the vocabulary."""
+    __slots__ = ("index", "text", "word", "phrase", "fuzzy", "cost", "_buffer", "_source", "_fuzzy_set")
+
+    def __init__(self, index: SearchIndex, text: str, word: str, phrase: bool, fuzzy: bool):
+        self.index = index
+        self.text = text
+        self.word = word
+        self.phrase = phrase
+        self.fuzzy = fuzzy
+        self._buffer: List[str] = []
+        self._source = self._tiers()
+        self._fuzzy_set = None
+        self.cost = self._estimate()
+
+    def _tiers(self) -> Iterator[str]:
+        index, word = self.index, self.word
+        exact = word in index._postings
+        if exact:
+            yield word
+        yield from index._prefix_tokens(word)
+        yield from index._substring_tokens(word)
+        if self.fuzzy:
+            yield from index._fuzzy_tokens(word)
+
+    def _estimate(self) -> int:
+        """Entries matched by the first tiers, capped: only used to pick the most selective term."""
+        cost = 0
+        for token in self._source:
+            self._buffer.append(token)
+            cost += len(self.index._postings[token])
+            if cost >= COST_CAP or len(self._buffer) >= COST_MAX_TOKENS:
+                return COST_CAP
+        return cost
+
+    def ranked_tokens(self) -> Iterator[str]:
+        yield from self._buffer
+        for token in self._source:
+            self._buffer.append(token)
+            yield token
+
+    def matches(self, text: str, tokens: Set[str]) -> bool:
+        """Filter check for one entry (cheap: looks at the entry's own tokens)."""
+        if self.phrase:
+            return self.text in text
+        word = self.word
+        if len(word) < 3:
+            if any(t.startswith(word) for t in tokens):
+                return True
+        elif any(word in t for t in tokens):
+            return True
+        if not self.fuzzy:
+            return False
+        if self._fuzzy_set is None:
+            self._fuzzy_set = set(self.index._fuzzy_tokens(word))
+        return not tokens.isdisjoint(self._fuzzy_set)
+
+
+ACCOUNT_FIELDS = ("alias", "username", "email")
+
+
+class AccountRepoIndex:
+    """
+    Search over saved accounts (alias, username, email) and repository
+    bindings (alias, path, bound account). Listens to both managers, so
+    every add/update/remove is reflected without rebuilding.
+    """
+    def __init__(self, account_manager, repo_manager):
+        self.account_manager = account_manager
+        self.repo_manager = repo_manager
+        self.accounts = SearchIndex()
+        self.repos = SearchIndex()
+        # account id -> paths of the repositories bound to it (re-indexed when it is renamed)
+        self._bound: Dict[str, Set[str]] = {}
+        self._repo_account: Dict[str, Optional[str]] = {}
+        self._account_names: Dict[str, Tuple[str, ...]] = {}
+        # Guards the maps above. Changes that arrive while rebuild() runs (on
+        # another thread) are queued and applied after it, so a remove is not
+        # undone by the build re-adding the entry from its snapshot
+        self._lock = threading.Lock()
+        self._building = False
+        self._stale = False
+        self._queued: List[Tuple] = []
+        # Subscribed first, so changes made while a large index is built are not lost
+        account_manager.add_listener(self._on_account_change)
+        repo_manager.add_listener(self._on_repo_change)
+        self.rebuild()
+
+    def rebuild(self):
+        with self._lock:
+            if self._building:
+                self._stale = True  # the running build starts over
+                return
+            self._building = True
+        try:
+            while True:
+                self._build()
+                with self._lock:
+                    if self._stale:
+                        self._stale = False
+                        self._queued.clear()
+                        continue
+                    for apply, event, entry in self._queued:
+                        apply(event, entry)
+                    self._queued.clear()
+                    self._building = False
+                    return
+        except BaseException:
+            with self._lock:
+                self._building = False
+            raise
+
+    @timed("search.build")
+    def _build(self):
+        self.accounts.clear()
+        self.repos.clear()
+        self._bound.clear()
+        self._repo_account.clear()
+        self._account_names.clear()
+        for acc in self.account_manager.get_accounts():
+            self._index_account(acc)
+        for repo in self.repo_manager.get_all_bindings():
+            self._index_repo(repo)
+        self.accounts.prepare()
+        self.repos.prepare()
+
+    @timed("search.accounts")
+    def search_accounts(self, query: str, limit: int = SEARCH_LIMIT) -> List[Dict]:
+        return self.accounts.search(query, limit)
+
+    @timed("search.repos")
+    def search_repos(self, query: str, limit: int = SEARCH_LIMIT) -> List[Dict]:
+        return self.repos.search(query, limit)
+
+    def _index_account(self, acc: Dict):
+        self._account_names[acc["id"]] = (acc.get("alias"), acc.get("username"))
+        self.accounts.add(acc["id"], [acc.get(f) for f in ACCOUNT_FIELDS], acc)
+
+    def _index_repo(self, repo: Dict):
+        path, account_id = repo["path"], repo.get("account_id")
+        previous = self._repo_account.get(path)
+        if previous != account_id and previous in self._bound:
+            self._bound[previous].discard(path)
+        self._repo_account[path] = account_id
+        self._bound.setdefault(account_id, set()).add(path)
+        self.repos.add(path, [repo.get("alias"), path, *self._account_names.get(account_id, ())], repo)
+
+    def _unindex_repo(self, repo: Dict):
+        path = repo["path"]
+        self.repos.remove(path)
+        account_id = self._repo_account.pop(path, None)
+        if account_id in self._bound:
+            self._bound[account_id].discard(path)
+
+    def _on_account_change(self, event: str, acc: Optional[Dict]):
+        if event == "reload":
+            self.rebuild()
+        else:
+            self._apply(self._account_changed, event, acc)
+
+    def _on_repo_change(self, event: str, repo: Optional[Dict]):
+        if event == "reload":
+            self.rebuild()
+        else:
+            self._apply(self._repo_changed, event, repo)
+
+    def _apply(self, apply, event: str, entry: Dict):
+        with self._lock:
+            if self._building:
+                self._queued.append((apply, event, entry))
+            else:
+                apply(event, entry)
+
+    def _account_changed(self, event: str, acc: Dict):
+        if event == "remove":
+            self.accounts.remove(acc["id"])
+            self._account_names.pop(acc["id"], None)
+        else:
+            self._index_account(acc)
+        # Bindings show the account's name: refresh them
+        for path in list(self._bound.get(acc["id"], ())):
+            repo = self.repo_manager.find_binding(path)
+            if repo is not None:
+                self._index_repo(repo)
+
+    def _repo_changed(self, event: str, repo: Dict):
+        if event == "remove":
+            self._unindex_repo(repo)
+        else:
+            self._index_repo(repo)
+
@@ -0,0 +1,34 @@
+import json
+import os
+from typing import Any, Dict
+
+SETTINGS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'settings.json')
+
+class SettingsManager:
+    """Small key/value store for app preferences (data/settings.json)."""
+    def __init__(self, storage_file: str = SETTINGS_FILE):
+        self.storage_file = storage_file
+        self.settings: Dict[str, Any] = self._load_settings()
+
+    def _load_settings(self) -> Dict[str, Any]:
+        if not os.path.exists(self.storage_file):
+            return {}
+        try:
+            with open(self.storage_file, 'r') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except json.JSONDecodeError:
+            return {}
+
+    def _save_settings(self):
+        with open(self.storage_file, 'w') as f:
+            json.dump(self.settings, f, indent=4)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.settings.get(key, default)
+
+    def set(self, key: str, value: Any):
+        if self.settings.get(key) == value:
+            return
+        self.settings[key] = value
+        self._save_settings()
@@ -0,0 +1,128 @@
+"""
+Single-instance enforcement for the GUI.
+
+The first instance holds an exclusive lock on data/app.lock and listens on
+a loopback TCP port (Unix sockets are not available on Windows). The port
+and a random token are published in data/instance.json, readable only by
+the user. A second launch, or the CLI, sends one JSON line:
+
+    {"token": "...", "command": "show"}
+    {"token": "...", "command": "switch", "account_id": "..."}
+    {"token": "...", "command": "metrics", "format": "json" | "prometheus"}
+
+and gets one JSON line back: {"ok": true, "message": "..."}.
+"""
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+LOCK_FILE = "app.lock"
+INFO_FILE = "instance.json"
+MAX_REQUEST = 64 * 1024
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline(MAX_REQUEST))
+            if not isinstance(request, dict) or request.get("token") != self.server.token:
+                reply = {"ok": False, "message": "Invalid token"}
+            else:
+                reply = self.server.handler(request)
+        except (ValueError, UnicodeDecodeError):
+            reply = {"ok": False, "message": "Malformed request"}
+        except Exception as e:
+            logging.error(f"Instance request failed: {e}")
+            reply = {"ok": False, "message": str(e)}
+        self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+
+
+class SingleInstance:
+    """Owns the instance lock and, once serving, answers hand-off requests."""
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+        self.lock_path = os.path.join(data_dir, LOCK_FILE)
+        self.info_path = os.path.join(data_dir, INFO_FILE)
+        self._lock_file = None
+        self._server: Optional[_Server] = None
+
+    def acquire(self) -> bool:
+        """Takes the lock without blocking. False when another instance holds it."""
+        os.makedirs(self.data_dir, exist_ok=True)
+        lock_file = open(self.lock_path, 'a+')
+        try:
+            if os.name == "nt":
+                import msvcrt
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file  # held (open) for the life of the process
+        return True
+
+    def serve(self, handler: Callable[[Dict], Dict]):
+        """Starts answering requests; handler(request) runs on a server thread."""
+        import secrets
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.token = secrets.token_hex(16)
+        self._server.handler = handler
+        threading.Thread(target=self._server.serve_forever, name="SingleInstance", daemon=True).start()
+
+        info = {"pid": os.getpid(), "port": self._server.server_address[1], "token": self._server.token}
+        tmp_path = f"{self.info_path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(info, f)
+        os.replace(tmp_path, self.info_path)
+
+    def close(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            try:
+                os.remove(self.info_path)
+            except OSError:
+                pass
+        if self._lock_file:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+def send_request(data_dir: str, request: Dict, timeout: float = 5.0) -> Optional[Dict]:
+    """Forwards a request to the running instance. None when no instance answers."""
+    try:
+        with open(os.path.join(data_dir, INFO_FILE), 'r') as f:
+            info = json.load(f)
+        with socket.create_connection(("127.0.0.1", info["port"]), timeout=timeout) as sock:
+            sock.sendall(json.dumps(dict(request, token=info["token"])).encode("utf-8") + b"\n")
+            reply = sock.makefile('rb').readline(MAX_REQUEST)
+        return json.loads(reply) if reply else None
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def hand_off(data_dir: str, request: Dict, wait: float = 5.0) -> Optional[Dict]:
+    """
+    send_request() for a launch that lost the lock race: the running
+    instance may still be starting up, so retry until it is listening.
+    """
+    deadline = time.monotonic() + wait
+    while True:
+        reply = send_request(data_dir, request)
+        if reply is not None or time.monotonic() >= deadline:
+            return reply
+        time.sleep(0.1)
@@ -0,0 +1,203 @@
+"""
+Content-addressed history of the config files the app rewrites
+(~/.gitconfig, ~/.ssh/config, bound repositories' .git/config).
+
+GitSwitcher records the files it is about to change before every mutation:
+
+    snapshots/objects/ab/cdef...   file contents, zlib-compressed, named by SHA-256
+    snapshots/history.jsonl        one line per snapshot:
+        {"id": "...", "time": 1760000000.0, "reason": "activate Work",
+         "files": {"/home/me/.gitconfig": ["<sha256>", 420], "/home/me/.ssh/config": null}}
+
+A file is stored once however many snapshots refer to it, so switching back
+and forth between accounts only adds a history line per switch. null means
+the file did not exist. restore() brings the files of a snapshot back (and
+snapshots the current state first, so a rollback can itself be undone).
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+HISTORY_FILE = "history.jsonl"
+OBJECTS_DIR = "objects"
+ID_LENGTH = 12
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class SnapshotStore:
+    def __init__(self, root: str):
+        self.root = root
+        self.objects_dir = os.path.join(root, OBJECTS_DIR)
+        self.history_file = os.path.join(root, HISTORY_FILE)
+        self._lock = threading.Lock()
+        # Files of the last snapshot per path set, to skip recording an unchanged state twice
+        self._last: Dict[frozenset, Dict] = {}
+
+    # --- Objects ------------------------------------------------------------
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+
+    def _store(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(zlib.compress(data))
+            os.replace(tmp_path, path)
+        return digest
+
+    def _load(self, digest: str) -> bytes:
+        try:
+            with open(self._object_path(digest), 'rb') as f:
+                return zlib.decompress(f.read())
+        except (OSError, zlib.error) as e:
+            raise SnapshotError(f"Snapshot object {digest[:ID_LENGTH]} is missing or damaged: {e}")
+
+    # --- Snapshots ----------------------------------------------------------
+
+    def snapshot(self, paths: Iterable[str], reason: str = "") -> Optional[Dict]:
+        """
+        Records the current contents of `paths` (missing files included, as
+        absent). Returns the history entry, or the previous one when nothing
+        changed since it was taken.
+        """
+        files = {}
+        for path in paths:
+            path = os.path.abspath(os.path.expanduser(path))
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                mode = os.stat(path).st_mode & 0o777
+            except FileNotFoundError:
+                files[path] = None
+                continue
+            files[path] = [self._store(data), mode]
+        if not files:
+            return None
+
+        key = frozenset(files)
+        with self._lock:
+            last = self._last.get(key)
+            if last is not None and last["files"] == files:
+                return last
+            now = time.time()
+            entry_id = hashlib.sha256(f"{now!r}{os.getpid()}{sorted(files.items())}".encode()).hexdigest()[:ID_LENGTH]
+            entry = {"id": entry_id, "time": now, "reason": reason, "files": files}
+            os.makedirs(self.root, exist_ok=True)
+            # One short append per snapshot; the GUI and CLI may both write
+            with open(self.history_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + "\n")
+            self._last[key] = entry
+        return entry
+
+    def list(self, limit: Optional[int] = None, path: Optional[str] = None) -> List[Dict]:
+        """History entries, newest first; optionally only those that include `path`."""
+        try:
+            with open(self.history_file, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return []
+        if path:
+            path = os.path.abspath(os.path.expanduser(path))
+        entries = []
+        for line in reversed(lines):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # torn write
+            if path and path not in entry["files"]:
+                continue
+            entries.append(entry)
+            if limit and len(entries) >= limit:
+                break
+        return entries
+
+    def get(self, snapshot_id: str) -> Dict:
+        """Looks up a snapshot by id or unique id prefix."""
+        matches = [e for e in self.list() if e["id"].startswith(snapshot_id)] if snapshot_id else []
+        if not matches:
+            raise SnapshotError(f"No snapshot {snapshot_id!r}.")
+        if len({e["id"] for e in matches}) > 1:
+            raise SnapshotError(f"Snapshot id {snapshot_id!r} is ambiguous.")
+        return matches[0]
+
+    def read(self, entry: Dict, path: str) -> Optional[bytes]:
+        """Contents of one file in a snapshot (None: it did not exist)."""
+        record = entry["files"][path]
+        return None if record is None else self._load(record[0])
+
+    def diff(self, snapshot_id: str, against: Optional[str] = None) -> str:
+        """Unified diff from a snapshot to another snapshot, or to the files as they are now."""
+        import difflib
+        entry = self.get(snapshot_id)
+        other = self.get(against) if against else None
+        chunks = []
+        for path in sorted(entry["files"]):
+            old = self.read(entry, path)
+            if other is not None:
+                if path not in other["files"]:
+                    continue
+                new, new_label = self.read(other, path), f"{path} ({other['id']})"
+            else:
+                new, new_label = _read_current(path), f"{path} (current)"
+            if old == new:
+                continue
+            chunks.extend(difflib.unified_diff(
+                _lines(old), _lines(new), fromfile=f"{path} ({entry['id']})", tofile=new_label))
+        return "".join(chunks)
+
+    def restore(self, snapshot_id: str, paths: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        Puts the files of a snapshot (or only `paths`) back as they were.
+        The current state is snapshotted first. Returns the files changed.
+        """
+        entry = self.get(snapshot_id)
+        targets = sorted(entry["files"]) if paths is None else \
+            [os.path.abspath(os.path.expanduser(p)) for p in paths if p]
+        missing = [p for p in targets if p not in entry["files"]]
+        if missing:
+            raise SnapshotError(f"Snapshot {entry['id']} does not include {', '.join(missing)}.")
+        # Load everything before touching anything, so a damaged object changes nothing
+        contents = {path: self.read(entry, path) for path in targets}
+        changed = [path for path in targets if contents[path] != _read_current(path)]
+        if changed:
+            self.snapshot(changed, reason=f"before rollback to {entry['id']}")
+
+        for path in changed:
+            data = contents[path]
+            if data is None:
+                os.remove(path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = path + ".ghm-restore"
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.chmod(tmp_path, entry["files"][path][1])
+                os.replace(tmp_path, path)
+        import logging
+        logging.info(f"Restored snapshot {entry['id']}: {', '.join(changed) or 'nothing changed'}")
+        return changed
+
+
+def _read_current(path: str) -> Optional[bytes]:
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _lines(data: Optional[bytes]) -> List[str]:
+    if data is None:
+        return []
+    return data.decode('utf-8', errors='replace').splitlines(keepends=True)
@@ -1,13 +1,44 @@
 import os
 import subprocess
 import shutil
-from typing import Optional
+import threading
+import time
+from typing import Optional, List, Tuple, Callable
+from git_config import repo_config_path, set_config_values, ConfigLockedError, read_git_config, move_include_ifs_last
+from command_runner import CommandRunner, get_runner
+from snapshot_store import SnapshotStore
+from metrics import timed
+from app_paths import GIT_INCLUDES_DIR
+
+# Upper bound for parallel repository updates during bulk operations
+MAX_BIND_WORKERS = min(16, (os.cpu_count() or 4) * 2)
+CONFIG_LOCK_RETRIES = 5
+SSH_CONNECT_TIMEOUT = 10
 
 class GitSwitcher:
-    def __init__(self):
+    def __init__(self, runner: Optional[CommandRunner] = None, snapshots: Optional[SnapshotStore] = None,
+                 includes_dir: str = GIT_INCLUDES_DIR):
+        # git/ssh/ssh-keygen calls go through one runner (timeouts, concurrency, query cache)
+        self.runner = runner or get_runner()
+        # Optional history: the files about to change are recorded before every mutation
+        self.snapshots = snapshots
+        # Where directory bindings' include files live: their includeIf entries are the app's to reorder
+        self.includes_dir = includes_dir
         self.ssh_config_path = os.path.expanduser("~/.ssh/config")
+        # One switch at a time: two overlapping ones could mix one account's email with another's key
+        self._activate_lock = threading.Lock()
         self.ssh_dir = os.path.expanduser("~/.ssh")
 
+    def snapshot(self, paths: List[str], reason: str):
+        """Records `paths` in the snapshot history (if any). Never blocks the change itself."""
+        if self.snapshots is None:
+            return
+        try:
+            self.snapshots.snapshot(paths, reason)
+        except OSError as e:
+            import logging  # not at module level: the CLI starts without it
+            logging.error(f"Snapshot before '{reason}' failed: {e}")
+
     def generate_ssh_key(self, email: str, filename: str, output_dir: Optional[str] = None) -> tuple[bool, str, str]:
         """
         Generates an ed25519 SSH key.
@@ -33,14 +64,14 @@ class GitSwitcher:
             # -C email: comment
             # -f key_path: output file
             # -N "": empty passphrase (for automation convenience, though less secure)
-            cmd = [
-                "ssh-keygen", "-t", "ed25519",
+            args = [
+                "-t", "ed25519",
                 "-C", email,
                 "-f", key_path,
                 "-N", ""
             ]
             
-            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            self.runner.run("ssh-keygen", args, check=True)
             
             # Read public key
             with open(pub_key_path, 'r') as f:
@@ -49,73 +80,266 @@ class GitSwitcher:
             return True, f"Key generated at {key_path}", pub_key_content
             
         except subprocess.CalledProcessError as e:
-            return False, f"ssh-keygen failed: {e.stderr.decode()}", ""
+            return False, f"ssh-keygen failed: {e.stderr.strip()}", ""
+        except subprocess.TimeoutExpired:
+            return False, "ssh-keygen timed out.", ""
         except Exception as e:
             return False, f"Error generating key: {str(e)}", ""
 
-    def set_global_git_user(self, name: str, email: str, gpg_key_id: str = None):
+    def set_global_git_user(self, name: str, email: str, gpg_key_id: str = None, snapshot: bool = True):
         """Sets the global git user.name, user.email, and GPG signing."""
+        if snapshot:
+            self.snapshot(self.global_config_paths(), f"set global user {name} <{email}>")
+        run = self.runner.run
         try:
-            subprocess.run(["git", "config", "--global", "user.name", name], check=True)
-            subprocess.run(["git", "config", "--global", "user.email", email], check=True)
+            run("git", ["config", "--global", "user.name", name], check=True)
+            run("git", ["config", "--global", "user.email", email], check=True)
             
             if gpg_key_id and gpg_key_id.strip():
-                subprocess.run(["git", "config", "--global", "user.signingkey", gpg_key_id.strip()], check=True)
-                subprocess.run(["git", "config", "--global", "commit.gpgsign", "true"], check=True)
+                run("git", ["config", "--global", "user.signingkey", gpg_key_id.strip()], check=True)
+                run("git", ["config", "--global", "commit.gpgsign", "true"], check=True)
             else:
                 # Unset if not provided to avoid using wrong key
-                subprocess.run(["git", "config", "--global", "--unset", "user.signingkey"], check=False)
-                subprocess.run(["git", "config", "--global", "commit.gpgsign", "false"], check=False)
-                
-            return True, "Git global config updated."
-        except subprocess.CalledProcessError as e:
+                run("git", ["config", "--global", "--unset", "user.signingkey"], check=False)
+                run("git", ["config", "--global", "commit.gpgsign", "false"], check=False)
+        except (OSError, subprocess.SubprocessError) as e:
             return False, f"Failed to set git config: {e}"
 
-    def set_local_git_user(self, repo_path: str, name: str, email: str, ssh_key_path: str):
+        # git may have appended a new [user] section after the directory bindings
+        try:
+            for path in self.global_config_paths():
+                move_include_ifs_last(path, self.includes_dir)
+        except OSError as e:
+            return False, f"Git global config updated, but directory bindings may be overridden: {e}"
+        return True, "Git global config updated."
+
+    @staticmethod
+    def build_ssh_command(ssh_key_path: str) -> str:
+        """core.sshCommand value that pins a repository to one key."""
+        # Fix path separators for Windows git bash compatibility if needed, 
+        # often forward slashes work best in git config
+        ssh_key_path_fixed = ssh_key_path.replace("\\", "/")
+        # We use -F /dev/null to ignore global config and -i to specify key
+        return f"ssh -i \"{ssh_key_path_fixed}\" -o IdentitiesOnly=yes -F /dev/null"
+
+    @timed("bind.repo")
+    def set_local_git_user(self, repo_path: str, name: str, email: str, ssh_key_path: str, snapshot: bool = True):
         """
         Sets local git config for a repository.
         Also sets core.sshCommand to use specific key.
+        All three keys are written to the repository config in a single
+        locked write instead of one `git config` process per key.
         """
         if not os.path.exists(os.path.join(repo_path, ".git")):
              return False, "Not a valid git repository (no .git folder)."
 
-        try:
-            # Fix path separators for Windows git bash compatibility if needed, 
-            # often forward slashes work best in git config
-            ssh_key_path_fixed = ssh_key_path.replace("\\", "/")
-            
+        config_path = repo_config_path(repo_path)
+        if not config_path:
+             return False, "Not a valid git repository (unreadable .git file)."
+        if snapshot:
+            self.snapshot([config_path], f"bind {repo_path} to {email}")
+
+        values = {
             # 1. User Identity
-            subprocess.run(["git", "config", "--local", "user.name", name], cwd=repo_path, check=True)
-            subprocess.run(["git", "config", "--local", "user.email", email], cwd=repo_path, check=True)
-            
+            "user.name": name,
+            "user.email": email,
             # 2. SSH Command Override
-            # We use -F /dev/null to ignore global config and -i to specify key
-            ssh_cmd = f"ssh -i \"{ssh_key_path_fixed}\" -o IdentitiesOnly=yes -F /dev/null"
-            subprocess.run(["git", "config", "--local", "core.sshCommand", ssh_cmd], cwd=repo_path, check=True)
-            
-            return True, "Repository config updated successfully."
-        except subprocess.CalledProcessError as e:
-            return False, f"Failed to set local config: {e}"
+            "core.sshCommand": self.build_ssh_command(ssh_key_path),
+        }
+        # Worktrees share one config, and git may hold the lock briefly: retry a few times
+        for attempt in range(CONFIG_LOCK_RETRIES):
+            try:
+                set_config_values(config_path, values)
+                return True, "Repository config updated successfully."
+            except ConfigLockedError as e:
+                if attempt == CONFIG_LOCK_RETRIES - 1:
+                    return False, f"Failed to set local config: {e}"
+                time.sleep(0.05 * (attempt + 1))
+            except OSError as e:
+                return False, f"Failed to set local config: {e}"
+
+    @timed("bind.bulk")
+    def bind_repositories(self, repo_paths: List[str], name: str, email: str, ssh_key_path: str,
+                          max_workers: int = MAX_BIND_WORKERS,
+                          progress_callback: Callable = None) -> List[Tuple[str, bool, str]]:
+        """
+        Runs set_local_git_user for many repositories on a bounded worker pool.
+        progress_callback(done, total) is called as each repository finishes.
+        Returns: [(repo_path, success, message)] in input order.
+        """
+        # Imported here: concurrent.futures pulls in logging and costs the CLI ~10 ms at startup
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        # One history entry for the whole batch instead of one per repository
+        configs = [repo_config_path(path) for path in repo_paths if os.path.exists(os.path.join(path, ".git"))]
+        self.snapshot([c for c in configs if c], f"bind {len(repo_paths)} repositories to {email}")
+
+        total = len(repo_paths)
+        results = {}
+        done = 0
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            futures = {
+                pool.submit(self.set_local_git_user, path, name, email, ssh_key_path, snapshot=False): path
+                for path in repo_paths
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    ok, msg = future.result()
+                except Exception as e:
+                    ok, msg = False, str(e)
+                results[path] = (path, ok, msg)
+                done += 1
+                if progress_callback: progress_callback(done, total)
+        return [results[path] for path in repo_paths]
+
+    @staticmethod
+    def _quote_config_value(value: str) -> str:
+        """Quotes a value for a git config file (backslashes and quotes escaped)."""
+        return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+    @staticmethod
+    def gitdir_condition(directory: str) -> str:
+        """
+        Builds the includeIf condition for a directory tree.
+        A trailing slash makes git match every repository below it.
+        """
+        pattern = os.path.abspath(os.path.expanduser(directory)).replace("\\", "/").rstrip("/") + "/"
+        # Windows paths are case-insensitive
+        keyword = "gitdir/i" if os.name == 'nt' else "gitdir"
+        return f"{keyword}:{pattern}"
+
+    def render_account_include(self, name: str, email: str, ssh_key_path: str, gpg_key_id: str = None) -> str:
+        """Contents of the per-account include file referenced by directory bindings."""
+        ssh_cmd = self.build_ssh_command(ssh_key_path)
+        lines = [
+            "# Managed by GitHub Account Manager Pro - changes will be overwritten\n",
+            "[user]\n",
+            f"\tname = {self._quote_config_value(name)}\n",
+            f"\temail = {self._quote_config_value(email)}\n",
+        ]
+        if gpg_key_id and gpg_key_id.strip():
+            lines += [
+                f"\tsigningkey = {gpg_key_id.strip()}\n",
+                "[commit]\n",
+                "\tgpgsign = true\n",
+            ]
+        lines += [
+            "[core]\n",
+            f"\tsshCommand = {self._quote_config_value(ssh_cmd)}\n",
+        ]
+        return "".join(lines)
+
+    def write_account_include(self, include_path: str, name: str, email: str, ssh_key_path: str, gpg_key_id: str = None) -> bool:
+        """
+        Writes the per-account include file. Returns False (and leaves the
+        file alone) when it already has the expected contents.
+        """
+        content = self.render_account_include(name, email, ssh_key_path, gpg_key_id)
+        try:
+            with open(include_path, 'r', encoding='utf-8') as f:
+                if f.read() == content:
+                    return False
+        except OSError:
+            pass
+        os.makedirs(os.path.dirname(include_path), exist_ok=True)
+        tmp_path = include_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, include_path)
+        return True
+
+    @timed("bind.directory")
+    def bind_directory(self, directory: str, include_path: str, name: str, email: str, ssh_key_path: str, gpg_key_id: str = None):
+        """
+        Binds a whole directory tree to an account with one global
+        [includeIf "gitdir:<dir>/"] entry pointing at the account include file.
+        Covers existing and future clones under the directory.
+        """
+        if not os.path.isdir(directory):
+            return False, f"Directory not found: {directory}"
+        try:
+            self.write_account_include(include_path, name, email, ssh_key_path, gpg_key_id)
+        except OSError as e:
+            return False, f"Failed to write include file: {e}"
+
+        key = f"includeIf.{self.gitdir_condition(directory)}.path"
+        self.snapshot(self.global_config_paths(), f"bind directory {directory}")
+        try:
+            self.runner.run("git", ["config", "--global", key, include_path.replace("\\", "/")], check=True)
+            return True, "Directory binding added to global git config."
+        except (OSError, subprocess.SubprocessError) as e:
+            return False, f"Failed to set includeIf: {e}"
+
+    def unbind_directory(self, directory: str):
+        """Removes the includeIf entry written by bind_directory."""
+        section = f"includeIf.{self.gitdir_condition(directory)}"
+        self.snapshot(self.global_config_paths(), f"unbind directory {directory}")
+        try:
+            result = self.runner.run("git", ["config", "--global", "--remove-section", section])
+        except (OSError, subprocess.SubprocessError) as e:
+            return False, f"Failed to remove includeIf: {e}"
+        # Already gone (removed by hand): nothing left to undo
+        if result.returncode != 0 and "no such section" not in result.stderr:
+            return False, f"Failed to remove includeIf: {result.stderr.strip()}"
+        return True, "Directory binding removed."
+
+    def propagate_identity(self, account: dict, repo_paths: List[str], include_paths: List[str],
+                           max_workers: int = MAX_BIND_WORKERS,
+                           progress_callback: Callable = None) -> List[Tuple[str, bool, str]]:
+        """
+        Pushes an edited account to everything bound to it: one batched
+        config write per repository (in parallel) plus the account's
+        directory-binding include files.
+        Returns: [(path, success, message)]
+        """
+        results = self.bind_repositories(repo_paths, account['username'], account['email'], account['ssh_key_path'],
+                                         max_workers=max_workers, progress_callback=progress_callback)
+        for include_path in sorted(set(include_paths)):
+            try:
+                self.write_account_include(include_path, account['username'], account['email'],
+                                           account['ssh_key_path'], account.get('gpg_key_id'))
+                results.append((include_path, True, "Include file updated."))
+            except OSError as e:
+                results.append((include_path, False, f"Failed to write include file: {e}"))
+        return results
 
     def get_current_global_user(self):
         try:
-            name = subprocess.check_output(["git", "config", "--global", "user.name"], text=True).strip()
-            email = subprocess.check_output(["git", "config", "--global", "user.email"], text=True).strip()
-            return name, email
-        except:
+            name = self.runner.query("git", ["config", "--global", "user.name"])
+            email = self.runner.query("git", ["config", "--global", "user.email"])
+        except (OSError, subprocess.SubprocessError):
+            return None, None
+        if name.returncode != 0 or email.returncode != 0:
             return None, None
+        return name.stdout.strip(), email.stdout.strip()
+
+    @staticmethod
+    def global_config_paths() -> List[str]:
+        """Global config files in the order git reads them (later ones win)."""
+        xdg_home = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+        return [os.path.join(xdg_home, "git", "config"), os.path.expanduser("~/.gitconfig")]
+
+    def read_global_user(self):
+        """
+        Same answer as get_current_global_user, read straight from the config
+        files without spawning git (used where latency matters).
+        """
+        values = {}
+        for path in self.global_config_paths():
+            values.update(read_git_config(path))
+        return values.get("user.name"), values.get("user.email")
 
     def check_if_using_https(self) -> bool:
         """Checks if the user is likely using HTTPS credential helper."""
         try:
             # Check global credential helper
-            helper = subprocess.check_output(["git", "config", "--global", "credential.helper"], text=True).strip()
-            if helper:
-                return True
-        except:
-            pass
-        return False
+            result = self.runner.query("git", ["config", "--global", "credential.helper"])
+        except (OSError, subprocess.SubprocessError):
+            return False
+        return result.returncode == 0 and bool(result.stdout.strip())
 
+    @timed("ssh_config.read")
     def get_current_ssh_identity(self) -> Optional[str]:
         """Tries to parse ~/.ssh/config to find the IdentityFile for github.com"""
         if not os.path.exists(self.ssh_config_path):
@@ -140,11 +364,12 @@ class GitSwitcher:
                         parts = stripped.split(maxsplit=1)
                         if len(parts) > 1:
                             return os.path.expanduser(parts[1])
-        except:
+        except (OSError, UnicodeDecodeError):
             pass
         return None
 
-    def update_ssh_config(self, identity_file_path: str):
+    @timed("ssh_config.write")
+    def update_ssh_config(self, identity_file_path: str, snapshot: bool = True):
         """
         Updates the Host github.com block in ~/.ssh/config to use the specified identity file.
         Uses a marker strategy or full replacement of the github.com block.
@@ -201,8 +426,11 @@ class GitSwitcher:
             new_lines.extend(github_block)
             
         try:
-            # Backup first
-            if os.path.exists(self.ssh_config_path):
+            # Backup first (the snapshot history when there is one, else a single config.bak)
+            if self.snapshots is not None:
+                if snapshot:
+                    self.snapshot([self.ssh_config_path], f"set SSH identity {identity_file_path}")
+            elif os.path.exists(self.ssh_config_path):
                 shutil.copy2(self.ssh_config_path, self.ssh_config_path + ".bak")
             
             with open(self.ssh_config_path, 'w') as f:
@@ -211,15 +439,27 @@ class GitSwitcher:
         except Exception as e:
             return False, f"Failed to write SSH config: {e}"
 
+    @timed("activate")
     def activate_account(self, name: str, email: str, ssh_key_path: str, gpg_key_id: str = None):
-        """Orchestrates the switch."""
+        """Orchestrates the switch. Concurrent calls run one after the other."""
+        with self._activate_lock:
+            return self._activate(name, email, ssh_key_path, gpg_key_id)
+
+    def _activate(self, name: str, email: str, ssh_key_path: str, gpg_key_id: str = None):
+        # Checked before anything is written, so a missing key cannot leave a half-applied identity
+        if not ssh_key_path or not os.path.exists(ssh_key_path):
+            return False, f"Identity file not found at: {ssh_key_path or '(none configured)'}"
+
+        # One history entry covering both files, so a rollback undoes the whole switch
+        self.snapshot(self.global_config_paths() + [self.ssh_config_path], f"activate {name} <{email}>")
+        
         # 1. Update Git Config
-        git_ok, git_msg = self.set_global_git_user(name, email, gpg_key_id)
+        git_ok, git_msg = self.set_global_git_user(name, email, gpg_key_id, snapshot=False)
         if not git_ok:
             return False, git_msg
             
         # 2. Update SSH Config
-        ssh_ok, ssh_msg = self.update_ssh_config(ssh_key_path)
+        ssh_ok, ssh_msg = self.update_ssh_config(ssh_key_path, snapshot=False)
         if not ssh_ok:
             return False, ssh_msg
             
@@ -233,14 +473,14 @@ class GitSwitcher:
         try:
             # ssh -T returns exit code 1 on success "Hi username...", so we must catch that.
             # actually, sometimes it returns 1 even if successful because 'shells are not allowed'.
-            result = subprocess.run(
-                ["ssh", "-T", "git@github.com"], 
-                text=True, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE
-            )
+            # BatchMode: fail instead of waiting on a passphrase or host-key prompt nobody can answer
+            result = self.runner.run("ssh", [
+                "-T", "-o", "BatchMode=yes", "-o", f"ConnectTimeout={SSH_CONNECT_TIMEOUT}", "git@github.com"
+            ])
             # GitHub usually writes the welcome message to stderr!
             output = result.stderr + result.stdout
             return output.strip()
-        except Exception as e:
+        except subprocess.TimeoutExpired:
+            return "Error running ssh check: timed out waiting for github.com"
+        except (OSError, subprocess.SubprocessError) as e:
             return f"Error running ssh check: {str(e)}"
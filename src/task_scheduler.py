@@ -0,0 +1,165 @@
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+from typing import Callable, Optional
+
+MAX_TASK_WORKERS = 8
+# Tk-side queue polling: fast while work is in flight, relaxed when idle
+ACTIVE_POLL_MS = 30
+IDLE_POLL_MS = 200
+
+
+class Task:
+    """
+    Handle for work submitted to a TaskScheduler.
+    Workers may call progress(...) as often as they like: updates are
+    coalesced so the Tk thread only ever sees the latest one.
+    Cancellation is cooperative: pending tasks never start, running ones
+    should check `cancelled` (or pass `should_stop` to APIs that take one).
+    Callbacks of a cancelled task are not called.
+    """
+    def __init__(self, scheduler: "TaskScheduler", name: str, on_progress: Optional[Callable] = None):
+        self.name = name
+        self.future = None
+        self._scheduler = scheduler
+        self._on_progress = on_progress
+        self._cancel = threading.Event()
+        self._progress_lock = threading.Lock()
+        self._progress_args = None
+        self._progress_posted = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def should_stop(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def done(self) -> bool:
+        return self.future is not None and self.future.done()
+
+    def progress(self, *args):
+        """Reports progress from the worker; on_progress(*args) runs on the Tk thread."""
+        if self._on_progress is None or self.cancelled:
+            return
+        with self._progress_lock:
+            self._progress_args = args
+            if self._progress_posted:
+                return
+            self._progress_posted = True
+        self._scheduler.call_soon(self._deliver_progress)
+
+    def _deliver_progress(self):
+        with self._progress_lock:
+            args = self._progress_args
+            self._progress_posted = False
+        if not self.cancelled:
+            self._on_progress(*args)
+
+
+class TaskScheduler:
+    """
+    Runs blocking work (subprocesses, network, disk scans) on a worker pool
+    and hands results back to the Tk thread.
+
+    Tk is not thread-safe, so workers never touch widgets: completion,
+    error and progress callbacks are queued and executed by a drain loop
+    the Tk event loop runs through `after`. call_soon() may be used from
+    any thread to run a callable on the Tk thread.
+    """
+    def __init__(self, tk_root, max_workers: int = MAX_TASK_WORKERS):
+        self.tk_root = tk_root
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="task")
+        self._callbacks: "queue.Queue[tuple]" = queue.Queue()
+        self._active = set()
+        self._lock = threading.Lock()
+        self._running = False
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self.tk_root.after(IDLE_POLL_MS, self._drain)
+
+    def shutdown(self):
+        self._running = False
+        with self._lock:
+            active = list(self._active)
+        for task in active:
+            task.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def busy(self) -> bool:
+        """True while any submitted task has not finished."""
+        with self._lock:
+            return bool(self._active)
+
+    def call_soon(self, callback: Callable, *args):
+        """Runs callback(*args) on the Tk thread. Safe from any thread."""
+        self._callbacks.put((callback, args))
+
+    def submit(self, fn: Callable, *args, on_done: Callable = None, on_error: Callable = None,
+               name: str = None) -> Task:
+        """Runs fn(*args) on the pool; on_done(result) / on_error(exception) run on the Tk thread."""
+        return self._submit(lambda task: fn(*args), on_done, on_error, None, name or getattr(fn, "__name__", "task"))
+
+    def submit_job(self, fn: Callable, *args, on_done: Callable = None, on_error: Callable = None,
+                   on_progress: Callable = None, name: str = None) -> Task:
+        """Like submit(), but calls fn(task, *args) so the work can report progress and check cancellation."""
+        return self._submit(lambda task: fn(task, *args), on_done, on_error, on_progress,
+                            name or getattr(fn, "__name__", "task"))
+
+    def _submit(self, call, on_done, on_error, on_progress, name) -> Task:
+        task = Task(self, name, on_progress)
+        with self._lock:
+            self._active.add(task)
+        task.future = self._executor.submit(self._run, task, call)
+        task.future.add_done_callback(lambda future: self._finished(task, future, on_done, on_error))
+        return task
+
+    @staticmethod
+    def _run(task: Task, call):
+        if task.cancelled:
+            return None
+        return call(task)
+
+    def _finished(self, task: Task, future, on_done, on_error):
+        with self._lock:
+            self._active.discard(task)
+        if task.cancelled:
+            return
+        try:
+            result = future.result()
+        except CancelledError:
+            return
+        except Exception as e:
+            logging.error(f"Task '{task.name}' failed: {e}", exc_info=(type(e), e, e.__traceback__))
+            if on_error:
+                self.call_soon(on_error, e)
+            return
+        if on_done:
+            self.call_soon(on_done, result)
+
+    def _drain(self):
+        if not self._running:
+            return
+        # Bounded batch per tick so a flood of callbacks cannot starve redraws
+        for _ in range(200):
+            try:
+                callback, args = self._callbacks.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception:
+                logging.exception(f"Task callback {getattr(callback, '__name__', callback)} failed")
+        with self._lock:
+            busy = bool(self._active)
+        delay = ACTIVE_POLL_MS if busy or not self._callbacks.empty() else IDLE_POLL_MS
+        self.tk_root.after(delay, self._drain)